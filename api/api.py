@@ -1,8 +1,16 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from core.supabase_manager import SupabaseManager
+from fastapi.responses import PlainTextResponse, FileResponse
+from pydantic import BaseModel
+from typing import List, Dict, Any
+from core.clients import get_supabase_manager
+from core import metrics
+from core import profiler
+from core import clock
+from core.zscore_snapshot import read_zscores
+from core.job_queue import get_job_queue, JobQueueFull
 from datetime import datetime
-from config import API_HOST, API_PORT, CORS_ORIGINS
+from config import API_HOST, API_PORT, CORS_ORIGINS, API_KEY
 
 app = FastAPI(title="Trading API", version="1.0.0")
 
@@ -15,7 +23,7 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-supabase_manager = SupabaseManager()
+supabase_manager = get_supabase_manager()
 
 @app.get("/")
 def root():
@@ -64,4 +72,96 @@ def get_correlation_stats():
 @app.get("/performance")
 def get_performance():
     result = supabase_manager.client.table('daily_performance').select('*').order('date', desc=True).limit(10).execute()
-    return {"performance": result.data} 
\ No newline at end of file
+    return {"performance": result.data} 
+
+@app.get("/zscores")
+def get_zscores(timeframe: str = None, symbol: str = None, min_abs_z: float = 0.0):
+    # Z-score/spread/hedge ratio/Bollinger live từ snapshot mmap của signal process (không gọi Binance/DB)
+    snapshot = read_zscores()
+    if snapshot is None:
+        return {"available": False, "published_at": None, "age_seconds": None, "zscores": []}
+    pairs = [
+        p for p in snapshot['pairs']
+        if (timeframe is None or p['timeframe'] == timeframe)
+        and (symbol is None or symbol in (p['pair1'], p['pair2']))
+        and abs(p.get('z_score') or 0.0) >= min_abs_z
+    ]
+    pairs.sort(key=lambda p: abs(p.get('z_score') or 0.0), reverse=True)
+    return {
+        "available": True,
+        "published_at": snapshot['published_at'],
+        "age_seconds": clock.time() - snapshot['published_at'],
+        "zscores": pairs
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    # Prometheus text format, gộp snapshot của scheduler/executor/api trong STATE_DIR/metrics
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+# =====================
+# Admin (yêu cầu header X-API-Key = API_KEY; API_KEY rỗng → tắt admin routes)
+# =====================
+
+def require_api_key(x_api_key: str = Header(default="")):
+    if not API_KEY or x_api_key != API_KEY:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+class ProfilingConfig(BaseModel):
+    jobs: List[str] = []
+
+@app.get("/admin/profiling", dependencies=[Depends(require_api_key)])
+def get_profiling():
+    return {"enabled_jobs": sorted(profiler.enabled_jobs()), "profiles": profiler.list_profiles()}
+
+@app.post("/admin/profiling", dependencies=[Depends(require_api_key)])
+def set_profiling(config: ProfilingConfig):
+    # Scheduler/executor đọc lại file điều khiển ở lần chạy job kế tiếp
+    return {"enabled_jobs": profiler.set_enabled_jobs(config.jobs)}
+
+@app.get("/admin/profiles/{job}/{profile}", dependencies=[Depends(require_api_key)])
+def get_profile(job: str, profile: str):
+    path = profiler.profile_path(job, profile)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if path.endswith(".json"):
+        return FileResponse(path, media_type="application/json")
+    return FileResponse(path, media_type="application/octet-stream", filename=profile)
+
+# =====================
+# Jobs theo yêu cầu (scan/rerank/backtest chạy trên worker pool, không chặn request)
+# =====================
+
+class JobRequest(BaseModel):
+    params: Dict[str, Any] = {}
+
+def _get_job_or_404(job_id: str):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/admin/jobs/{kind}", dependencies=[Depends(require_api_key)])
+def submit_job(kind: str, request: JobRequest = JobRequest()):
+    # vd POST /admin/jobs/scan {"params": {"fresh": true}}; job giống hệt đang chạy → trả lại job đó
+    queue = get_job_queue()
+    if kind not in queue.kinds:
+        raise HTTPException(status_code=404, detail=f"Unknown job kind, expected one of {queue.kinds}")
+    try:
+        job, deduplicated = queue.submit(kind, request.params)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {"job": job.to_dict(include_results=False), "deduplicated": deduplicated}
+
+@app.get("/admin/jobs", dependencies=[Depends(require_api_key)])
+def list_jobs():
+    return {"jobs": [job.to_dict(include_results=False) for job in get_job_queue().jobs()]}
+
+@app.get("/admin/jobs/{job_id}", dependencies=[Depends(require_api_key)])
+def get_job(job_id: str):
+    return {"job": _get_job_or_404(job_id).to_dict()}
+
+@app.delete("/admin/jobs/{job_id}", dependencies=[Depends(require_api_key)])
+def cancel_job(job_id: str):
+    _get_job_or_404(job_id)
+    return {"job": get_job_queue().cancel(job_id).to_dict(include_results=False)}
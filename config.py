@@ -3,8 +3,6 @@ from dotenv import load_dotenv
 
 # Load environment variables from .env file
 env_path = os.path.join(os.path.dirname(__file__), '.env')
-print(f"Loading .env from: {env_path}")
-print(f"File exists: {os.path.exists(env_path)}")
 load_dotenv(dotenv_path=env_path)
 
 BINANCE_API_KEY = os.getenv("BINANCE_API_KEY", "")
@@ -13,10 +11,6 @@ BINANCE_API_SECRET = os.getenv("BINANCE_API_SECRET", "")
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY", "")
 
-# Debug print
-print(f"SUPABASE_URL: '{SUPABASE_URL}'")
-print(f"SUPABASE_KEY: '{SUPABASE_KEY[:10]}...' if SUPABASE_KEY else 'None'")
-
 DATABASE_URL = os.getenv("DATABASE_URL", "")
 
 API_HOST = os.getenv("API_HOST", "0.0.0.0")
@@ -37,3 +31,101 @@ TAKE_PROFIT_PCT = float(os.getenv("TAKE_PROFIT_PCT", 0.02))
 
 API_KEY = os.getenv("API_KEY", "")
 
+# Thư mục lưu state cục bộ (online stats, checkpoints...)
+STATE_DIR = os.getenv("STATE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "state"))
+
+
+# Candidate generation cho market scan: "all" (toàn bộ combinations), "cluster" hoặc "knn"
+PAIR_CANDIDATE_MODE = os.getenv("PAIR_CANDIDATE_MODE", "all")
+PAIR_CANDIDATE_TOP_K = int(os.getenv("PAIR_CANDIDATE_TOP_K", 10))
+PAIR_CLUSTER_DISTANCE = float(os.getenv("PAIR_CLUSTER_DISTANCE", 1.0))
+PAIR_RECALL_SAMPLE = int(os.getenv("PAIR_RECALL_SAMPLE", 200))
+PAIR_MIN_RECALL = float(os.getenv("PAIR_MIN_RECALL", 0.9))
+
+# Re-ranking 4h: "full" (tính lại toàn bộ) hoặc "incremental" (chỉ cập nhật nến mới)
+REORDER_MODE = os.getenv("REORDER_MODE", "full")
+REORDER_MAX_P_VALUE = float(os.getenv("REORDER_MAX_P_VALUE", 0.05))
+REORDER_MIN_CORRELATION = float(os.getenv("REORDER_MIN_CORRELATION", 0.5))
+
+# Spread model cho signal generator và position monitor: "ols" (hedge ratio tĩnh) hoặc "kalman"
+SPREAD_MODEL = os.getenv("SPREAD_MODEL", "ols")
+SIGNAL_TIMEFRAME = os.getenv("SIGNAL_TIMEFRAME", "15m")
+SIGNAL_WINDOW = int(os.getenv("SIGNAL_WINDOW", 60))
+KALMAN_DELTA = float(os.getenv("KALMAN_DELTA", 1e-4))
+KALMAN_OBS_VAR = float(os.getenv("KALMAN_OBS_VAR", 1e-3))
+
+# Signal bus local (generator → executor), DB polling vẫn là fallback
+# Bus giữa các process chỉ bật khi đặt SIGNAL_BUS_AUTHKEY (secret riêng mỗi deploy, không có giá trị mặc định)
+SIGNAL_BUS_HOST = os.getenv("SIGNAL_BUS_HOST", "127.0.0.1")
+SIGNAL_BUS_PORT = int(os.getenv("SIGNAL_BUS_PORT", 6001))
+SIGNAL_BUS_AUTHKEY = os.getenv("SIGNAL_BUS_AUTHKEY", "")
+SIGNAL_POLL_INTERVAL = int(os.getenv("SIGNAL_POLL_INTERVAL", 60))
+
+# Risk engine (pre-trade): giới hạn exposure theo notional USD
+MAX_GROSS_EXPOSURE = float(os.getenv("MAX_GROSS_EXPOSURE", 100))
+MAX_NET_EXPOSURE = float(os.getenv("MAX_NET_EXPOSURE", 50))
+MAX_SYMBOL_EXPOSURE = float(os.getenv("MAX_SYMBOL_EXPOSURE", 15))
+MAX_CORRELATED_EXPOSURE = float(os.getenv("MAX_CORRELATED_EXPOSURE", 40))
+RISK_CORRELATION_THRESHOLD = float(os.getenv("RISK_CORRELATION_THRESHOLD", 0.7))
+
+# Observability: log level, rate limit log lặp lại, chu kỳ dump metrics ra STATE_DIR/metrics
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_RATE_LIMIT_SECONDS = float(os.getenv("LOG_RATE_LIMIT_SECONDS", 60))
+METRICS_DUMP_INTERVAL = float(os.getenv("METRICS_DUMP_INTERVAL", 15))
+
+# Profiling (opt-in): PROFILE_JOBS="daily_task,signal_task" hoặc "all"; bật/tắt runtime qua admin API
+PROFILE_JOBS = os.getenv("PROFILE_JOBS", "")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 10))
+
+# Panel giá căn theo timestamp dùng chung cho correlation/cointegration/z-score
+# Missing-bar policy: "drop" (bỏ nến thiếu), "ffill" (lấy giá đóng cửa trước đó), "mask" (giữ NaN)
+PANEL_MISSING_POLICY = os.getenv("PANEL_MISSING_POLICY", "drop")
+PANEL_CACHE_SIZE = int(os.getenv("PANEL_CACHE_SIZE", 8))
+
+# Execution journal (idempotency signals đã execute): TTL phải dài hơn cửa sổ get_recent_signals (5 phút)
+EXECUTION_JOURNAL_TTL = float(os.getenv("EXECUTION_JOURNAL_TTL", 6 * 3600))
+EXECUTION_JOURNAL_COMPACT_EVERY = int(os.getenv("EXECUTION_JOURNAL_COMPACT_EVERY", 1000))
+# Account ledger: số giây nhớ position đã release (chặn cộng vốn hai lần, lưu cùng ledger.json)
+LEDGER_RELEASED_TTL = float(os.getenv("LEDGER_RELEASED_TTL", 7 * 24 * 3600))
+
+# Multi-timeframe signals: SIGNAL_TIMEFRAMES="15m,1h,4h" → một chuỗi base/symbol, các timeframe khác resample trong RAM
+# SIGNAL_BASE_INTERVAL rỗng = timeframe nhỏ nhất; SIGNAL_MTF_BARS = số nến mỗi timeframe (mặc định window + 100)
+SIGNAL_TIMEFRAMES = [tf.strip() for tf in os.getenv("SIGNAL_TIMEFRAMES", "").split(",") if tf.strip()]
+SIGNAL_BASE_INTERVAL = os.getenv("SIGNAL_BASE_INTERVAL", "")
+SIGNAL_MTF_BARS = int(os.getenv("SIGNAL_MTF_BARS", 0))
+
+# Daily scan: số worker phân tích cặp (giữ thấp để tránh rate limit) và số cặp mỗi chunk của dispatcher
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", 6))
+SCAN_CHUNK_SIZE = int(os.getenv("SCAN_CHUNK_SIZE", 16))
+
+# Daily scan incremental: "full" (tính lại toàn bộ) hoặc "incremental" (dùng lại thống kê block ngày đã lưu)
+# Coint đầy đủ chỉ cho cặp có |corr| trong ±SCAN_CORRELATION_BAND quanh 0.5 hoặc p-value rẻ trong [MIN_P, MAX_P]
+SCAN_MODE = os.getenv("SCAN_MODE", "full")
+SCAN_CORRELATION_BAND = float(os.getenv("SCAN_CORRELATION_BAND", 0.05))
+SCAN_FULL_COINT_MIN_P = float(os.getenv("SCAN_FULL_COINT_MIN_P", 0.01))
+SCAN_FULL_COINT_MAX_P = float(os.getenv("SCAN_FULL_COINT_MAX_P", 0.2))
+
+# Checkpoint daily scan (STATE_DIR/scan_checkpoints): scan lỗi giữa chừng chạy lại tiếp từ stage/chunk cuối
+# Catch-up: sau 9:00 nếu scan hôm nay chưa hoàn thành, scheduler thử lại mỗi SCAN_CATCHUP_INTERVAL phút
+SCAN_CHECKPOINT_KEEP_DAYS = int(os.getenv("SCAN_CHECKPOINT_KEEP_DAYS", 7))
+SCAN_CATCHUP = os.getenv("SCAN_CATCHUP", "true").lower() == "true"
+SCAN_CATCHUP_INTERVAL = int(os.getenv("SCAN_CATCHUP_INTERVAL", 15))
+
+# Job queue API (scan/rerank/backtest theo yêu cầu): số worker, số job chờ tối đa, số job đã xong giữ lại
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", 8))
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", 50))
+
+# Exchange metadata (tickSize, stepSize, min notional, onboard date): cache trong RAM, refresh sau TTL giây
+EXCHANGE_METADATA_TTL = float(os.getenv("EXCHANGE_METADATA_TTL", 6 * 3600))
+
+# Kernel số học (rolling mean/std/corr, OLS, ADF): "auto" dùng Numba nếu đã cài, "numpy" ép dùng NumPy
+KERNEL_BACKEND = os.getenv("KERNEL_BACKEND", "auto")
+
+# Memo thống kê cặp (correlation/p-value/hedge ratio/volatility) theo nến: số cặp tối đa giữ trong RAM
+PAIR_STATS_MEMO_SIZE = int(os.getenv("PAIR_STATS_MEMO_SIZE", 4096))
+
+# Snapshot z-score/spread live cho API (/zscores): file mmap STATE_DIR/zscores.snap do signal process ghi
+# Dung lượng vùng payload (byte) và số giây giữ một cặp không còn được cập nhật (cặp đã rời top)
+ZSCORE_SNAPSHOT_SIZE = int(os.getenv("ZSCORE_SNAPSHOT_SIZE", 1024 * 1024))
+ZSCORE_SNAPSHOT_MAX_AGE = float(os.getenv("ZSCORE_SNAPSHOT_MAX_AGE", 24 * 3600))
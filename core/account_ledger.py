@@ -0,0 +1,204 @@
+# account_ledger.py
+import os
+import json
+import threading
+from collections import defaultdict
+from core import clock
+
+
+class AccountLedger:
+    """
+    Sổ cái vốn cho simulation account, thay cho biến global simulation_balance:
+    - reserve()/release() nguyên tử dưới một lock → an toàn khi nhiều thread/asyncio task cùng execute
+    - Exposure theo symbol và theo pair tra cứu O(1)
+    - Snapshot ra JSON và rebuild lại từ bảng positions khi khởi động
+    - Key đã release được nhớ released_ttl giây (kể cả qua restart, nằm trong snapshot) để chặn release hai lần
+    """
+
+    def __init__(self, initial_balance, snapshot_path=None, released_ttl=7 * 24 * 3600):
+        self._lock = threading.RLock()
+        self.initial_balance = float(initial_balance)
+        self.snapshot_path = snapshot_path
+        self.released_ttl = float(released_ttl)
+        self._reset()
+
+    def _reset(self):
+        self._balance = self.initial_balance
+        self._realized_pnl = 0.0
+        self._reservations = {}
+        # str(key) → thời điểm release; dict giữ thứ tự chèn ≈ thứ tự thời gian
+        self._released = {}
+        self._by_symbol = defaultdict(float)
+        self._by_pair = defaultdict(float)
+
+    # ---------- Mutations ----------
+
+    def reserve(self, key, amount, symbol=None, pair_id=None):
+        """Giữ vốn cho một lệnh; False nếu không đủ balance hoặc key đã được giữ"""
+        # Key luôn lưu dạng str: snapshot JSON trả key về str, order id / DB id có thể là int
+        key = str(key)
+        amount = float(amount)
+        with self._lock:
+            if amount <= 0 or key in self._reservations or amount > self._balance:
+                return False
+            self._balance -= amount
+            self._reservations[key] = {'amount': amount, 'symbol': symbol, 'pair_id': pair_id}
+            if symbol is not None:
+                self._by_symbol[symbol] += amount
+            if pair_id is not None:
+                self._by_pair[pair_id] += amount
+            self._autosave()
+            return True
+
+    def release(self, key, pnl=0.0, amount=None):
+        """
+        Trả vốn + PnL khi đóng lệnh, trả về balance mới:
+        - key đã reserve: trả đúng số đã giữ
+        - key đã release trước đó: bỏ qua (tránh cộng hai lần khi hai luồng cùng đóng)
+        - key lạ (position mở ngoài ledger): dùng `amount`
+        """
+        key = str(key)
+        with self._lock:
+            now = clock.time()
+            self._expire_released(now)
+            if key in self._released:
+                return self._balance
+            reservation = self._reservations.pop(key, None)
+            if reservation is not None:
+                amount = reservation['amount']
+                self._decrement(self._by_symbol, reservation['symbol'], amount)
+                self._decrement(self._by_pair, reservation['pair_id'], amount)
+            self._balance += float(amount or 0.0) + float(pnl)
+            self._realized_pnl += float(pnl)
+            self._released[key] = now
+            self._autosave()
+            return self._balance
+
+    def cancel(self, key):
+        """Huỷ reservation khi lệnh không được tạo (không tính là đã đóng)"""
+        with self._lock:
+            reservation = self._reservations.pop(str(key), None)
+            if reservation is None:
+                return False
+            self._balance += reservation['amount']
+            self._decrement(self._by_symbol, reservation['symbol'], reservation['amount'])
+            self._decrement(self._by_pair, reservation['pair_id'], reservation['amount'])
+            self._autosave()
+            return True
+
+    def _expire_released(self, now=None):
+        cutoff = (clock.time() if now is None else now) - self.released_ttl
+        for key in list(self._released):
+            if self._released[key] > cutoff:
+                break
+            del self._released[key]
+
+    @staticmethod
+    def _decrement(index, key, amount):
+        if key is None:
+            return
+        index[key] -= amount
+        if index[key] <= 1e-12:
+            del index[key]
+
+    # ---------- Queries ----------
+
+    def available(self):
+        with self._lock:
+            return self._balance
+
+    @property
+    def realized_pnl(self):
+        with self._lock:
+            return self._realized_pnl
+
+    def exposure_by_symbol(self, symbol):
+        with self._lock:
+            return self._by_symbol.get(symbol, 0.0)
+
+    def exposure_by_pair(self, pair_id):
+        with self._lock:
+            return self._by_pair.get(pair_id, 0.0)
+
+    def has_symbol(self, symbol):
+        with self._lock:
+            return symbol in self._by_symbol
+
+    def gross_exposure(self):
+        with self._lock:
+            return sum(r['amount'] for r in self._reservations.values())
+
+    # ---------- Snapshot / replay ----------
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'initial_balance': self.initial_balance,
+                'balance': self._balance,
+                'realized_pnl': self._realized_pnl,
+                'reservations': {k: dict(v) for k, v in self._reservations.items()},
+                'released': dict(self._released)
+            }
+
+    def restore(self, snapshot):
+        with self._lock:
+            self._reset()
+            self._balance = float(snapshot['balance'])
+            self._realized_pnl = float(snapshot['realized_pnl'])
+            # Snapshot cũ chưa có 'released' → không chặn được release trùng của các lệnh trước restart
+            self._released = {str(key): float(at) for key, at in snapshot.get('released', {}).items()}
+            self._expire_released()
+            for key, reservation in snapshot['reservations'].items():
+                self._reservations[str(key)] = dict(reservation)
+                if reservation.get('symbol') is not None:
+                    self._by_symbol[reservation['symbol']] += reservation['amount']
+                if reservation.get('pair_id') is not None:
+                    self._by_pair[reservation['pair_id']] += reservation['amount']
+
+    def rebuild(self, open_positions, closed_positions):
+        """Replay từ bảng positions: balance = vốn ban đầu + PnL đã chốt - vốn đang nằm trong lệnh mở"""
+        with self._lock:
+            self._reset()
+            now = clock.time()
+            for position in closed_positions:
+                pnl = float(position.get('pnl') or 0.0)
+                self._balance += pnl
+                self._realized_pnl += pnl
+                self._released[str(position_key(position))] = now
+            for position in open_positions:
+                amount = float(position['entry_price']) * float(position['quantity'])
+                key = str(position_key(position))
+                self._balance -= amount
+                self._reservations[key] = {'amount': amount, 'symbol': position.get('symbol'), 'pair_id': position.get('pair_id')}
+                self._by_symbol[position.get('symbol')] += amount
+                if position.get('pair_id') is not None:
+                    self._by_pair[position.get('pair_id')] += amount
+            self._autosave()
+
+    def _autosave(self):
+        if not self.snapshot_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception as e:
+            print(f"⚠️ Không lưu được ledger snapshot: {e}")
+
+    def load_snapshot(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with open(self.snapshot_path) as f:
+                self.restore(json.load(f))
+            return True
+        except Exception as e:
+            print(f"⚠️ Không đọc được ledger snapshot: {e}")
+            return False
+
+
+def position_key(position):
+    """Khóa reservation của một position: order id (có từ lúc mở) hoặc id trong DB"""
+    return position.get('binance_order_id') or position.get('id')
@@ -1,34 +1,38 @@
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
-from core.supabase_manager import SupabaseManager
+from core.clients import get_supabase_manager
+from core.records import to_structured, POSITION_DTYPE
 
 def get_daily_performance_from_positions():
     """
     Tính daily performance từ positions đã đóng trong database, đúng schema mới
     """
     try:
-        supabase_manager = SupabaseManager()
+        supabase_manager = get_supabase_manager()
         closed_positions = supabase_manager.get_closed_positions()
         if not closed_positions:
             print("⚠️ Không có positions đã đóng để tính performance")
             return pd.DataFrame()
-        df = pd.DataFrame(closed_positions)
-        df['entry_time'] = pd.to_datetime(df['entry_time'])
-        df['exit_time'] = pd.to_datetime(df['exit_time'])
-        df['date'] = df['exit_time'].dt.date
+        # Structured array thay DataFrame của toàn bộ positions, group theo ngày đóng lệnh
+        positions = to_structured(closed_positions, POSITION_DTYPE)
+        dates = positions['exit_time'].astype('datetime64[D]')
+        valid = ~np.isnat(dates)
+        unique_dates, day_index = np.unique(dates[valid], return_inverse=True)
+        pnl = np.nan_to_num(positions['pnl'][valid])
+        total_trades = np.bincount(day_index, minlength=len(unique_dates))
+        profitable_trades = np.bincount(day_index, weights=pnl > 0, minlength=len(unique_dates))
+        total_pnl = np.bincount(day_index, weights=pnl, minlength=len(unique_dates))
         # Tính các trường cần thiết
         perf_list = []
-        for date, group in df.groupby('date'):
-            total_trades = len(group)
-            profitable_trades = (group['pnl'] > 0).sum()
-            total_pnl = group['pnl'].sum()
-            win_rate = (profitable_trades / total_trades * 100) if total_trades > 0 else 0
+        for i, date in enumerate(unique_dates.astype(object)):
+            win_rate = (profitable_trades[i] / total_trades[i] * 100) if total_trades[i] > 0 else 0
             perf_list.append({
                 'date': date,
-                'total_pnl': float(total_pnl),
+                'total_pnl': float(total_pnl[i]),
                 'win_rate': float(win_rate),
-                'total_trades': int(total_trades),
-                'profitable_trades': int(profitable_trades)
+                'total_trades': int(total_trades[i]),
+                'profitable_trades': int(profitable_trades[i])
             })
         daily_perf = pd.DataFrame(perf_list)
         print(f"✅ Tính daily performance từ {len(closed_positions)} positions đã đóng")
@@ -42,7 +46,7 @@ def save_daily_performance_to_db(daily_df):
     """
     Lưu daily performance vào database, nếu đã có ngày đó thì update, chưa có thì insert
     """
-    supabase_manager = SupabaseManager()
+    supabase_manager = get_supabase_manager()
     print(f"[DEBUG] Đang lưu daily performance vào database: {daily_df}")
     try:
         data = daily_df.to_dict('records') if hasattr(daily_df, 'to_dict') else daily_df
@@ -0,0 +1,40 @@
+# clients.py
+"""
+Client dùng chung, khởi tạo lazy ở lần dùng đầu tiên (thread-safe):
+- Import module không còn tạo Binance client (ping network) hay Supabase client
+- Cả process dùng chung một Binance client và một SupabaseManager
+"""
+import threading
+from config import BINANCE_API_KEY, BINANCE_API_SECRET
+
+_lock = threading.Lock()
+_binance_client = None
+_supabase_manager = None
+
+
+def get_binance_client():
+    global _binance_client
+    if _binance_client is None:
+        with _lock:
+            if _binance_client is None:
+                from binance.client import Client
+                from core import metrics
+                client = Client(BINANCE_API_KEY, BINANCE_API_SECRET, testnet=False)
+                client.timeout = 30  # Tăng timeout lên 30 giây
+                _binance_client = metrics.instrument_binance_client(client)
+    return _binance_client
+
+def get_supabase_manager():
+    global _supabase_manager
+    if _supabase_manager is None:
+        with _lock:
+            if _supabase_manager is None:
+                from core.supabase_manager import SupabaseManager
+                _supabase_manager = SupabaseManager()
+    return _supabase_manager
+
+def set_binance_client(client):
+    """Thay Binance client dùng chung (benchmark, replay), trả về client cũ"""
+    global _binance_client
+    previous, _binance_client = _binance_client, client
+    return previous
@@ -0,0 +1,68 @@
+# clock.py
+import time as _time
+import threading
+from datetime import datetime
+
+
+class SystemClock:
+    """Đồng hồ thật - mặc định cho chạy live"""
+
+    def now(self):
+        return datetime.now()
+
+    def time(self):
+        return _time.time()
+
+    def sleep(self, seconds):
+        _time.sleep(seconds)
+
+
+class VirtualClock:
+    """
+    Đồng hồ ảo cho replay: thời gian chỉ tiến khi engine gọi advance_to()/sleep(),
+    nên một ngày giao dịch có thể replay trong vài giây
+    """
+
+    def __init__(self, start_ms=0):
+        self._now_ms = int(start_ms)
+        self._lock = threading.Lock()
+
+    def now(self):
+        return datetime.fromtimestamp(self._now_ms / 1000)
+
+    def time(self):
+        return self._now_ms / 1000
+
+    def time_ms(self):
+        return self._now_ms
+
+    def sleep(self, seconds):
+        with self._lock:
+            self._now_ms += int(seconds * 1000)
+
+    def advance_to(self, timestamp_ms):
+        with self._lock:
+            if timestamp_ms > self._now_ms:
+                self._now_ms = int(timestamp_ms)
+
+
+_clock = SystemClock()
+
+def get_clock():
+    return _clock
+
+def set_clock(clock):
+    """Đổi đồng hồ toàn cục, trả về đồng hồ cũ để restore"""
+    global _clock
+    previous = _clock
+    _clock = clock
+    return previous
+
+def now():
+    return _clock.now()
+
+def time():
+    return _clock.time()
+
+def sleep(seconds):
+    _clock.sleep(seconds)
@@ -1,49 +1,90 @@
 # data_collector.py
-from binance.client import Client
 import pandas as pd
 import numpy as np
 from itertools import combinations
 from datetime import datetime
-from config import BINANCE_API_KEY, BINANCE_API_SECRET, DAILY_TOP_N
-from core.supabase_manager import SupabaseManager
-from statsmodels.tsa.stattools import coint
+from config import (DAILY_TOP_N,
+                    PAIR_CANDIDATE_MODE, PAIR_CANDIDATE_TOP_K, PAIR_CLUSTER_DISTANCE,
+                    PAIR_RECALL_SAMPLE, PAIR_MIN_RECALL, REORDER_MODE,
+                    REORDER_MAX_P_VALUE, REORDER_MIN_CORRELATION, SCAN_WORKERS, SCAN_CHUNK_SIZE, SCAN_MODE)
+from core.clients import get_binance_client, get_supabase_manager
+from core.pair_candidates import generate_candidate_pairs, sample_excluded_pairs, estimate_recall
+from core.online_stats import (OnlinePairStats, load_online_stats, save_online_stats,
+                               rolling_correlation_mean, pct_volatility)
+from core.klines import parse_klines, align
+from core.panel import get_panel, current_bar
+from core.singleflight import SingleFlight
+from core.task_dispatcher import TaskDispatcher
+from core.incremental_scan import compute_window_stats, triage_pairs, load_pvalues, save_pvalues
+from core.scan_checkpoint import ScanCheckpoint, ScanLock, pair_key
+from core.exchange_metadata import usdt_perpetual_symbols, split_by_listing_age
+from core.pair_stats import pair_stats_memo, last_close_ms
+from core import metrics
 import time
 import requests
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
 from functools import lru_cache
 
-# Tăng timeout cho Binance client
-client = Client(BINANCE_API_KEY, BINANCE_API_SECRET, testnet=False)
-client.timeout = 30  # Tăng timeout lên 30 giây
-supabase_manager = SupabaseManager()
+# Binance client / SupabaseManager dùng chung, khởi tạo lazy (xem core/clients.py)
+supabase_manager = get_supabase_manager()
 
-# Cache để lưu dữ liệu đã fetch
+# Cache dữ liệu đã fetch: key → (nến hiện tại lúc fetch, klines); sang nến mới thì entry hết hạn và fetch lại
 _data_cache = {}
 _cache_lock = threading.Lock()
+# Gộp các lần fetch đồng thời cùng cache key (lock cache không bao giờ giữ trong lúc gọi mạng)
+_fetch_group = SingleFlight()
+
+def _cache_get(cache_key, interval):
+    """Giá trị cache của key nếu được fetch trong nến `interval` hiện tại"""
+    with _cache_lock:
+        entry = _data_cache.get(cache_key)
+    if entry is not None and entry[0] == current_bar(interval):
+        return entry[1]
+    return None
+
+def _cache_put(cache_key, interval, value):
+    with _cache_lock:
+        _data_cache[cache_key] = (current_bar(interval), value)
+
+def get_cached_klines(cache_key, fetch, cache_name="klines", interval="1h"):
+    """
+    Klines từ cache (hết hạn khi sang nến `interval` mới); khi miss, các thread cùng key dùng chung
+    MỘT lần fetch() (singleflight), key khác nhau fetch song song. Không cache kết quả None
+    """
+    klines = _cache_get(cache_key, interval)
+    if klines is not None:
+        metrics.inc("cache_requests_total", cache=cache_name, result="hit")
+        return klines
+    metrics.inc("cache_requests_total", cache=cache_name, result="miss")
+
+    def load():
+        # Leader trước có thể vừa ghi cache xong
+        cached = _cache_get(cache_key, interval)
+        if cached is not None:
+            return cached
+        fetched = fetch()
+        if fetched is not None:
+            _cache_put(cache_key, interval, fetched)
+        return fetched
+
+    klines, shared = _fetch_group.do(cache_key, load)
+    if shared:
+        metrics.inc("singleflight_shared_total", cache=cache_name)
+    return klines
 
 def get_data_with_retry(symbol, interval="1h", limit=168, max_retries=3):  
     """Lấy dữ liệu với retry mechanism và cache"""
     cache_key = f"{symbol}_{interval}_{limit}"
-    
-    # Kiểm tra cache trước
-    with _cache_lock:
-        if cache_key in _data_cache:
-            return _data_cache[cache_key]
-    
+    return get_cached_klines(cache_key, lambda: fetch_klines_with_retry(symbol, interval, limit, max_retries),
+                             interval=interval)
+
+def fetch_klines_with_retry(symbol, interval="1h", limit=168, max_retries=3):
+    """Gọi Binance futures_klines với retry (không cache)"""
     for attempt in range(max_retries):
         try:
-            klines = client.futures_klines(symbol=symbol, interval=interval, limit=limit)
-            df = pd.DataFrame(klines, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'])
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-            df['close'] = df['close'].astype(float)
-            df['volume'] = df['volume'].astype(float)
-            
-            # Cache kết quả
-            with _cache_lock:
-                _data_cache[cache_key] = df
-            
-            return df
+            # Mảng NumPy gọn; payload rỗng → None (không được cache)
+            return parse_klines(get_binance_client().futures_klines(symbol=symbol, interval=interval, limit=limit))
         except Exception as e:
             if attempt < max_retries - 1:
                 print(f"⚠️  Retry {attempt + 1}/{max_retries} for {symbol}: {e}")
@@ -56,17 +97,16 @@ def get_data_via_rest_api(symbol, interval="1h", limit=168):
     try:
         # Kiểm tra cache trước
         cache_key = f"{symbol}_rest_{interval}_{limit}"
-        with _cache_lock:
-            if cache_key in _data_cache:
-                return _data_cache[cache_key]
+        cached = _cache_get(cache_key, interval)
+        if cached is not None:
+            return cached
         
         # Lấy data từ REST API
         df = get_data_with_retry(symbol, interval, limit)
         
         if df is not None and len(df) > 0:
             # Cache kết quả
-            with _cache_lock:
-                _data_cache[cache_key] = df
+            _cache_put(cache_key, interval, df)
             return df
         
         return None
@@ -79,53 +119,48 @@ def get_data(symbol, interval="1h", limit=168):
     """Wrapper function - sử dụng REST API với retry mechanism"""
     return get_data_with_retry(symbol, interval, limit)
 
+def get_price_panel(symbols, interval="1h", limit=168):
+    """Panel giá căn theo timestamp (dữ liệu lấy qua cache của get_data)"""
+    return get_panel(symbols, interval, limit, loader=get_data)
+
+def get_closed_klines(symbol, interval="1h", limit=168, start_time=None):
+    """Lấy các nến ĐÃ ĐÓNG (không cache) - dùng cho cập nhật incremental"""
+    try:
+        params = {'symbol': symbol, 'interval': interval, 'limit': limit}
+        if start_time is not None:
+            params['startTime'] = int(start_time)
+        klines = parse_klines(get_binance_client().futures_klines(**params))
+        if klines is None:
+            return None
+        now_ms = int(time.time() * 1000)
+        return klines.select(klines.close_time < now_ms)
+    except Exception as e:
+        print(f"❌ Error getting closed klines for {symbol}: {e}")
+        return None
+
 def get_all_usdt_pairs():
-    """Lấy tất cả cặp USDT đang trading với retry"""
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            exchange_info = client.futures_exchange_info()
-            
-            # Lọc chỉ cặp USDT và đang trading
-            usdt_pairs = []
-            for symbol in exchange_info['symbols']:
-                if (symbol['symbol'].endswith('USDT') and 
-                    symbol['status'] == 'TRADING' and
-                    symbol['contractType'] == 'PERPETUAL'):
-                    usdt_pairs.append(symbol['symbol'])
-            
-            print(f"📊 Tìm thấy {len(usdt_pairs)} cặp USDT")
-            return usdt_pairs
-            
-        except Exception as e:
-            if attempt < max_retries - 1:
-                print(f"⚠️  Retry {attempt + 1}/{max_retries} getting pairs: {e}")
-                time.sleep(2)  # Giảm delay từ 3s xuống 2s
-            else:
-                print(f"❌ Error getting pairs after {max_retries} attempts: {e}")
-                return []
+    """Lấy tất cả cặp USDT perpetual đang trading từ cache exchange metadata (refresh theo TTL, có retry)"""
+    usdt_pairs = usdt_perpetual_symbols()
+    if usdt_pairs:
+        print(f"📊 Tìm thấy {len(usdt_pairs)} cặp USDT")
+    return usdt_pairs
 
 def calculate_usdt_volume_optimized(symbol, limit=24):
     """Tính volume theo USDT cho một cặp - tối ưu hóa"""
     try:
-        # Sử dụng cache nếu có
+        # Sử dụng cache nếu có (dữ liệu 24h); fetch ngoài lock, gộp request trùng key
         cache_key = f"{symbol}_1h_{limit}"
-        with _cache_lock:
-            if cache_key in _data_cache:
-                df = _data_cache[cache_key]
-            else:
-                # Lấy dữ liệu 24h
-                klines = client.futures_klines(symbol=symbol, interval="1h", limit=limit)
-                df = pd.DataFrame(klines, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'])
-                df['volume'] = df['volume'].astype(float)
-                df['close'] = df['close'].astype(float)
-                
-                # Cache kết quả
-                _data_cache[cache_key] = df
-        
-        # Tính volume theo USDT
-        avg_volume_base = df['volume'].mean()  # Số lượng coin
-        avg_price = df['close'].mean()  # Giá trung bình
+        klines = get_cached_klines(
+            cache_key,
+            lambda: parse_klines(get_binance_client().futures_klines(symbol=symbol, interval="1h", limit=limit)),
+            cache_name="volume"
+        )
+        if klines is None:
+            return None
+        
+        # Tính volume theo USDT (volume lưu float32, cộng dồn bằng float64)
+        avg_volume_base = float(klines.volume.mean(dtype=np.float64))  # Số lượng coin
+        avg_price = float(klines.close.mean())  # Giá trung bình
         usdt_volume = avg_volume_base * avg_price  # Volume theo USDT
         
         return {
@@ -133,7 +168,7 @@ def calculate_usdt_volume_optimized(symbol, limit=24):
             'base_volume': avg_volume_base,
             'avg_price': avg_price,
             'usdt_volume': usdt_volume,
-            'current_price': df['close'].iloc[-1]
+            'current_price': float(klines.close[-1])
         }
         
     except Exception as e:
@@ -217,28 +252,29 @@ def check_data_quality(symbol, min_data_points=100):
     """Kiểm tra chất lượng dữ liệu của một symbol"""
     try:
         # Lấy dữ liệu với cache
-        df = get_data(symbol, interval="1h", limit=168)
+        klines = get_data(symbol, interval="1h", limit=168)
         
-        if df is None:
+        if klines is None:
             return False, 0, "No data"
         
         # Kiểm tra số lượng data points
-        if len(df) < min_data_points:
-            return False, len(df), f"Insufficient data points ({len(df)} < {min_data_points})"
-        
-        # Kiểm tra giá hằng số
-        if df['close'].std() == 0 or df['close'].nunique() <= 1:
-            return False, len(df), "Constant price"
+        if len(klines) < min_data_points:
+            return False, len(klines), f"Insufficient data points ({len(klines)} < {min_data_points})"
         
+        close = klines.close
         # Kiểm tra missing values
-        if df['close'].isna().any():
-            return False, len(df), "Missing values"
+        if np.isnan(close).any():
+            return False, len(klines), "Missing values"
+        
+        # Kiểm tra giá hằng số
+        if close.min() == close.max():
+            return False, len(klines), "Constant price"
         
         # Kiểm tra volume > 0
-        if df['volume'].sum() == 0:
-            return False, len(df), "No volume"
+        if klines.volume.sum(dtype=np.float64) == 0:
+            return False, len(klines), "No volume"
         
-        return True, len(df), "OK"
+        return True, len(klines), "OK"
         
     except Exception as e:
         return False, 0, f"Error: {str(e)}"
@@ -260,6 +296,15 @@ def filter_data_quality_parallel(symbols, min_data_points=100, max_workers=8):
     print("=" * 50)
     print(f"📊 Đang kiểm tra {len(symbols)} cặp (min {min_data_points} data points)...")
     
+    # Symbol list chưa đủ min_data_points nến 1h (theo onboard date) → loại luôn, không tải klines
+    total_symbols = len(symbols)
+    symbols, too_new = split_by_listing_age(symbols, min_data_points, "1h")
+    if too_new:
+        print(f"🆕 Bỏ qua {len(too_new)} cặp mới list chưa đủ {min_data_points} nến: {', '.join(too_new[:10])}")
+        metrics.inc("scan_symbols_skipped_total", len(too_new), reason="listing_age")
+    if not symbols:
+        return []
+    
     # Chia symbols thành batches
     batch_size = max(1, len(symbols) // max_workers)
     batches = [symbols[i:i + batch_size] for i in range(0, len(symbols), batch_size)]
@@ -277,65 +322,81 @@ def filter_data_quality_parallel(symbols, min_data_points=100, max_workers=8):
             print(f"📊 Hoàn thành batch {completed}/{len(batches)} ({len(valid_symbols)} valid pairs)")
     
     print(f"\n📊 KẾT QUẢ FILTER DỮ LIỆU:")
-    print(f"- Tổng cặp: {len(symbols)}")
+    print(f"- Tổng cặp: {total_symbols}")
     print(f"- Cặp hợp lệ: {len(valid_symbols)}")
-    print(f"- Tỷ lệ loại bỏ: {((len(symbols) - len(valid_symbols)) / len(symbols) * 100):.1f}%")
+    print(f"- Tỷ lệ loại bỏ: {((total_symbols - len(valid_symbols)) / total_symbols * 100):.1f}%")
     
     return valid_symbols
 
-def calculate_correlation_cointegration(symbol1, symbol2):
+def calculate_correlation_cointegration(symbol1, symbol2, panel=None):
     try:
-        # Lấy dữ liệu giá sử dụng hàm get_data
-        df1 = get_data(symbol1, interval="1h", limit=168)
-        df2 = get_data(symbol2, interval="1h", limit=168)
+        # Giá đã căn theo timestamp từ panel dùng chung (scan truyền panel của toàn bộ symbols)
+        if panel is None:
+            panel = get_price_panel([symbol1, symbol2])
         
-        if df1 is None or df2 is None:
+        if symbol1 not in panel or symbol2 not in panel:
             return None, None, None, None, None, None
         
-        if len(df1) < 100 or len(df2) < 100:
-            print(f"Bỏ qua {symbol1}-{symbol2}: không đủ dữ liệu ({len(df1)}, {len(df2)})")
+        # Chỉ giữ nến chung của 2 symbol
+        open_ms, close1, close2 = panel.pair(symbol1, symbol2)
+        if len(close1) < 100:
+            print(f"Bỏ qua {symbol1}-{symbol2}: không đủ dữ liệu (chung {len(close1)} nến)")
             return None, None, None, None, None, None
         
-        # Kiểm tra giá hằng số - cải thiện
-        if (df1['close'].std() == 0 or df2['close'].std() == 0 or 
-            df1['close'].nunique() <= 1 or df2['close'].nunique() <= 1 or
-            df1['close'].isna().any() or df2['close'].isna().any()):
+        # Scan, ranking ngay sau scan và re-rank trong cùng nến dùng lại kết quả đã tính
+        return pair_stats_memo.get_or_compute(
+            symbol1, symbol2, "1h", last_close_ms(open_ms, "1h"), ("correlation", len(close1)),
+            lambda: correlation_cointegration_stats(close1, close2))
+        
+    except Exception as e:
+        return None, None, None, None, None, None
+
+def correlation_cointegration_stats(close1, close2):
+    """(correlation, p_value, rolling_corr, vol1, vol2, None) trên giá đã căn; None nếu không đạt ngưỡng"""
+    try:
+        # Kiểm tra giá hằng số / missing values
+        if (np.isnan(close1).any() or np.isnan(close2).any() or
+            close1.min() == close1.max() or close2.min() == close2.max()):
             return None, None, None, None, None, None
         
         # Tính correlation
-        correlation = df1['close'].corr(df2['close'])
+        correlation = float(np.corrcoef(close1, close2)[0, 1])
         
         # Early exit nếu correlation quá thấp - tăng threshold
-        if pd.isna(correlation) or abs(correlation) < 0.5: 
+        if np.isnan(correlation) or abs(correlation) < 0.5: 
             return None, None, None, None, None, None
         
         # Tính rolling correlation (7 periods)
-        rolling_corr = df1['close'].rolling(7).corr(df2['close']).mean()
+        rolling_corr = rolling_correlation_mean(close1, close2, 7)
         
         # Kiểm tra cointegration với try-catch
         try:
-            result = coint(df1['close'], df2['close'])
+            from statsmodels.tsa.stattools import coint  # import nặng, chỉ cần khi scan
+            result = coint(close1, close2)
             p_value = result[1]
         except Exception as coint_error:
             return None, None, None, None, None, None
         
         # Kiểm tra p_value có hợp lệ không
-        if pd.isna(p_value):
+        if np.isnan(p_value):
             return None, None, None, None, None, None
         
         # Tính volatility
-        vol1 = df1['close'].pct_change().std() * np.sqrt(24)  # Annualized
-        vol2 = df2['close'].pct_change().std() * np.sqrt(24)
+        vol1 = pct_volatility(close1)  # Annualized
+        vol2 = pct_volatility(close2)
         
         return correlation, p_value, rolling_corr, vol1, vol2, None
         
     except Exception as e:
         return None, None, None, None, None, None
 
-def analyze_pair_batch(pair_batch):
+def analyze_pair_batch(pair_batch, panel=None, tested=None):
     results = []
     for symbol1, symbol2 in pair_batch:
-        correlation, p_value, rolling_corr, vol1, vol2, _ = calculate_correlation_cointegration(symbol1, symbol2)
+        correlation, p_value, rolling_corr, vol1, vol2, _ = calculate_correlation_cointegration(symbol1, symbol2, panel)
+        # Ghi lại p-value coint đầy đủ cho incremental scan hôm sau
+        if tested is not None and p_value is not None:
+            tested[f"{symbol1}|{symbol2}"] = {'p': float(p_value), 'corr': float(correlation)}
         
         # Chỉ lưu những cặp có correlation cao (>0.5) và cointegrated
         if (correlation is not None and p_value is not None and 
@@ -352,6 +413,84 @@ def analyze_pair_batch(pair_batch):
             })
     return results
 
+def analyze_pairs_incremental(pairs, panel, top_n=10):
+    """
+    Phân tích cặp ở chế độ incremental: correlation/volatility từ thống kê block đã lưu,
+    coint đầy đủ chỉ cho cặp gần ngưỡng; top cặp nhận từ test rẻ được xác nhận lại bằng coint đầy đủ.
+    Mỗi row có 'verified': False = chỉ qua test rẻ (ngoài top_n), không tính vào thống kê scan
+    """
+    with metrics.timer("scan_stage_seconds", stage="window_stats"):
+        stats = compute_window_stats(panel)
+    previous = load_pvalues()
+    if stats is None:
+        accepted, full = [], list(pairs)
+    else:
+        print(f"📊 Window stats: {len(stats.symbols)} symbols, {stats.blocks_reused} block dùng lại, "
+              f"{stats.blocks_computed} block tính mới")
+        accepted, full = triage_pairs(panel, stats, pairs, previous)
+
+    tested = {}
+    dispatcher = TaskDispatcher(lambda chunk: analyze_pair_batch(chunk, panel, tested), max_workers=SCAN_WORKERS,
+                                chunk_size=SCAN_CHUNK_SIZE, total=len(full), name="pair_analysis_full")
+    results = [dict(row, verified=True) for row in dispatcher.run(full)]
+
+    accepted_ids = {id(row) for row in accepted}
+    final = []
+    for row in sorted(results + accepted, key=lambda r: r['correlation'], reverse=True):
+        if id(row) in accepted_ids:
+            if len(final) < top_n:
+                checked = analyze_pair_batch([(row['pair1'], row['pair2'])], panel, tested)
+                if not checked:
+                    continue
+                row = dict(checked[0], verified=True)
+            else:
+                row = dict(row, verified=False)
+        final.append(row)
+
+    # Chỉ lưu p-value của coint đầy đủ: quyết định "hôm qua gần ngưỡng" của lần scan sau dựa trên test chuẩn
+    save_pvalues(tested)
+    return final
+
+def get_candidate_pairs(symbols, mode=None, top_k=None, distance_threshold=None, panel=None):
+    """Sinh candidate pairs cho bước 3 (cluster/knn theo return-correlation hoặc toàn bộ combinations)"""
+    mode = mode or PAIR_CANDIDATE_MODE
+    top_k = top_k or PAIR_CANDIDATE_TOP_K
+    distance_threshold = distance_threshold or PAIR_CLUSTER_DISTANCE
+    total = len(symbols) * (len(symbols) - 1) // 2
+
+    if mode == "all":
+        # Lazy: dispatcher lấy dần từng chunk, không materialize N*(N-1)/2 cặp
+        print(f"📊 Tổng số combinations: {total}")
+        return combinations(symbols, 2)
+
+    # Dữ liệu đã nằm trong cache từ bước kiểm tra chất lượng → không tốn thêm API call
+    panel = panel if panel is not None else get_price_panel(symbols)
+    returns = panel.returns_frame()
+    if returns.empty:
+        print("⚠️ Không build được returns matrix, fallback về toàn bộ combinations")
+        return list(combinations(symbols, 2))
+
+    pairs = generate_candidate_pairs(symbols, returns, mode=mode, top_k=top_k,
+                                     distance_threshold=distance_threshold)
+    ratio = (len(pairs) / total * 100) if total > 0 else 0
+    print(f"📊 Candidate pairs ({mode}): {len(pairs)}/{total} combinations ({ratio:.1f}%)")
+    return pairs
+
+def report_candidate_recall(symbols, candidate_pairs, found_count, sample_size=None, panel=None):
+    """Chạy phân tích trên mẫu các cặp bị loại để ước lượng recall so với scan exhaustive"""
+    sample_size = PAIR_RECALL_SAMPLE if sample_size is None else sample_size
+    sampled, n_excluded = sample_excluded_pairs(symbols, candidate_pairs, sample_size)
+    if not sampled:
+        print("📊 Recall: không có cặp bị loại để kiểm tra")
+        return None
+
+    hits = len(analyze_pair_batch(sampled, panel))
+    recall = estimate_recall(found_count, hits, len(sampled), n_excluded)
+    print(f"📊 Recall ước lượng: {recall:.1%} ({hits}/{len(sampled)} cặp mẫu bị loại là hợp lệ, {n_excluded} cặp bị loại)")
+    if recall < PAIR_MIN_RECALL:
+        print(f"⚠️ Recall thấp hơn ngưỡng {PAIR_MIN_RECALL:.0%} - tăng PAIR_CANDIDATE_TOP_K hoặc PAIR_CLUSTER_DISTANCE")
+    return recall
+
 def analyze_correlation_stats(results_df):
     """Phân tích thống kê correlation: min, max, mean, median, std"""
     stats = {}
@@ -375,7 +514,6 @@ def analyze_correlation_stats(results_df):
     print("===========================================\n")
 
     # Lưu thống kê vào Supabase
-    supabase_manager = SupabaseManager()
     success = supabase_manager.save_correlation_stats(stats)
     if success:
         print("✅ Đã lưu correlation stats vào Supabase thành công!")
@@ -384,57 +522,131 @@ def analyze_correlation_stats(results_df):
     return stats
     
 
-def scan_market_for_stable_pairs_optimized():
-    """Scan thị trường với tối ưu hóa parallel processing và data quality filter"""
+def analyze_pairs_checkpointed(pairs, panel, checkpoint, total_pairs, job=None):
+    """
+    Phân tích cặp qua dispatcher, mỗi chunk xong được ghi vào checkpoint; chạy lại bỏ qua cặp đã phân tích.
+    job (tuỳ chọn, chạy qua job queue): nhận progress/ETA, kết quả tạm và cancel_event
+    """
+    done, previous_results = checkpoint.load_chunks()
+    if done:
+        print(f"♻️ Resume pair analysis: {len(done)} cặp đã phân tích, {len(previous_results)} cặp hợp lệ từ checkpoint")
+        metrics.inc("scan_resumed_pairs_total", len(done))
+    remaining = (pair for pair in pairs if pair_key(*pair) not in done)
+
+    def run_chunk(chunk):
+        rows = analyze_pair_batch(chunk, panel)
+        checkpoint.record_chunk(chunk, rows)
+        if job is not None:
+            job.add_results(rows)
+        return rows
+
+    if job is not None:
+        job.add_results(previous_results)
+    # Worker rảnh tự lấy chunk nhỏ tiếp theo (không chia batch tĩnh), progress kèm throughput + ETA
+    dispatcher = TaskDispatcher(run_chunk, max_workers=SCAN_WORKERS, chunk_size=SCAN_CHUNK_SIZE,
+                                total=max(0, total_pairs - len(done)), name="pair_analysis",
+                                report_interval=1.0 if job is not None else 5.0,
+                                on_progress=job.report if job is not None else None,
+                                cancel_event=job.cancel_event if job is not None else None)
+    results = previous_results + dispatcher.run(remaining)
+    if job is not None:
+        job.check_cancelled()
+    return results
+
+def scan_market_for_stable_pairs_optimized(resume=True, job=None):
+    """
+    Scan thị trường với tối ưu hóa parallel processing và data quality filter.
+    Output mỗi stage được checkpoint theo ngày: chạy lại sau lỗi tiếp tục từ stage/chunk cuối (resume=False: scan lại từ đầu).
+    job: Job của job queue khi chạy theo yêu cầu qua API (progress theo stage, huỷ giữa các stage/chunk)
+    Chỉ một scan mỗi lúc trên cả máy (scheduler, catch-up, API): scan khác đang chạy → ScanInProgress ngay
+    """
+    with ScanLock():
+        # Đọc checkpoint sau khi có lock: scan vừa chạy xong ở process khác đã ghi đủ stage
+        checkpoint = ScanCheckpoint()
+        if not resume:
+            checkpoint.clear()
+        elif checkpoint.is_complete:
+            print(f"✅ Daily scan {checkpoint.day} đã hoàn thành (checkpoint), bỏ qua")
+            return checkpoint.get("daily_pairs")['pairs_data']
+        elif checkpoint.completed_stages():
+            print(f"♻️ Resume daily scan {checkpoint.day}: đã xong {', '.join(checkpoint.completed_stages())}")
+
+        try:
+            return _scan_with_checkpoint(checkpoint, job)
+        finally:
+            checkpoint.close()
+
+def _scan_stage(job, stage):
+    if job is not None:
+        job.check_cancelled()
+        job.update(stage=stage)
+
+def _scan_with_checkpoint(checkpoint, job=None):
     # Bước 1: Lọc cặp theo volume USDT (top 50%) - parallel
     print("🔍 BƯỚC 1: LỌC CẶP THEO VOLUME USDT (PARALLEL)")
-    filtered_pairs = filter_pairs_by_usdt_volume_parallel(top_percentile=50, max_workers=8)
-    
-    if not filtered_pairs:
-        print("❌ Không có cặp nào sau khi lọc volume")
-        return []
+    _scan_stage(job, "volume_filter")
+    filtered_pairs = checkpoint.get("volume_filter")
+    if filtered_pairs is None:
+        with metrics.timer("scan_stage_seconds", stage="volume_filter"):
+            filtered_pairs = filter_pairs_by_usdt_volume_parallel(top_percentile=50, max_workers=8)
+        
+        if not filtered_pairs:
+            print("❌ Không có cặp nào sau khi lọc volume")
+            return []
+        checkpoint.put("volume_filter", filtered_pairs)
     
     # Bước 2: Lọc theo chất lượng dữ liệu - parallel
     print(f"\n🔍 BƯỚC 2: LỌC THEO CHẤT LƯỢNG DỮ LIỆU (PARALLEL)")
-    quality_filtered_pairs = filter_data_quality_parallel(filtered_pairs, min_data_points=100, max_workers=8)
-    
-    if not quality_filtered_pairs:
-        print("❌ Không có cặp nào sau khi lọc chất lượng dữ liệu")
-        return []
+    _scan_stage(job, "quality_filter")
+    quality_filtered_pairs = checkpoint.get("quality_filter")
+    if quality_filtered_pairs is None:
+        with metrics.timer("scan_stage_seconds", stage="data_quality"):
+            quality_filtered_pairs = filter_data_quality_parallel(filtered_pairs, min_data_points=100, max_workers=8)
+        
+        if not quality_filtered_pairs:
+            print("❌ Không có cặp nào sau khi lọc chất lượng dữ liệu")
+            return []
+        checkpoint.put("quality_filter", quality_filtered_pairs)
     
     # Bước 3: Tạo combinations và phân tích parallel
     print(f"\n🔍 BƯỚC 3: PHÂN TÍCH COMBINATIONS (PARALLEL)")
     print(f"📊 Đang tạo combinations từ {len(quality_filtered_pairs)} cặp...")
     
-    pair_combinations = list(combinations(quality_filtered_pairs, 2))
-    print(f"📊 Tổng số combinations: {len(pair_combinations)}")
-    
-    # Chia combinations thành batches cho parallel processing
-    max_workers = 6  # Giảm số workers để tránh rate limit
-    batch_size = max(1, len(pair_combinations) // max_workers)
-    batches = [pair_combinations[i:i + batch_size] for i in range(0, len(pair_combinations), batch_size)]
-    
-    # Parallel processing với progress tracking
-    results = []
-    completed_batches = 0
-    
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_batch = {executor.submit(analyze_pair_batch, batch): batch for batch in batches}
-        
-        for future in as_completed(future_to_batch):
-            batch_results = future.result()
-            results.extend(batch_results)
-            completed_batches += 1
-            
-            # Progress tracking
-            progress = (completed_batches / len(batches)) * 100
-            print(f"📈 Progress: {progress:.1f}% ({completed_batches}/{len(batches)} batches) - Found {len(results)} valid pairs")
-    
+    # Một panel căn theo timestamp cho toàn bộ symbols, dùng chung cho mọi cặp (không merge theo từng cặp)
+    with metrics.timer("scan_stage_seconds", stage="panel"):
+        panel = get_price_panel(quality_filtered_pairs)
+    
+    _scan_stage(job, "pair_analysis")
+    results = checkpoint.get("pair_analysis")
+    pair_combinations = None
+    if results is None:
+        with metrics.timer("scan_stage_seconds", stage="candidates"):
+            pair_combinations = get_candidate_pairs(quality_filtered_pairs, panel=panel)
+        n_symbols = len(quality_filtered_pairs)
+        total_pairs = len(pair_combinations) if isinstance(pair_combinations, list) else n_symbols * (n_symbols - 1) // 2
+        metrics.set_gauge("scan_candidate_pairs", total_pairs)
+        
+        with metrics.timer("scan_stage_seconds", stage="pair_analysis"):
+            if SCAN_MODE == "incremental":
+                results = analyze_pairs_incremental(pair_combinations, panel)
+            else:
+                results = analyze_pairs_checkpointed(pair_combinations, panel, checkpoint, total_pairs, job)
+        checkpoint.put("pair_analysis", results)
+    # Incremental: cặp chỉ qua test rẻ (verified=False) không tính vào thống kê/top cặp
+    verified = [row for row in results if row.get('verified', True)]
+    unverified = len(results) - len(verified)
+    metrics.set_gauge("scan_valid_pairs", len(verified))
+    
+    # Ước lượng recall của candidate stage so với scan exhaustive
+    if pair_combinations is not None and PAIR_CANDIDATE_MODE != "all":
+        report_candidate_recall(quality_filtered_pairs, pair_combinations, len(verified), panel=panel)
+
     # Bước 4: Phân tích kết quả
     print(f"\n📊 BƯỚC 4: PHÂN TÍCH KẾT QUẢ")
-    print(f"✅ Tìm thấy {len(results)} cặp có correlation cao và cointegrated")
+    print(f"✅ Tìm thấy {len(verified)} cặp có correlation cao và cointegrated"
+          + (f" (+{unverified} cặp chỉ qua test rẻ, chưa xác nhận)" if unverified else ""))
     
-    results_df = pd.DataFrame(results)
+    results_df = pd.DataFrame(verified)
     
     if len(results_df) > 0:
         analyze_correlation_stats(results_df)
@@ -456,31 +668,26 @@ def scan_market_for_stable_pairs_optimized():
             
             print(f"{rank:<5} {pair:<20} {corr:<12} {p_val:<12} {coint:<12}")
         
-        # Lưu chỉ top 10 vào Supabase
-        today = datetime.now().date()
-        pairs_data = []
-        for idx, row in top_10_pairs.iterrows():
-            pairs_data.append({
-                'date': str(today),
-                'pair1': row['pair1'],
-                'pair2': row['pair2'],
-                'correlation': float(row['correlation']),
-                'rolling_correlation': float(row['rolling_correlation']) if not pd.isna(row['rolling_correlation']) else None,
-                'cointegration_p_value': float(row['cointegration_p_value']),
-                'is_cointegrated': bool(row['is_cointegrated']),
-                'volatility_1': float(row['volatility_1']) if not pd.isna(row['volatility_1']) else None,
-                'volatility_2': float(row['volatility_2']) if not pd.isna(row['volatility_2']) else None,
-                'rank': int(idx) + 1
-            })
+        _scan_stage(job, "save")
+        # Lưu chỉ top 10 vào Supabase (một lần mỗi ngày: chạy lại sau lỗi dùng ID đã lưu trong checkpoint)
+        saved = checkpoint.get("daily_pairs")
+        if saved is not None:
+            pairs_data, saved_pairs = saved['pairs_data'], saved['saved_pairs']
+        else:
+            pairs_data, saved_pairs = build_daily_pairs_data(top_10_pairs), None
         
-        # Lưu daily pairs và lấy lại để có ID
-        saved_pairs = supabase_manager.save_daily_pairs(pairs_data)
-        print(f"✅ Đã lưu top 10 cặp vào database")
+        if saved_pairs is None:
+            saved_pairs = supabase_manager.save_daily_pairs(pairs_data)
+            if saved_pairs is None:
+                print("❌ Lưu daily pairs thất bại, chạy lại scan để tiếp tục từ bước lưu")
+                return []
+            checkpoint.put("daily_pairs", {'pairs_data': pairs_data, 'saved_pairs': saved_pairs})
+            print(f"✅ Đã lưu top 10 cặp vào database")
 
         # Lưu hourly ranking với ID trực tiếp từ saved_pairs
         ranking_data = []
         for idx, pair in enumerate(saved_pairs):
-            correlation, p_value, rolling_corr, vol1, vol2, _ = calculate_correlation_cointegration(pair['pair1'], pair['pair2'])
+            correlation, p_value, rolling_corr, vol1, vol2, _ = calculate_correlation_cointegration(pair['pair1'], pair['pair2'], panel)
             if correlation is not None:
                 ranking_data.append({
                     'timestamp': datetime.now().isoformat(),
@@ -494,44 +701,161 @@ def scan_market_for_stable_pairs_optimized():
                 print(f"✅ Hourly ranking: {pair['pair1']}-{pair['pair2']}: pair_id {pair['id']}")
         
         if ranking_data:
-            supabase_manager.update_hourly_ranking(ranking_data)
+            if supabase_manager.update_hourly_ranking(ranking_data) is None:
+                print("❌ Lưu hourly ranking thất bại, chạy lại scan để tiếp tục từ bước ranking")
+                return pairs_data
             print(f"✅ Đã lưu hourly ranking với {len(ranking_data)} pairs")
         else:
             print("⚠️ Không có hourly ranking data để lưu")
+        checkpoint.put("ranking", len(ranking_data))
 
         return pairs_data
     else:
         print("❌ Không tìm thấy cặp nào hợp lệ")
+        checkpoint.put("daily_pairs", {'pairs_data': [], 'saved_pairs': []})
+        checkpoint.put("ranking", 0)
         return []
 
-def reorder_pairs_by_correlation():
+def build_daily_pairs_data(top_pairs):
+    """Rows daily_pairs cho top cặp (rank theo thứ tự correlation)"""
+    today = datetime.now().date()
+    pairs_data = []
+    for idx, row in top_pairs.iterrows():
+        pairs_data.append({
+            'date': str(today),
+            'pair1': row['pair1'],
+            'pair2': row['pair2'],
+            'correlation': float(row['correlation']),
+            'rolling_correlation': float(row['rolling_correlation']) if not pd.isna(row['rolling_correlation']) else None,
+            'cointegration_p_value': float(row['cointegration_p_value']),
+            'is_cointegrated': bool(row['is_cointegrated']),
+            'volatility_1': float(row['volatility_1']) if not pd.isna(row['volatility_1']) else None,
+            'volatility_2': float(row['volatility_2']) if not pd.isna(row['volatility_2']) else None,
+            'rank': int(idx) + 1
+        })
+    return pairs_data
+
+def is_pair_decayed(correlation, p_value):
+    """Cặp bị loại khỏi ranking khi mất cointegration hoặc correlation giảm dưới ngưỡng"""
+    if correlation is None or p_value is None:
+        return True
+    return abs(correlation) < REORDER_MIN_CORRELATION or p_value >= REORDER_MAX_P_VALUE
+
+def compute_pair_stats_full(top_pairs):
+    """Tính lại toàn bộ correlation/cointegration trên 168 nến cho từng cặp"""
+    pairs_with_correlation = []
+    panel = get_price_panel([symbol for pair in top_pairs for symbol in (pair['pair1'], pair['pair2'])])
+    for pair in top_pairs:
+        correlation, p_value, rolling_corr, vol1, vol2, _ = calculate_correlation_cointegration(pair['pair1'], pair['pair2'], panel)
+        if correlation is None:
+            print(f"⚠️ Bỏ qua {pair['pair1']}-{pair['pair2']}: không tính được correlation")
+            continue
+        pairs_with_correlation.append({
+            'pair': pair,
+            'correlation': correlation,
+            'p_value': p_value,
+            'rolling_correlation': rolling_corr,
+            'volatility_1': vol1,
+            'volatility_2': vol2
+        })
+        print(f"📊 {pair['pair1']}-{pair['pair2']}: corr {correlation:.4f}, p-value {p_value:.4f}")
+    return pairs_with_correlation
+
+def compute_pair_stats_incremental(top_pairs, window=168):
+    """
+    Cập nhật online stats chỉ với các nến mới kể từ lần chạy trước:
+    - Correlation từ running cross-products, hedge ratio từ RLS
+    - Re-test cointegration bằng ADF lag cố định thay cho coint đầy đủ
+    """
+    stats_by_pair = load_online_stats()
+    # State cũ hơn cả cửa sổ thì không còn giá trị → tính lại từ đầu
+    stale_before = int(time.time() * 1000) - window * 3600 * 1000
+    for key in [k for k, v in stats_by_pair.items() if v.last_timestamp is None or v.last_timestamp < stale_before]:
+        del stats_by_pair[key]
+
+    # Mỗi symbol chỉ fetch một lần, từ nến cũ nhất còn thiếu trong các cặp của nó
+    since_by_symbol = {}
+    for pair in top_pairs:
+        key = f"{pair['pair1']}-{pair['pair2']}"
+        stats = stats_by_pair.get(key)
+        since = stats.last_timestamp + 1 if stats and stats.last_timestamp is not None else None
+        for symbol in (pair['pair1'], pair['pair2']):
+            if symbol not in since_by_symbol:
+                since_by_symbol[symbol] = since
+            elif since_by_symbol[symbol] is not None:
+                since_by_symbol[symbol] = None if since is None else min(since_by_symbol[symbol], since)
+
+    new_bars = {}
+    for symbol, since in since_by_symbol.items():
+        new_bars[symbol] = get_closed_klines(symbol, interval="1h", limit=window, start_time=since)
+
+    pairs_with_correlation = []
+    for pair in top_pairs:
+        key = f"{pair['pair1']}-{pair['pair2']}"
+        k1, k2 = new_bars.get(pair['pair1']), new_bars.get(pair['pair2'])
+        stats = stats_by_pair.get(key) or OnlinePairStats(window=window)
+        stats_by_pair[key] = stats
+
+        if k1 is not None and k2 is not None and len(k1) > 0 and len(k2) > 0:
+            common, close1, close2 = align(k1, k2)
+            # x = pair2, y = pair1 để khớp với coint(df1, df2)
+            added = stats.update(common, close2, close1)
+            print(f"🔄 {key}: +{added} nến mới (window {len(stats)}/{window})")
+
+        if len(stats) < 100:
+            print(f"⚠️ Bỏ qua {key}: không đủ dữ liệu ({len(stats)})")
+            continue
+
+        correlation = stats.correlation()
+        p_value = stats.cointegration_pvalue()
+        if correlation is None or p_value is None:
+            print(f"⚠️ Bỏ qua {key}: không tính được correlation")
+            continue
+        vol1, vol2 = stats.volatilities()
+        pairs_with_correlation.append({
+            'pair': pair,
+            'correlation': correlation,
+            'p_value': p_value,
+            'rolling_correlation': stats.rolling_correlation(),
+            # volatilities() trả về (x, y) = (pair2, pair1)
+            'volatility_1': vol2,
+            'volatility_2': vol1
+        })
+        print(f"📊 {key}: corr {correlation:.4f}, p-value {p_value:.4f}, hedge ratio (RLS) {stats.hedge_ratio():.4f}")
+
+    # Chỉ giữ state cho các cặp còn được theo dõi
+    tracked = {f"{pair['pair1']}-{pair['pair2']}" for pair in top_pairs}
+    save_online_stats({key: stats for key, stats in stats_by_pair.items() if key in tracked})
+    return pairs_with_correlation
+
+def reorder_pairs_by_correlation(mode=None):
+    mode = mode or REORDER_MODE
     # Get today's pairs
     top_pairs = supabase_manager.get_current_top_n(DAILY_TOP_N)
     ranking_data = []
     
-    print(f"🔄 Reordering {len(top_pairs)} pairs by correlation...")
+    print(f"🔄 Reordering {len(top_pairs)} pairs by correlation (mode={mode})...")
     
     # Tính correlation mới cho tất cả pairs
-    pairs_with_correlation = []
-    for pair in top_pairs:
-        correlation, p_value, rolling_corr, vol1, vol2, _ = calculate_correlation_cointegration(pair['pair1'], pair['pair2'])
-        if correlation is not None:
-            pairs_with_correlation.append({
-                'pair': pair,
-                'correlation': correlation,
-                'rolling_correlation': rolling_corr,
-                'volatility_1': vol1,
-                'volatility_2': vol2
-            })
-            print(f"📊 {pair['pair1']}-{pair['pair2']}: corr {correlation:.4f}")
-        else:
-            print(f"⚠️ Bỏ qua {pair['pair1']}-{pair['pair2']}: không tính được correlation")
+    if mode == "incremental":
+        pairs_with_correlation = compute_pair_stats_incremental(top_pairs)
+    else:
+        pairs_with_correlation = compute_pair_stats_full(top_pairs)
+
+    # Loại các cặp đã mất cointegration/correlation khỏi ranking
+    active_pairs = []
+    for pair_data in pairs_with_correlation:
+        pair = pair_data['pair']
+        if is_pair_decayed(pair_data['correlation'], pair_data['p_value']):
+            print(f"📉 Loại {pair['pair1']}-{pair['pair2']}: corr {pair_data['correlation']:.4f}, p-value {pair_data['p_value']:.4f}")
+            continue
+        active_pairs.append(pair_data)
     
     # Sắp xếp theo correlation mới (cao → thấp)
-    pairs_with_correlation.sort(key=lambda x: x['correlation'], reverse=True)
+    active_pairs.sort(key=lambda x: x['correlation'], reverse=True)
     
     # Tạo ranking data với rank đúng
-    for idx, pair_data in enumerate(pairs_with_correlation):
+    for idx, pair_data in enumerate(active_pairs):
         pair = pair_data['pair']
         ranking_data.append({
             'timestamp': datetime.now().isoformat(),
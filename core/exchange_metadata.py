@@ -0,0 +1,182 @@
+# exchange_metadata.py
+"""
+Cache metadata sàn (futures_exchange_info) dùng chung cả process:
+- Tải một lần, tự refresh khi quá EXCHANGE_METADATA_TTL giây; refresh lỗi thì giữ bản cũ
+- Mỗi symbol: status, contract type, tickSize, stepSize, min notional, onboard date
+- Precision/rounding giá theo tickSize thật thay vì đoán từ chuỗi giá;
+  lọc sớm symbol mới list chưa đủ nến trước khi tải klines
+"""
+import time
+import threading
+from decimal import Decimal
+from config import EXCHANGE_METADATA_TTL
+from core import clock
+from core import metrics
+from core.clients import get_binance_client
+from core.klines import INTERVAL_MS
+from core.singleflight import SingleFlight
+
+_lock = threading.Lock()
+_symbols = {}
+_loaded_at = None
+_refresh_group = SingleFlight()
+_failed_at = None
+# Refresh lỗi thì dùng tạm cache cũ, chỉ thử lại sau khoảng này (không retry ở mọi lần tra cứu)
+RETRY_AFTER_SECONDS = 60
+
+
+class SymbolInfo:
+    """Metadata một symbol futures (giá trị số đã parse từ filters)"""
+
+    __slots__ = ('symbol', 'status', 'contract_type', 'quote_asset', 'tick_size', 'step_size',
+                 'min_notional', 'onboard_ms', 'price_precision', 'quantity_precision')
+
+    def __init__(self, symbol, status, contract_type, quote_asset, tick_size=None, step_size=None,
+                 min_notional=None, onboard_ms=None):
+        self.symbol = symbol
+        self.status = status
+        self.contract_type = contract_type
+        self.quote_asset = quote_asset
+        self.tick_size = tick_size
+        self.step_size = step_size
+        self.min_notional = min_notional
+        self.onboard_ms = onboard_ms
+        self.price_precision = decimals(tick_size)
+        self.quantity_precision = decimals(step_size)
+
+    @classmethod
+    def from_exchange_info(cls, entry):
+        filters = {f.get('filterType'): f for f in entry.get('filters', [])}
+        tick_size = filters.get('PRICE_FILTER', {}).get('tickSize')
+        step_size = filters.get('LOT_SIZE', {}).get('stepSize')
+        min_notional = filters.get('MIN_NOTIONAL', {})
+        min_notional = min_notional.get('notional', min_notional.get('minNotional'))
+        onboard_ms = entry.get('onboardDate')
+        return cls(
+            entry['symbol'],
+            entry.get('status'),
+            entry.get('contractType'),
+            entry.get('quoteAsset') or ('USDT' if entry['symbol'].endswith('USDT') else None),
+            tick_size=Decimal(tick_size) if tick_size else None,
+            step_size=Decimal(step_size) if step_size else None,
+            min_notional=float(min_notional) if min_notional else None,
+            onboard_ms=int(onboard_ms) if onboard_ms else None
+        )
+
+    @property
+    def is_usdt_perpetual(self):
+        return self.status == 'TRADING' and self.contract_type == 'PERPETUAL' and self.symbol.endswith('USDT')
+
+    def round_price(self, price):
+        """Làm tròn giá về bội số tickSize gần nhất"""
+        if not self.tick_size:
+            return price
+        tick = float(self.tick_size)
+        return round(round(price / tick) * tick, self.price_precision)
+
+    def round_quantity(self, quantity):
+        """Làm tròn xuống số lượng theo stepSize (không vượt vốn)"""
+        if not self.step_size:
+            return quantity
+        step = float(self.step_size)
+        # epsilon tránh floor sai khi quantity/step là số nguyên nhưng float lệch xuống
+        return round(int(quantity / step + 1e-9) * step, self.quantity_precision)
+
+    def listing_age_ms(self, now_ms=None):
+        if self.onboard_ms is None:
+            return None
+        now_ms = int(clock.time() * 1000) if now_ms is None else now_ms
+        return now_ms - self.onboard_ms
+
+
+def decimals(step):
+    """Số chữ số thập phân của tickSize/stepSize: Decimal('0.00010000') → 4"""
+    if not step:
+        return 0
+    return max(0, -step.normalize().as_tuple().exponent)
+
+
+def refresh_exchange_metadata(max_retries=3):
+    """Tải lại exchange info; True nếu thành công (lỗi thì giữ cache cũ)"""
+    global _symbols, _loaded_at, _failed_at
+    for attempt in range(max_retries):
+        try:
+            exchange_info = get_binance_client().futures_exchange_info()
+            symbols = {}
+            for entry in exchange_info['symbols']:
+                info = SymbolInfo.from_exchange_info(entry)
+                symbols[info.symbol] = info
+            with _lock:
+                _symbols = symbols
+                _loaded_at = clock.time()
+                _failed_at = None
+            metrics.inc("exchange_metadata_refresh_total", result="ok")
+            metrics.set_gauge("exchange_metadata_symbols", len(symbols))
+            return True
+        except Exception as e:
+            if attempt < max_retries - 1:
+                print(f"⚠️  Retry {attempt + 1}/{max_retries} getting exchange info: {e}")
+                time.sleep(2)
+            else:
+                print(f"❌ Error getting exchange info after {max_retries} attempts: {e}")
+    with _lock:
+        _failed_at = clock.time()
+    metrics.inc("exchange_metadata_refresh_total", result="error")
+    return False
+
+def get_exchange_metadata(max_age=None):
+    """Dict symbol → SymbolInfo, refresh khi cache rỗng hoặc quá hạn"""
+    max_age = EXCHANGE_METADATA_TTL if max_age is None else max_age
+    with _lock:
+        now = clock.time()
+        stale = _loaded_at is None or now - _loaded_at >= max_age
+        backing_off = _failed_at is not None and now - _failed_at < RETRY_AFTER_SECONDS
+    if stale and not backing_off:
+        # Nhiều thread cùng thấy cache hết hạn chỉ gọi exchange info một lần
+        _refresh_group.do("exchange_info", refresh_exchange_metadata)
+    with _lock:
+        return _symbols
+
+def get_symbol_info(symbol):
+    return get_exchange_metadata().get(symbol)
+
+def clear_exchange_metadata():
+    global _symbols, _loaded_at, _failed_at
+    with _lock:
+        _symbols = {}
+        _loaded_at = None
+        _failed_at = None
+
+
+def usdt_perpetual_symbols():
+    """Các cặp USDT perpetual đang TRADING"""
+    return [symbol for symbol, info in get_exchange_metadata().items() if info.is_usdt_perpetual]
+
+def price_precision(symbol, price=None):
+    """Số thập phân của giá theo tickSize; symbol chưa có metadata thì đoán từ giá (2-8 chữ số)"""
+    info = get_symbol_info(symbol)
+    if info is not None and info.tick_size:
+        return info.price_precision
+    if price is None:
+        return 8
+    price_str = f"{price:.10f}".rstrip('0').rstrip('.')
+    guessed = len(price_str.split('.')[1]) if '.' in price_str else 0
+    return max(2, min(8, guessed))
+
+def round_price(symbol, price):
+    info = get_symbol_info(symbol)
+    if info is not None and info.tick_size:
+        return info.round_price(price)
+    return round(price, price_precision(symbol, price))
+
+def split_by_listing_age(symbols, min_bars, interval="1h", now_ms=None):
+    """(đủ tuổi, quá mới): symbol list chưa đủ min_bars nến `interval` thì không cần tải klines"""
+    now_ms = int(clock.time() * 1000) if now_ms is None else now_ms
+    min_age = min_bars * INTERVAL_MS[interval]
+    metadata = get_exchange_metadata()
+    old_enough, too_new = [], []
+    for symbol in symbols:
+        info = metadata.get(symbol)
+        age = info.listing_age_ms(now_ms) if info is not None else None
+        (too_new if age is not None and age < min_age else old_enough).append(symbol)
+    return old_enough, too_new
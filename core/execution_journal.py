@@ -0,0 +1,133 @@
+# execution_journal.py
+import os
+import json
+import threading
+from core import clock
+
+
+class ExecutionJournal:
+    """
+    Journal idempotency cho signals đã execute, thay cho set() trong RAM:
+    - Tra cứu O(1) theo signal key, entry hết hạn sau ttl_seconds → bộ nhớ bị chặn
+    - Mỗi lần add() ghi thêm một dòng JSON vào log append-only → restart không execute lại signal
+    - Log được compact (chỉ giữ entry còn hạn, atomic rename) khi số dòng chết vượt ngưỡng
+    """
+
+    def __init__(self, path=None, ttl_seconds=6 * 3600, compact_every=1000):
+        self._lock = threading.Lock()
+        self.path = path
+        self.ttl_seconds = float(ttl_seconds)
+        self.compact_every = int(compact_every)
+        # key → thời điểm ghi (epoch seconds); dict giữ thứ tự chèn ≈ thứ tự thời gian
+        self._entries = {}
+        self._log_lines = 0
+        self._file = None
+        if path:
+            self._load()
+
+    # ---------- Queries ----------
+
+    def __contains__(self, key):
+        with self._lock:
+            recorded = self._entries.get(key)
+            return recorded is not None and recorded > clock.time() - self.ttl_seconds
+
+    def __len__(self):
+        with self._lock:
+            self._expire()
+            return len(self._entries)
+
+    # ---------- Mutations ----------
+
+    def add(self, key):
+        """Ghi nhận signal đã execute; False nếu key đã có trong journal"""
+        with self._lock:
+            now = clock.time()
+            recorded = self._entries.get(key)
+            if recorded is not None and recorded > now - self.ttl_seconds:
+                return False
+            self._entries.pop(key, None)
+            self._entries[key] = now
+            self._append({'k': key, 't': now})
+            self._expire(now)
+            if self._log_lines - len(self._entries) >= self.compact_every:
+                self._compact()
+            return True
+
+    def compact(self):
+        with self._lock:
+            self._expire()
+            self._compact()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # ---------- Internals ----------
+
+    def _expire(self, now=None):
+        cutoff = (clock.time() if now is None else now) - self.ttl_seconds
+        while self._entries:
+            key = next(iter(self._entries))
+            if self._entries[key] > cutoff:
+                break
+            del self._entries[key]
+
+    def _load(self):
+        """Đọc lại log khi khởi động; bỏ qua dòng hỏng (ví dụ dòng cuối ghi dở khi crash)"""
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    self._log_lines += 1
+                    try:
+                        entry = json.loads(line)
+                        self._entries.pop(entry['k'], None)
+                        self._entries[entry['k']] = float(entry['t'])
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"⚠️ Không đọc được execution journal ({self.path}): {e}")
+            return
+        # Log có thể ghi từ clock khác thứ tự → sắp lại trước khi expire từ đầu
+        self._entries = dict(sorted(self._entries.items(), key=lambda item: item[1]))
+        self._expire()
+        if self._log_lines > len(self._entries):
+            self._compact()
+
+    def _append(self, entry):
+        if not self.path:
+            return
+        try:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                self._file = open(self.path, 'a')
+            self._file.write(json.dumps(entry) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._log_lines += 1
+        except Exception as e:
+            print(f"❌ Không ghi được execution journal ({self.path}): {e}")
+
+    def _compact(self):
+        """Ghi lại log chỉ với entry còn hạn (atomic rename)"""
+        if not self.path:
+            self._log_lines = len(self._entries)
+            return
+        try:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                for key, recorded in self._entries.items():
+                    f.write(json.dumps({'k': key, 't': recorded}) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._log_lines = len(self._entries)
+        except Exception as e:
+            print(f"❌ Không compact được execution journal ({self.path}): {e}")
@@ -0,0 +1,226 @@
+# incremental_scan.py
+"""
+Daily scan incremental (SCAN_MODE="incremental"):
+- Sufficient statistics (Σx, Σx², Σxy, Σr, Σr²) theo block ngày UTC, lưu ra STATE_DIR/scan_blocks/<day>.npz.
+  Block ngày đã đóng không đổi → hôm sau chỉ tính block mới (24 nến) + block đầu cắt dở của cửa sổ
+- Correlation/volatility của mọi cặp suy ra từ tổng các block (ma trận N×N), không lặp từng cặp
+- Cointegration: Engle-Granger lag cố định (rẻ) cho cặp qua ngưỡng correlation; coint đầy đủ chỉ chạy
+  cho cặp gần ngưỡng (p-value/correlation) hoặc hôm qua gần ngưỡng, cặp mới/thiếu nến đi đường full
+"""
+import os
+import json
+import threading
+import numpy as np
+from config import (STATE_DIR, SCAN_CORRELATION_BAND, SCAN_FULL_COINT_MIN_P, SCAN_FULL_COINT_MAX_P)
+from core import clock
+from core import metrics
+from core.online_stats import engle_granger_pvalue, rolling_correlation_mean
+
+DAY_MS = 86_400_000
+HOUR_MS = 3_600_000
+MIN_CORRELATION = 0.5
+MAX_P_VALUE = 0.05
+
+SCAN_BLOCK_DIR = os.path.join(STATE_DIR, "scan_blocks")
+SCAN_PVALUE_FILE = os.path.join(STATE_DIR, "scan_pvalues.json")
+_state_lock = threading.Lock()
+
+
+# ---------- Block statistics ----------
+
+def block_stats(closes, previous=None):
+    """Sufficient statistics của một block nến (m × N); previous = hàng giá ngay trước block để tính return đầu"""
+    rows = closes if previous is None else np.vstack([previous, closes])
+    returns = np.diff(rows, axis=0) / rows[:-1]
+    return {
+        'n': np.float64(len(closes)),
+        'sx': closes.sum(axis=0),
+        'sxx': np.einsum('ij,ij->j', closes, closes),
+        'sxy': closes.T @ closes,
+        'nr': np.float64(len(returns)),
+        'sr': returns.sum(axis=0),
+        'srr': np.einsum('ij,ij->j', returns, returns)
+    }
+
+def _block_path(day_ms, directory):
+    return os.path.join(directory, f"{day_ms}.npz")
+
+def load_block(day_ms, symbols, directory=SCAN_BLOCK_DIR):
+    """Block đã lưu, cắt theo thứ tự `symbols`; None nếu chưa có hoặc thiếu symbol"""
+    try:
+        with np.load(_block_path(day_ms, directory)) as data:
+            index = {symbol: i for i, symbol in enumerate(data['symbols'].tolist())}
+            if not all(symbol in index for symbol in symbols):
+                return None
+            idx = np.array([index[symbol] for symbol in symbols], dtype=np.intp)
+            return {
+                'n': data['n'][()], 'nr': data['nr'][()],
+                'sx': data['sx'][idx], 'sxx': data['sxx'][idx],
+                'sxy': data['sxy'][np.ix_(idx, idx)],
+                'sr': data['sr'][idx], 'srr': data['srr'][idx]
+            }
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"⚠️ Không đọc được scan block {day_ms}: {e}")
+        return None
+
+def save_block(day_ms, symbols, stats, directory=SCAN_BLOCK_DIR):
+    try:
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = os.path.join(directory, f"{day_ms}.tmp.npz")
+        np.savez(tmp_path, symbols=np.array(symbols), **stats)
+        os.replace(tmp_path, _block_path(day_ms, directory))
+    except Exception as e:
+        print(f"❌ Không lưu được scan block {day_ms}: {e}")
+
+def prune_blocks(oldest_day_ms, directory=SCAN_BLOCK_DIR):
+    """Xoá block đã trượt ra khỏi cửa sổ"""
+    try:
+        for name in os.listdir(directory):
+            stem = name.split('.')[0]
+            if stem.isdigit() and int(stem) < oldest_day_ms:
+                os.remove(os.path.join(directory, name))
+    except FileNotFoundError:
+        pass
+
+
+class WindowStats:
+    """Correlation (N×N) và volatility (N) của cửa sổ từ tổng sufficient statistics các block"""
+
+    def __init__(self, symbols, total, blocks_reused=0, blocks_computed=0):
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.blocks_reused = blocks_reused
+        self.blocks_computed = blocks_computed
+        n = total['n']
+        var = n * total['sxx'] - total['sx'] ** 2
+        cov = n * total['sxy'] - np.outer(total['sx'], total['sx'])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.correlation = cov / np.sqrt(np.outer(var, var))
+            nr = total['nr']
+            self.volatility = np.sqrt((total['srr'] - total['sr'] ** 2 / nr) / (nr - 1)) * np.sqrt(24)
+
+    def __contains__(self, symbol):
+        return symbol in self.index
+
+    def pair(self, symbol1, symbol2):
+        i, j = self.index[symbol1], self.index[symbol2]
+        return float(self.correlation[i, j]), float(self.volatility[i]), float(self.volatility[j])
+
+
+def compute_window_stats(panel, window=168, now_ms=None, directory=SCAN_BLOCK_DIR):
+    """
+    WindowStats cho các symbol đủ `window` nến cuối của panel.
+    Block ngày UTC nằm trọn trong cửa sổ và đã đóng được đọc lại từ disk (hoặc tính rồi lưu);
+    block đầu/cuối cắt dở luôn tính từ panel
+    """
+    now_ms = int(clock.time() * 1000) if now_ms is None else now_ms
+    rows = slice(max(0, len(panel) - window), len(panel))
+    open_time = panel.open_time[rows]
+    valid = panel.valid[rows]
+    symbols = [symbol for j, symbol in enumerate(panel.symbols) if valid[:, j].all()]
+    if len(open_time) < 2 or len(symbols) < 2:
+        return None
+    columns = np.array([panel.symbols.index(symbol) for symbol in symbols], dtype=np.intp)
+    closes = panel.closes[rows][:, columns]
+
+    days = open_time - open_time % DAY_MS
+    starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    ends = np.r_[starts[1:], len(days)]
+    total = None
+    reused = computed = 0
+    for block, (start, end) in enumerate(zip(starts, ends)):
+        day = int(days[start])
+        cacheable = (block > 0 and end - start == 24 and open_time[end - 1] + HOUR_MS <= now_ms)
+        stats = load_block(day, symbols, directory) if cacheable else None
+        if stats is None:
+            stats = block_stats(closes[start:end], closes[start - 1] if start > 0 else None)
+            computed += 1
+            if cacheable:
+                save_block(day, symbols, stats, directory)
+        else:
+            reused += 1
+        total = stats if total is None else {key: total[key] + stats[key] for key in total}
+    prune_blocks(int(days[0]), directory)
+    metrics.inc("scan_blocks_total", reused, result="reused")
+    metrics.inc("scan_blocks_total", computed, result="computed")
+    return WindowStats(symbols, total, reused, computed)
+
+
+# ---------- p-value journal (kết quả coint đầy đủ hôm trước) ----------
+
+def load_pvalues(path=SCAN_PVALUE_FILE):
+    with _state_lock:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"⚠️ Không đọc được scan p-values ({path}): {e}")
+            return {}
+
+def save_pvalues(pvalues, path=SCAN_PVALUE_FILE):
+    with _state_lock:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(pvalues, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"❌ Không lưu được scan p-values ({path}): {e}")
+
+def near_threshold(correlation=None, p_value=None):
+    """Cặp cần coint đầy đủ: correlation sát 0.5 hoặc p-value trong vùng không chắc chắn quanh 0.05"""
+    if correlation is not None and abs(abs(correlation) - MIN_CORRELATION) <= SCAN_CORRELATION_BAND:
+        return True
+    return p_value is not None and SCAN_FULL_COINT_MIN_P <= p_value <= SCAN_FULL_COINT_MAX_P
+
+
+def result_row(symbol1, symbol2, correlation, rolling_corr, p_value, vol1, vol2):
+    return {
+        'pair1': symbol1,
+        'pair2': symbol2,
+        'correlation': correlation,
+        'rolling_correlation': rolling_corr,
+        'cointegration_p_value': p_value,
+        'is_cointegrated': p_value < MAX_P_VALUE,
+        'volatility_1': vol1,
+        'volatility_2': vol2
+    }
+
+def triage_pairs(panel, stats, pairs, previous_pvalues):
+    """
+    Phân loại candidate pairs bằng thống kê cửa sổ (không chạy coint đầy đủ):
+    - accepted: kết quả từ test rẻ, xa ngưỡng → chấp nhận luôn
+    - full: cần coint đầy đủ (gần ngưỡng, hôm qua gần ngưỡng, hoặc symbol thiếu nến)
+    Cặp có |correlation| dưới ngưỡng xa hoặc p-value rẻ quá cao bị loại ngay
+    """
+    accepted, full = [], []
+    rejected = 0
+    for symbol1, symbol2 in pairs:
+        if symbol1 not in stats or symbol2 not in stats:
+            full.append((symbol1, symbol2))
+            continue
+        correlation, vol1, vol2 = stats.pair(symbol1, symbol2)
+        if np.isnan(correlation) or abs(correlation) < MIN_CORRELATION - SCAN_CORRELATION_BAND:
+            rejected += 1
+            continue
+        _, close1, close2 = panel.pair(symbol1, symbol2)
+        p_value, _ = engle_granger_pvalue(close1, close2)
+        previous = previous_pvalues.get(f"{symbol1}|{symbol2}")
+        if p_value is None or near_threshold(correlation, p_value) or \
+                (previous is not None and near_threshold(p_value=previous.get('p'))):
+            full.append((symbol1, symbol2))
+        elif p_value < MAX_P_VALUE and abs(correlation) > MIN_CORRELATION:
+            accepted.append(result_row(symbol1, symbol2, correlation, rolling_correlation_mean(close1, close2, 7),
+                                       p_value, vol1, vol2))
+        else:
+            rejected += 1
+    metrics.inc("scan_pairs_triaged_total", len(accepted), result="accepted")
+    metrics.inc("scan_pairs_triaged_total", len(full), result="full")
+    metrics.inc("scan_pairs_triaged_total", rejected, result="rejected")
+    print(f"📊 Incremental triage: {len(accepted)} nhận ngay, {len(full)} cần coint đầy đủ, {rejected} loại")
+    return accepted, full
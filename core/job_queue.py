@@ -0,0 +1,236 @@
+# job_queue.py
+"""
+Job queue cho các tác vụ nặng chạy theo yêu cầu (scan, re-rank, backtest) qua API:
+- Worker pool giới hạn (JOB_WORKERS), hàng đợi có trần (JOB_QUEUE_SIZE) → request không bao giờ chạy job trực tiếp
+- Job giống hệt (cùng kind + params) đang queued/running được dedupe: trả lại job đang có
+- Job báo tiến độ (progress/ETA), kết quả tạm (partial results) và nhận yêu cầu huỷ qua cancel_event
+"""
+import json
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from config import JOB_WORKERS, JOB_QUEUE_SIZE, JOB_HISTORY
+from core import clock
+from core import metrics
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class JobCancelled(Exception):
+    """Job bị huỷ giữa chừng (kiểm tra qua Job.check_cancelled())"""
+
+
+class JobQueueFull(Exception):
+    """Hàng đợi đã đầy, caller nên thử lại sau"""
+
+
+class Job:
+    """Một lần chạy job; các field được cập nhật từ worker thread, đọc qua to_dict()"""
+
+    def __init__(self, kind, params, key=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params
+        self.key = key or dedupe_key(kind, params)
+        self.status = "queued"
+        self.created_at = clock.time()
+        self.started_at = None
+        self.finished_at = None
+        self.progress = {}
+        self.partial_results = []
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled(f"Job {self.id} đã bị huỷ")
+
+    def update(self, **progress):
+        """Gộp thông tin tiến độ (stage, done, total, eta_seconds...) - dùng được làm on_progress callback"""
+        with self._lock:
+            self.progress.update(progress)
+
+    def report(self, progress):
+        self.update(**progress)
+
+    def add_results(self, rows):
+        with self._lock:
+            self.partial_results.extend(rows)
+
+    def to_dict(self, include_results=True):
+        with self._lock:
+            data = {
+                'id': self.id,
+                'kind': self.kind,
+                'params': self.params,
+                'status': self.status,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'progress': dict(self.progress),
+                'partial_count': len(self.partial_results),
+                'error': self.error
+            }
+            if include_results:
+                data['partial_results'] = list(self.partial_results)
+                data['result'] = self.result
+            return data
+
+
+def dedupe_key(kind, params):
+    return f"{kind}:{json.dumps(params, sort_keys=True, default=str)}"
+
+
+class JobQueue:
+    """Worker pool giới hạn + registry các loại job; job cũ đã xong chỉ giữ `history` bản gần nhất"""
+
+    def __init__(self, max_workers=2, max_queued=8, history=50):
+        self.max_workers = max(1, int(max_workers))
+        self.max_queued = max(1, int(max_queued))
+        self.history = int(history)
+        self._handlers = {}
+        self._exclusive = set()
+        self._jobs = OrderedDict()
+        self._active = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+
+    def register(self, kind, handler, exclusive=False):
+        """
+        handler(job, **params) → kết quả JSON-serializable.
+        exclusive=True: mỗi lúc chỉ một job của kind này (dedupe bỏ qua params, vd scan dùng chung checkpoint)
+        """
+        self._handlers[kind] = handler
+        if exclusive:
+            self._exclusive.add(kind)
+
+    @property
+    def kinds(self):
+        return sorted(self._handlers)
+
+    def submit(self, kind, params=None):
+        """Trả về (job, deduplicated); KeyError nếu kind lạ, JobQueueFull nếu hàng đợi đầy"""
+        if kind not in self._handlers:
+            raise KeyError(kind)
+        params = params or {}
+        key = dedupe_key(kind, None if kind in self._exclusive else params)
+        with self._lock:
+            existing = self._active.get(key)
+            if existing is not None:
+                metrics.inc("jobs_total", kind=kind, result="deduplicated")
+                return existing, True
+            queued = sum(1 for job in self._active.values() if job.status == "queued")
+            if queued >= self.max_queued:
+                metrics.inc("jobs_total", kind=kind, result="rejected")
+                raise JobQueueFull(f"Đã có {queued} job đang chờ")
+            job = Job(kind, params, key)
+            self._jobs[job.id] = job
+            self._active[job.key] = job
+            self._trim()
+        metrics.inc("jobs_total", kind=kind, result="submitted")
+        self._executor.submit(self._run, job)
+        return job, False
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        """Các job còn giữ trong history, mới nhất trước"""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def cancel(self, job_id):
+        """Đánh dấu huỷ: job queued không chạy nữa, job running dừng ở lần check_cancelled() kế tiếp"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job.status in ACTIVE_STATUSES:
+            job.cancel_event.set()
+        return job
+
+    def shutdown(self, wait=False):
+        for job in self.jobs():
+            job.cancel_event.set()
+        self._executor.shutdown(wait=wait)
+
+    # ---------- Internals ----------
+
+    def _run(self, job):
+        with job._lock:
+            if job.cancelled:
+                job.status = "cancelled"
+            else:
+                job.status = "running"
+                job.started_at = clock.time()
+        if job.status == "running":
+            try:
+                result = self._handlers[job.kind](job, **job.params)
+                job.check_cancelled()
+                with job._lock:
+                    job.result = result
+                    job.status = "succeeded"
+            except JobCancelled:
+                with job._lock:
+                    job.status = "cancelled"
+            except Exception as e:
+                print(f"❌ Job {job.kind} {job.id} lỗi: {e}")
+                with job._lock:
+                    job.error = str(e)
+                    job.status = "failed"
+        with job._lock:
+            job.finished_at = clock.time()
+        with self._lock:
+            self._active.pop(job.key, None)
+        metrics.inc("jobs_total", kind=job.kind, result=job.status)
+        if job.started_at is not None:
+            metrics.observe("job_run_seconds", job.finished_at - job.started_at, kind=job.kind)
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status not in ACTIVE_STATUSES]
+        for job_id in finished[:max(0, len(self._jobs) - self.history)]:
+            del self._jobs[job_id]
+
+
+# ---------- Jobs mặc định ----------
+
+def _scan_job(job, fresh=False):
+    from core.data_collector import scan_market_for_stable_pairs
+    return scan_market_for_stable_pairs(resume=not fresh, job=job)
+
+def _rerank_job(job, mode=None):
+    from core.data_collector import reorder_pairs_by_correlation
+    job.update(stage="rerank")
+    return reorder_pairs_by_correlation(mode=mode)
+
+def _backtest_job(job):
+    from core.backtest_engine import run_backtest_from_positions
+    job.update(stage="backtest")
+    daily_perf = run_backtest_from_positions()
+    if daily_perf is None:
+        return None
+    return json.loads(daily_perf.to_json(orient="records", date_format="iso"))
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_job_queue():
+    """JobQueue dùng chung của process (khởi tạo lazy, đã đăng ký scan/rerank/backtest)"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                queue = JobQueue(JOB_WORKERS, JOB_QUEUE_SIZE, JOB_HISTORY)
+                queue.register("scan", _scan_job, exclusive=True)
+                queue.register("rerank", _rerank_job)
+                queue.register("backtest", _backtest_job)
+                _queue = queue
+    return _queue
@@ -0,0 +1,151 @@
+# kalman_filter.py
+import os
+import json
+import threading
+import numpy as np
+from contextlib import contextmanager
+from config import STATE_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows: không có flock, chỉ còn lock trong process
+    fcntl = None
+
+KALMAN_STATE_FILE = os.path.join(STATE_DIR, "kalman_state.json")
+
+
+class KalmanHedgeRatio:
+    """
+    Kalman filter cho hedge ratio động: y_t = beta_t * x_t + alpha_t + e_t
+    - State theta = [beta, alpha] đi theo random walk (nhiễu delta)
+    - Mỗi nến mới cập nhật O(1), không cần ước lượng lại OLS trên toàn cửa sổ
+    - Spread = forecast error e_t, z-score = e_t / sqrt(Q_t)
+    """
+
+    def __init__(self, delta=1e-4, obs_var=1e-3):
+        self.delta = delta
+        self.obs_var = obs_var
+        self.theta = np.zeros(2)
+        self.P = np.zeros((2, 2))
+        self.n_updates = 0
+        self.last_timestamp = None
+
+    def _forecast(self, x, y):
+        F = np.array([x, 1.0])
+        R = self.P + np.eye(2) * (self.delta / (1 - self.delta))
+        y_hat = F @ self.theta
+        Q = F @ R @ F + self.obs_var
+        return F, R, y - y_hat, Q
+
+    def predict(self, x, y):
+        """Tính spread và độ lệch chuẩn dự báo cho (x, y) mà KHÔNG cập nhật state"""
+        _, _, error, Q = self._forecast(x, y)
+        return float(error), float(np.sqrt(Q))
+
+    def update(self, x, y, timestamp=None):
+        """Cập nhật filter với một nến đã đóng, trả về (spread, std)"""
+        if timestamp is not None and self.last_timestamp is not None and timestamp <= self.last_timestamp:
+            return None, None
+        F, R, error, Q = self._forecast(x, y)
+        K = R @ F / Q
+        self.theta = self.theta + K * error
+        self.P = R - np.outer(K, F @ R)
+        self.n_updates += 1
+        if timestamp is not None:
+            self.last_timestamp = int(timestamp)
+        return float(error), float(np.sqrt(Q))
+
+    @property
+    def hedge_ratio(self):
+        return float(self.theta[0])
+
+    @property
+    def intercept(self):
+        return float(self.theta[1])
+
+    def to_dict(self):
+        return {
+            'delta': self.delta,
+            'obs_var': self.obs_var,
+            'theta': self.theta.tolist(),
+            'P': self.P.tolist(),
+            'n_updates': self.n_updates,
+            'last_timestamp': self.last_timestamp
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        kf = cls(delta=data['delta'], obs_var=data['obs_var'])
+        kf.theta = np.array(data['theta'])
+        kf.P = np.array(data['P'])
+        kf.n_updates = data['n_updates']
+        kf.last_timestamp = data['last_timestamp']
+        return kf
+
+
+class KalmanStateStore:
+    """
+    Lưu state Kalman theo cặp + timeframe xuống disk để dùng lại giữa các lần chạy
+    (signal generator và position monitor cùng đọc một file):
+    - put() giữ flock trên <path>.lock trong lúc đọc lại file + ghi → process khác không ghi đè mất cập nhật
+    - Không ghi đè state đã tiến xa hơn (last_timestamp lớn hơn) do process khác vừa lưu
+    """
+
+    def __init__(self, path=KALMAN_STATE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._filters = {}
+        self._mtime = None
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path) as f:
+                raw = json.load(f)
+            self._filters = {key: KalmanHedgeRatio.from_dict(value) for key, value in raw.items()}
+            self._mtime = mtime
+        except Exception as e:
+            print(f"⚠️ Không đọc được Kalman state ({self.path}): {e}")
+
+    def get(self, key):
+        with self._lock:
+            self._reload_if_changed()
+            return self._filters.get(key)
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(f"{self.path}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def put(self, key, kf):
+        with self._lock, self._file_lock():
+            self._reload_if_changed()
+            stored = self._filters.get(key)
+            if stored is not None and stored is not kf and (stored.last_timestamp or 0) > (kf.last_timestamp or 0):
+                return  # Process khác đã lưu state mới hơn cho cặp này
+            self._filters[key] = kf
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump({k: v.to_dict() for k, v in self._filters.items()}, f)
+                os.replace(tmp_path, self.path)
+                self._mtime = os.path.getmtime(self.path)
+            except Exception as e:
+                print(f"❌ Không lưu được Kalman state ({self.path}): {e}")
+
+
+kalman_store = KalmanStateStore()
@@ -0,0 +1,271 @@
+# kernels.py
+"""
+Kernel số học cho spread/z-score/cointegration trên mảng float64 thô (không tạo Series trung gian):
+- rolling_mean / rolling_std / rolling_corr, bollinger_bands: mảng cùng độ dài input, NaN cho window-1 phần tử đầu
+- ols_hedge_ratio: (alpha, beta) của y = alpha + beta*x
+- adf_tstat: t-stat ADF lag cố định, không hằng số (như bước 2 của Engle-Granger/coint)
+Backend: Numba (njit) nếu đã cài và KERNEL_BACKEND != "numpy", ngược lại NumPy vectorized (sliding_window_view).
+Hai backend cho cùng kết quả (mỗi cửa sổ tính two-pass, không dùng running sum để tránh sai số với giá lớn).
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from config import KERNEL_BACKEND
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+USE_NUMBA = numba is not None and KERNEL_BACKEND != "numpy"
+BACKEND = "numba" if USE_NUMBA else "numpy"
+
+
+def _jit(fn):
+    # Không có Numba: giữ nguyên hàm Python (chỉ dùng trong test để đối chiếu với backend NumPy)
+    return numba.njit(cache=True)(fn) if USE_NUMBA else fn
+
+def _as_float(values):
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+def _pad(values, n, window):
+    out = np.full(n, np.nan)
+    out[window - 1:] = values
+    return out
+
+
+# ---------- Loop kernels (Numba) ----------
+
+@_jit
+def _rolling_mean_loop(x, window):
+    n = len(x)
+    out = np.full(n, np.nan)
+    for end in range(window, n + 1):
+        total = 0.0
+        for i in range(end - window, end):
+            total += x[i]
+        out[end - 1] = total / window
+    return out
+
+@_jit
+def _rolling_std_loop(x, window, ddof):
+    n = len(x)
+    out = np.full(n, np.nan)
+    if window - ddof <= 0:
+        return out
+    for end in range(window, n + 1):
+        mean = 0.0
+        for i in range(end - window, end):
+            mean += x[i]
+        mean /= window
+        ss = 0.0
+        for i in range(end - window, end):
+            ss += (x[i] - mean) * (x[i] - mean)
+        out[end - 1] = np.sqrt(ss / (window - ddof))
+    return out
+
+@_jit
+def _rolling_corr_loop(x, y, window):
+    n = len(x)
+    out = np.full(n, np.nan)
+    for end in range(window, n + 1):
+        mx = 0.0
+        my = 0.0
+        for i in range(end - window, end):
+            mx += x[i]
+            my += y[i]
+        mx /= window
+        my /= window
+        sxy = 0.0
+        sxx = 0.0
+        syy = 0.0
+        for i in range(end - window, end):
+            dx = x[i] - mx
+            dy = y[i] - my
+            sxy += dx * dy
+            sxx += dx * dx
+            syy += dy * dy
+        if sxx > 0.0 and syy > 0.0:
+            out[end - 1] = sxy / np.sqrt(sxx * syy)
+    return out
+
+@_jit
+def _ols_loop(y, x):
+    n = len(x)
+    mx = 0.0
+    my = 0.0
+    for i in range(n):
+        mx += x[i]
+        my += y[i]
+    mx /= n
+    my /= n
+    sxx = 0.0
+    sxy = 0.0
+    for i in range(n):
+        sxx += (x[i] - mx) * (x[i] - mx)
+        sxy += (x[i] - mx) * (y[i] - my)
+    if sxx == 0.0:
+        return np.nan, np.nan
+    beta = sxy / sxx
+    return my - beta * mx, beta
+
+@_jit
+def _cholesky_solve(a, b):
+    """Giải a·z = b với a đối xứng xác định dương (k nhỏ); NaN nếu a suy biến"""
+    k = a.shape[0]
+    low = np.zeros((k, k))
+    for i in range(k):
+        for j in range(i + 1):
+            total = a[i, j]
+            for m in range(j):
+                total -= low[i, m] * low[j, m]
+            if i == j:
+                if total <= 1e-300:
+                    return np.full(k, np.nan)
+                low[i, i] = np.sqrt(total)
+            else:
+                low[i, j] = total / low[j, j]
+    z = np.zeros(k)
+    for i in range(k):
+        total = b[i]
+        for m in range(i):
+            total -= low[i, m] * z[m]
+        z[i] = total / low[i, i]
+    out = np.zeros(k)
+    for i in range(k - 1, -1, -1):
+        total = z[i]
+        for m in range(i + 1, k):
+            total -= low[m, i] * out[m]
+        out[i] = total / low[i, i]
+    return out
+
+@_jit
+def _adf_loop(x, lags):
+    n = len(x)
+    rows = n - 1 - lags
+    k = 1 + lags
+    if rows <= k:
+        return np.nan
+    design = np.empty((rows, k))
+    target = np.empty(rows)
+    for r in range(rows):
+        t = r + lags + 1
+        target[r] = x[t] - x[t - 1]
+        design[r, 0] = x[t - 1]
+        for lag in range(1, lags + 1):
+            design[r, lag] = x[t - lag] - x[t - lag - 1]
+    xtx = np.zeros((k, k))
+    xty = np.zeros(k)
+    for r in range(rows):
+        for i in range(k):
+            xty[i] += design[r, i] * target[r]
+            for j in range(k):
+                xtx[i, j] += design[r, i] * design[r, j]
+    coef = _cholesky_solve(xtx, xty)
+    if np.isnan(coef[0]):
+        return np.nan
+    ssr = 0.0
+    for r in range(rows):
+        fitted = 0.0
+        for i in range(k):
+            fitted += design[r, i] * coef[i]
+        ssr += (target[r] - fitted) * (target[r] - fitted)
+    unit = np.zeros(k)
+    unit[0] = 1.0
+    inv_00 = _cholesky_solve(xtx, unit)[0]
+    se = np.sqrt(ssr / (rows - k) * inv_00)
+    if se == 0.0 or np.isnan(se):
+        return np.nan
+    return coef[0] / se
+
+
+# ---------- NumPy kernels ----------
+
+def _rolling_mean_numpy(x, window):
+    return _pad(sliding_window_view(x, window).mean(axis=1), len(x), window)
+
+def _rolling_std_numpy(x, window, ddof):
+    if window - ddof <= 0:
+        return np.full(len(x), np.nan)
+    windows = sliding_window_view(x, window)
+    centered = windows - windows.mean(axis=1)[:, None]
+    return _pad(np.sqrt(np.einsum('ij,ij->i', centered, centered) / (window - ddof)), len(x), window)
+
+def _rolling_corr_numpy(x, y, window):
+    xw = sliding_window_view(x, window)
+    yw = sliding_window_view(y, window)
+    xc = xw - xw.mean(axis=1, keepdims=True)
+    yc = yw - yw.mean(axis=1, keepdims=True)
+    sxx = (xc * xc).sum(axis=1)
+    syy = (yc * yc).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        corr = (xc * yc).sum(axis=1) / np.sqrt(sxx * syy)
+    corr[(sxx <= 0) | (syy <= 0)] = np.nan
+    return _pad(corr, len(x), window)
+
+def _ols_numpy(y, x):
+    mx = x.mean()
+    xc = x - mx
+    sxx = np.dot(xc, xc)
+    if sxx == 0:
+        return np.nan, np.nan
+    beta = np.dot(xc, y - y.mean()) / sxx
+    return y.mean() - beta * mx, beta
+
+def _adf_numpy(x, lags):
+    diff = np.diff(x)
+    target = diff[lags:]
+    columns = [x[lags:-1]]
+    for lag in range(1, lags + 1):
+        columns.append(diff[lags - lag:-lag])
+    design = np.column_stack(columns)
+    if len(target) <= design.shape[1]:
+        return np.nan
+    coef, _, rank, _ = np.linalg.lstsq(design, target, rcond=None)
+    if rank < design.shape[1]:
+        return np.nan
+    residual = target - design @ coef
+    sigma2 = np.dot(residual, residual) / (len(target) - design.shape[1])
+    se = np.sqrt(sigma2 * np.linalg.inv(design.T @ design)[0, 0])
+    if se == 0 or np.isnan(se):
+        return np.nan
+    return coef[0] / se
+
+
+# ---------- Public API ----------
+
+def rolling_mean(x, window):
+    x = _as_float(x)
+    if window > len(x):
+        return np.full(len(x), np.nan)
+    return _rolling_mean_loop(x, window) if USE_NUMBA else _rolling_mean_numpy(x, window)
+
+def rolling_std(x, window, ddof=1):
+    x = _as_float(x)
+    if window > len(x):
+        return np.full(len(x), np.nan)
+    return _rolling_std_loop(x, window, ddof) if USE_NUMBA else _rolling_std_numpy(x, window, ddof)
+
+def rolling_corr(x, y, window):
+    x, y = _as_float(x), _as_float(y)
+    if window > len(x):
+        return np.full(len(x), np.nan)
+    return _rolling_corr_loop(x, y, window) if USE_NUMBA else _rolling_corr_numpy(x, y, window)
+
+def ols_hedge_ratio(y, x):
+    """(alpha, beta) của OLS y = alpha + beta*x; (nan, nan) nếu x hằng số"""
+    y, x = _as_float(y), _as_float(x)
+    alpha, beta = _ols_loop(y, x) if USE_NUMBA else _ols_numpy(y, x)
+    return float(alpha), float(beta)
+
+def adf_tstat(x, lags=1):
+    """t-stat của gamma trong Δx_t = gamma*x_{t-1} + Σ phi_i*Δx_{t-i} + e (không hằng số); nan nếu suy biến"""
+    x = _as_float(x)
+    if len(x) < lags + 3:
+        return float('nan')
+    return float(_adf_loop(x, lags) if USE_NUMBA else _adf_numpy(x, lags))
+
+def bollinger_bands(x, window=20, num_std=2.0):
+    """(upper, middle, lower): SMA ± num_std * rolling std (ddof=1)"""
+    middle = rolling_mean(x, window)
+    width = rolling_std(x, window) * num_std
+    return middle + width, middle, middle - width
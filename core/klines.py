@@ -0,0 +1,128 @@
+# klines.py
+"""
+Parser klines gọn: payload JSON của Binance (list các list string) → mảng NumPy contiguous.
+- open_time/close_time: int64 (epoch ms); open/high/low/close: float64; volume: float32
+- Không tạo DataFrame 12 cột object trung gian; cache giữ Klines (~10× nhỏ hơn DataFrame cũ)
+- to_frame() chỉ dùng khi code phía sau cần pandas (merge/rolling trong signal generator)
+"""
+import numpy as np
+import pandas as pd
+
+# Vị trí cột trong payload Binance
+OPEN_TIME, OPEN, HIGH, LOW, CLOSE, VOLUME, CLOSE_TIME = range(7)
+
+INTERVAL_MS = {
+    '1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '1h': 3_600_000, '2h': 7_200_000, '4h': 14_400_000, '6h': 21_600_000,
+    '8h': 28_800_000, '12h': 43_200_000, '1d': 86_400_000
+}
+
+
+class Klines:
+    __slots__ = ('open_time', 'open', 'high', 'low', 'close', 'volume', 'close_time')
+
+    def __init__(self, open_time, open, high, low, close, volume, close_time):
+        self.open_time = open_time
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.close_time = close_time
+
+    def __len__(self):
+        return len(self.open_time)
+
+    def __getitem__(self, column):
+        """Truy cập kiểu cột (k['close']) cho code quen dùng DataFrame"""
+        if column == 'timestamp':
+            return self.timestamp
+        if column in self.__slots__:
+            return getattr(self, column)
+        raise KeyError(column)
+
+    @property
+    def timestamp(self):
+        return self.open_time.astype('datetime64[ms]')
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.__slots__)
+
+    def select(self, mask):
+        """Klines con theo boolean mask hoặc index array"""
+        return Klines(*(getattr(self, name)[mask] for name in self.__slots__))
+
+    def tail(self, n):
+        return self.select(slice(max(0, len(self) - n), None))
+
+    def to_frame(self):
+        """DataFrame số (không object dtype) với các cột mà signal generator dùng"""
+        timestamp = self.timestamp
+        return pd.DataFrame({
+            'timestamp': timestamp,
+            'open': self.open,
+            'high': self.high,
+            'low': self.low,
+            'close': self.close,
+            'volume': self.volume,
+            'close_time': self.close_time,
+            'open_time': timestamp
+        })
+
+
+def parse_klines(payload):
+    """Parse payload futures_klines/klines → Klines (None nếu payload rỗng)"""
+    if not payload:
+        return None
+    # Transpose một lần rồi để NumPy parse string → float theo từng cột
+    columns = list(zip(*payload))
+    return Klines(
+        open_time=np.array(columns[OPEN_TIME], dtype=np.int64),
+        open=np.array(columns[OPEN], dtype=np.float64),
+        high=np.array(columns[HIGH], dtype=np.float64),
+        low=np.array(columns[LOW], dtype=np.float64),
+        close=np.array(columns[CLOSE], dtype=np.float64),
+        volume=np.array(columns[VOLUME], dtype=np.float32),
+        close_time=np.array(columns[CLOSE_TIME], dtype=np.int64)
+    )
+
+def align(k1, k2):
+    """Ghép 2 Klines theo open_time (inner join, tăng dần) → (open_time, close1, close2)"""
+    common, i1, i2 = np.intersect1d(k1.open_time, k2.open_time, assume_unique=True, return_indices=True)
+    return common, k1.close[i1], k2.close[i2]
+
+def concat_klines(parts):
+    """Nối các trang Klines (đã sắp theo thời gian), bỏ nến trùng open_time ở mép trang"""
+    parts = [k for k in parts if k is not None and len(k) > 0]
+    if not parts:
+        return None
+    merged = Klines(*(np.concatenate([getattr(k, name) for k in parts]) for name in Klines.__slots__))
+    _, first = np.unique(merged.open_time, return_index=True)
+    return merged if len(first) == len(merged) else merged.select(first)
+
+def resample(klines, interval):
+    """
+    Gộp Klines base (vd 5m) lên timeframe lớn hơn (15m/1h/4h), bucket căn theo epoch UTC như Binance:
+    open = nến đầu, high/low = max/min, close = nến cuối, volume = tổng.
+    Bucket đầu thiếu nến (base bắt đầu giữa bucket) bị bỏ; bucket cuối có thể đang chạy giống nến live
+    """
+    if klines is None or len(klines) == 0:
+        return None
+    step = INTERVAL_MS[interval]
+    bucket = klines.open_time - klines.open_time % step
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    if klines.open_time[0] != bucket[0]:
+        starts = starts[1:]
+        if len(starts) == 0:
+            return None
+    ends = np.r_[starts[1:], len(klines)] - 1
+    return Klines(
+        open_time=bucket[starts],
+        open=klines.open[starts],
+        high=np.maximum.reduceat(klines.high, starts),
+        low=np.minimum.reduceat(klines.low, starts),
+        close=klines.close[ends],
+        volume=np.add.reduceat(klines.volume, starts),
+        close_time=bucket[starts] + step - 1
+    )
@@ -0,0 +1,75 @@
+# logger.py
+"""
+Logging có level + rate limit thay cho print() trong các vòng lặp nóng:
+- LOG_LEVEL điều khiển độ chi tiết (DEBUG hiện lại các dòng chi tiết của monitor)
+- Cùng một message template (cùng logger + level) chỉ in tối đa 1 lần mỗi LOG_RATE_LIMIT_SECONDS,
+  lần in kế tiếp kèm số bản ghi đã bị bỏ qua. WARNING trở lên không bị chặn
+- Sự kiện nghiệp vụ (đóng position...) truyền extra=NO_RATE_LIMIT để không bao giờ bị chặn
+"""
+import sys
+import time
+import logging
+import threading
+from config import LOG_LEVEL, LOG_RATE_LIMIT_SECONDS
+
+ROOT_LOGGER = "stat_arb"
+# extra cho log sự kiện nghiệp vụ: mỗi bản ghi đều được in, không gộp theo template
+NO_RATE_LIMIT = {'rate_limit': False}
+_configure_lock = threading.Lock()
+_configured = False
+
+
+class RateLimitFilter(logging.Filter):
+    def __init__(self, interval=LOG_RATE_LIMIT_SECONDS):
+        super().__init__()
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._seen = {}
+
+    def filter(self, record):
+        if self.interval <= 0 or record.levelno >= logging.WARNING or not getattr(record, 'rate_limit', True):
+            return True
+        key = (record.name, record.levelno, getattr(record, 'rate_key', record.msg))
+        now = time.monotonic()
+        with self._lock:
+            last, suppressed = self._seen.get(key, (None, 0))
+            if last is not None and now - last < self.interval:
+                self._seen[key] = (last, suppressed + 1)
+                return False
+            self._seen[key] = (now, 0)
+        if suppressed:
+            record.msg = f"{record.msg} (+{suppressed} bản ghi tương tự bị bỏ qua)"
+        return True
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """Luôn ghi ra sys.stdout hiện tại (supervisor log, redirect_stdout trong benchmark)"""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+def _configure():
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        root = logging.getLogger(ROOT_LOGGER)
+        handler = _StdoutHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s", "%H:%M:%S"))
+        handler.addFilter(RateLimitFilter())
+        root.addHandler(handler)
+        root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+        root.propagate = False
+        _configured = True
+
+
+def get_logger(name):
+    """Logger con của `stat_arb` (vd. get_logger("executor"))"""
+    _configure()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
@@ -0,0 +1,234 @@
+# metrics.py
+"""
+Metrics registry in-process (counters, gauges, histograms) + export Prometheus text format.
+
+- Mỗi process (scheduler, executor, api...) ghi snapshot ra STATE_DIR/metrics/<process>.json theo chu kỳ
+- API đọc tất cả snapshot và render /metrics (label `process` phân biệt nguồn)
+- Helpers: timer(), timed(), instrument_methods() cho SupabaseManager, instrument_binance_client() cho Binance
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+import functools
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from config import STATE_DIR, METRICS_DUMP_INTERVAL
+
+METRICS_DIR = os.path.join(STATE_DIR, "metrics")
+PREFIX = "stat_arb_"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class MetricsRegistry:
+    def __init__(self, process_name=None, dump_interval=METRICS_DUMP_INTERVAL):
+        self.process_name = process_name or os.getenv("METRICS_PROCESS_NAME") or \
+            os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0] or "python"
+        self.dump_interval = dump_interval
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._last_dump = time.monotonic()
+
+    # ---------- Recording ----------
+
+    def inc(self, name, value=1.0, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+        self._maybe_dump()
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = float(value)
+        self._maybe_dump()
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = {'buckets': [0] * len(DEFAULT_BUCKETS), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(DEFAULT_BUCKETS):
+                if value <= bound:
+                    hist['buckets'][i] += 1
+                    break
+            hist['sum'] += value
+            hist['count'] += 1
+        self._maybe_dump()
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Đo thời gian block (giây) vào histogram `name`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    # ---------- Snapshot / dump ----------
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'process': self.process_name,
+                'timestamp': time.time(),
+                'counters': [[n, dict(l), v] for (n, l), v in self._counters.items()],
+                'gauges': [[n, dict(l), v] for (n, l), v in self._gauges.items()],
+                'histograms': [[n, dict(l), dict(h, buckets=list(h['buckets']))] for (n, l), h in self._histograms.items()]
+            }
+
+    def dump(self, directory=METRICS_DIR):
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{self.process_name}.json")
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"⚠️ Không ghi được metrics snapshot: {e}")
+
+    def _maybe_dump(self):
+        if self.dump_interval <= 0:
+            return
+        now = time.monotonic()
+        if now - self._last_dump < self.dump_interval:
+            return
+        self._last_dump = now
+        self.dump()
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+registry = MetricsRegistry()
+atexit.register(lambda: registry.dump() if registry.dump_interval > 0 else None)
+
+inc = registry.inc
+set_gauge = registry.set_gauge
+observe = registry.observe
+timer = registry.timer
+
+
+def timed(name, **labels):
+    """Decorator đo thời gian chạy của function"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with registry.timer(name, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_methods(metric, label="method"):
+    """Class decorator: đo latency + lỗi cho mọi public method (vd. SupabaseManager)"""
+    def decorator(cls):
+        for attr, fn in list(vars(cls).items()):
+            if attr.startswith('_') or not callable(fn):
+                continue
+            setattr(cls, attr, _instrument(fn, metric, label, attr))
+        return cls
+    return decorator
+
+def _instrument(fn, metric, label, value):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            registry.inc(f"{metric}_errors_total", **{label: value})
+            raise
+        finally:
+            registry.observe(f"{metric}_seconds", time.perf_counter() - start, **{label: value})
+    return wrapper
+
+
+def instrument_binance_client(client):
+    """Bọc Client._request: latency theo endpoint, số lỗi, used weight 1m từ response header"""
+    original = getattr(client, '_request', None)
+    if original is None or getattr(original, '_instrumented', False):
+        return client
+
+    def _request(method, uri, signed, force_params=False, **kwargs):
+        endpoint = urlparse(uri).path
+        start = time.perf_counter()
+        try:
+            return original(method, uri, signed, force_params, **kwargs)
+        except Exception:
+            registry.inc("binance_errors_total", endpoint=endpoint)
+            raise
+        finally:
+            registry.observe("binance_request_seconds", time.perf_counter() - start, endpoint=endpoint)
+            response = getattr(client, 'response', None)
+            weight = response.headers.get('x-mbx-used-weight-1m') if response is not None else None
+            if weight is not None:
+                registry.set_gauge("binance_used_weight_1m", float(weight))
+
+    _request._instrumented = True
+    client._request = _request
+    return client
+
+
+# ---------- Prometheus export ----------
+
+def collect_snapshots(directory=METRICS_DIR):
+    """Snapshot của process hiện tại + các process khác đã dump ra directory"""
+    snapshots = {registry.process_name: registry.snapshot()}
+    if os.path.isdir(directory):
+        for filename in sorted(os.listdir(directory)):
+            name, ext = os.path.splitext(filename)
+            if ext != '.json' or name in snapshots:
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as f:
+                    snapshots[name] = json.load(f)
+            except (OSError, ValueError):
+                continue
+    return list(snapshots.values())
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    body = ",".join(f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                    for k, v in sorted(labels.items()))
+    return "{" + body + "}"
+
+def render_prometheus(snapshots=None):
+    """Render các snapshot sang Prometheus text exposition format (0.0.4)"""
+    snapshots = collect_snapshots() if snapshots is None else snapshots
+    series = {}
+    for snapshot in snapshots:
+        process = {'process': snapshot.get('process', 'unknown')}
+        for name, labels, value in snapshot.get('counters', []):
+            series.setdefault((name, 'counter'), []).append((f"{PREFIX}{name}", dict(labels, **process), value))
+        for name, labels, value in snapshot.get('gauges', []):
+            series.setdefault((name, 'gauge'), []).append((f"{PREFIX}{name}", dict(labels, **process), value))
+        for name, labels, hist in snapshot.get('histograms', []):
+            lines = series.setdefault((name, 'histogram'), [])
+            labels = dict(labels, **process)
+            cumulative = 0
+            for bound, count in zip(DEFAULT_BUCKETS, hist['buckets']):
+                cumulative += count
+                lines.append((f"{PREFIX}{name}_bucket", dict(labels, le=str(bound)), cumulative))
+            lines.append((f"{PREFIX}{name}_bucket", dict(labels, le="+Inf"), hist['count']))
+            lines.append((f"{PREFIX}{name}_sum", labels, hist['sum']))
+            lines.append((f"{PREFIX}{name}_count", labels, hist['count']))
+
+    output = []
+    for (name, kind), lines in sorted(series.items()):
+        output.append(f"# TYPE {PREFIX}{name} {kind}")
+        output.extend(f"{metric}{_format_labels(labels)} {value}" for metric, labels, value in lines)
+    return "\n".join(output) + "\n"
@@ -0,0 +1,204 @@
+# online_stats.py
+import os
+import json
+import threading
+from collections import deque
+import numpy as np
+from config import STATE_DIR
+from core.kernels import rolling_corr, ols_hedge_ratio, adf_tstat
+
+ONLINE_STATE_FILE = os.path.join(STATE_DIR, "online_pair_stats.json")
+_state_lock = threading.Lock()
+
+
+def rolling_correlation_mean(x, y, period=7):
+    """Trung bình rolling correlation trên mảng numpy (bỏ các cửa sổ variance = 0), None nếu thiếu dữ liệu"""
+    if len(x) < period:
+        return None
+    corr = rolling_corr(x, y, period)[period - 1:]
+    corr = corr[np.isfinite(corr)]
+    return float(corr.mean()) if len(corr) else None
+
+def pct_volatility(prices, periods_per_day=24):
+    """Std của pct returns (ddof=1) x sqrt(periods_per_day)"""
+    return float(np.std(np.diff(prices) / prices[:-1], ddof=1) * np.sqrt(periods_per_day))
+
+def engle_granger_pvalue(y, x, lags=1):
+    """
+    Engle-Granger test rút gọn (thay cho statsmodels coint với autolag AIC):
+    - Bước 1: OLS y = alpha + beta*x
+    - Bước 2: ADF với số lag cố định trên residual (không hằng số, như coint)
+    - p-value từ MacKinnon (regression='c', N=2)
+    """
+    y = np.asarray(y, dtype=np.float64)
+    x = np.asarray(x, dtype=np.float64)
+    if len(y) < lags + 10:
+        return None, None
+
+    alpha, beta = ols_hedge_ratio(y, x)
+    if np.isnan(beta):
+        return None, None
+    t_stat = adf_tstat(y - alpha - beta * x, lags)
+    if np.isnan(t_stat):
+        return None, None
+
+    from statsmodels.tsa.adfvalues import mackinnonp
+    return float(mackinnonp(t_stat, regression='c', N=2)), float(t_stat)
+
+
+class OnlinePairStats:
+    """
+    Thống kê online cho một cặp trên cửa sổ trượt:
+    - Tổng tích lũy (sum, sum of squares, cross-product) cho correlation - O(1) mỗi nến
+    - Hedge ratio bằng recursive least squares (RLS) với forgetting factor
+    - Cửa sổ giá gần nhất để re-test cointegration rẻ (ADF lag cố định)
+    """
+
+    def __init__(self, window=168, forgetting=0.99):
+        self.window = window
+        self.forgetting = forgetting
+        self.xs = deque(maxlen=window)
+        self.ys = deque(maxlen=window)
+        self.last_timestamp = None
+        self._reset_sums()
+        # RLS state: theta = [alpha, beta]
+        self.theta = np.zeros(2)
+        self.P = np.eye(2) * 1000.0
+        self.updates_since_resync = 0
+
+    def _reset_sums(self):
+        self.sx = self.sy = self.sxx = self.syy = self.sxy = 0.0
+
+    def _resync_sums(self):
+        """Tính lại tổng từ cửa sổ để tránh sai số tích lũy floating point"""
+        x = np.fromiter(self.xs, dtype=np.float64)
+        y = np.fromiter(self.ys, dtype=np.float64)
+        self.sx, self.sy = float(x.sum()), float(y.sum())
+        self.sxx, self.syy, self.sxy = float(x @ x), float(y @ y), float(x @ y)
+        self.updates_since_resync = 0
+
+    def _rls_update(self, x, y):
+        phi = np.array([1.0, x])
+        P_phi = self.P @ phi
+        gain = P_phi / (self.forgetting + phi @ P_phi)
+        error = y - phi @ self.theta
+        self.theta = self.theta + gain * error
+        self.P = (self.P - np.outer(gain, P_phi)) / self.forgetting
+
+    def push(self, timestamp, x, y):
+        """Thêm một nến mới; bỏ qua nến đã xử lý"""
+        if self.last_timestamp is not None and timestamp <= self.last_timestamp:
+            return False
+        if len(self.xs) == self.window:
+            old_x, old_y = self.xs[0], self.ys[0]
+            self.sx -= old_x
+            self.sy -= old_y
+            self.sxx -= old_x * old_x
+            self.syy -= old_y * old_y
+            self.sxy -= old_x * old_y
+        self.xs.append(x)
+        self.ys.append(y)
+        self.sx += x
+        self.sy += y
+        self.sxx += x * x
+        self.syy += y * y
+        self.sxy += x * y
+        self._rls_update(x, y)
+        self.last_timestamp = timestamp
+        self.updates_since_resync += 1
+        if self.updates_since_resync >= self.window:
+            self._resync_sums()
+        return True
+
+    def update(self, timestamps, xs, ys):
+        """Cập nhật với các nến mới (đã align theo timestamp), trả về số nến được thêm"""
+        added = 0
+        for ts, x, y in zip(timestamps, xs, ys):
+            if self.push(int(ts), float(x), float(y)):
+                added += 1
+        return added
+
+    def __len__(self):
+        return len(self.xs)
+
+    def correlation(self):
+        n = len(self.xs)
+        if n < 2:
+            return None
+        cov = self.sxy - self.sx * self.sy / n
+        var_x = self.sxx - self.sx * self.sx / n
+        var_y = self.syy - self.sy * self.sy / n
+        if var_x <= 0 or var_y <= 0:
+            return None
+        return float(cov / np.sqrt(var_x * var_y))
+
+    def hedge_ratio(self):
+        return float(self.theta[1])
+
+    def rolling_correlation(self, period=7):
+        """Trung bình rolling correlation (tương đương df1.rolling(7).corr(df2).mean())"""
+        return rolling_correlation_mean(np.fromiter(self.xs, dtype=np.float64),
+                                        np.fromiter(self.ys, dtype=np.float64), period)
+
+    def volatilities(self):
+        """Volatility của pct returns (x sqrt(24)) như calculate_correlation_cointegration"""
+        if len(self.xs) < 3:
+            return None, None
+        return (pct_volatility(np.fromiter(self.xs, dtype=np.float64)),
+                pct_volatility(np.fromiter(self.ys, dtype=np.float64)))
+
+    def cointegration_pvalue(self, lags=1):
+        """Re-test cointegration rẻ trên cửa sổ hiện tại (y = pair1, x = pair2 như coint(df1, df2))"""
+        p_value, _ = engle_granger_pvalue(np.fromiter(self.ys, dtype=np.float64),
+                                          np.fromiter(self.xs, dtype=np.float64), lags)
+        return p_value
+
+    def to_dict(self):
+        return {
+            'window': self.window,
+            'forgetting': self.forgetting,
+            'xs': list(self.xs),
+            'ys': list(self.ys),
+            'last_timestamp': self.last_timestamp,
+            'theta': self.theta.tolist(),
+            'P': self.P.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(window=data['window'], forgetting=data['forgetting'])
+        stats.xs.extend(data['xs'])
+        stats.ys.extend(data['ys'])
+        stats.last_timestamp = data['last_timestamp']
+        stats.theta = np.array(data['theta'])
+        stats.P = np.array(data['P'])
+        stats._resync_sums()
+        return stats
+
+
+def load_online_stats(path=ONLINE_STATE_FILE):
+    """Đọc state online stats của các cặp từ disk"""
+    with _state_lock:
+        try:
+            with open(path) as f:
+                raw = json.load(f)
+            return {key: OnlinePairStats.from_dict(value) for key, value in raw.items()}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"⚠️ Không đọc được online stats ({path}): {e}")
+            return {}
+
+def save_online_stats(stats_by_pair, path=ONLINE_STATE_FILE):
+    """Ghi state online stats xuống disk (atomic rename)"""
+    with _state_lock:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({key: stats.to_dict() for key, stats in stats_by_pair.items()}, f)
+            os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            print(f"❌ Không lưu được online stats ({path}): {e}")
+            return False
@@ -0,0 +1,114 @@
+# pair_candidates.py
+import random
+import numpy as np
+from itertools import combinations
+
+
+def correlation_distance(returns):
+    """
+    Khoảng cách correlation d = sqrt(2 * (1 - |rho|)):
+    - Dùng |rho| vì scan chấp nhận cả cặp tương quan âm (abs(correlation) > 0.5)
+    - d = 0 khi tương quan hoàn hảo, d = sqrt(2) khi không tương quan
+    """
+    corr = np.corrcoef(returns.to_numpy().T)
+    corr = np.nan_to_num(corr, nan=0.0)
+    dist = np.sqrt(np.clip(2.0 * (1.0 - np.abs(corr)), 0.0, None))
+    np.fill_diagonal(dist, 0.0)
+    return dist
+
+def cluster_candidate_pairs(symbols, dist, distance_threshold=1.0):
+    """Hierarchical clustering (average linkage) và chỉ sinh các cặp trong cùng cluster"""
+    if len(symbols) < 2:
+        return []
+    from sklearn.cluster import AgglomerativeClustering  # import nặng, chỉ cần khi mode=cluster
+    model = AgglomerativeClustering(
+        n_clusters=None,
+        metric='precomputed',
+        linkage='average',
+        distance_threshold=distance_threshold
+    )
+    labels = model.fit_predict(dist)
+
+    clusters = {}
+    for idx, label in enumerate(labels):
+        clusters.setdefault(label, []).append(idx)
+
+    pairs = []
+    for members in clusters.values():
+        for i, j in combinations(members, 2):
+            pairs.append((i, j))
+    return pairs
+
+def knn_candidate_pairs(dist, top_k=10):
+    """Top-k láng giềng gần nhất cho mỗi symbol (hợp của các cạnh kNN)"""
+    n = dist.shape[0]
+    if n < 2:
+        return []
+    k = min(top_k, n - 1)
+    masked = dist.copy()
+    np.fill_diagonal(masked, np.inf)
+    neighbours = np.argpartition(masked, k - 1, axis=1)[:, :k]
+
+    pairs = set()
+    for i in range(n):
+        for j in neighbours[i]:
+            pairs.add((min(i, j), max(i, j)))
+    return list(pairs)
+
+def generate_candidate_pairs(symbols, returns, mode="cluster", top_k=10, distance_threshold=1.0):
+    """
+    Sinh candidate pairs thay cho toàn bộ N*(N-1)/2 combinations:
+    - mode="cluster": chỉ cặp trong cùng cluster
+    - mode="knn": top-k láng giềng gần nhất theo correlation distance
+    Giữ thứ tự (symbol1, symbol2) theo thứ tự trong `symbols` như combinations()
+    """
+    if mode == "all":
+        return list(combinations(symbols, 2))
+
+    # Chỉ giữ symbols có trong returns matrix, đúng thứ tự ban đầu
+    usable = [s for s in symbols if s in returns.columns]
+    if len(usable) < 2:
+        return []
+    dist = correlation_distance(returns[usable])
+
+    if mode == "cluster":
+        index_pairs = cluster_candidate_pairs(usable, dist, distance_threshold)
+    elif mode == "knn":
+        index_pairs = knn_candidate_pairs(dist, top_k)
+    else:
+        raise ValueError(f"Unknown candidate mode: {mode}")
+
+    return [(usable[i], usable[j]) for i, j in sorted(index_pairs)]
+
+def sample_excluded_pairs(symbols, candidate_pairs, sample_size, seed=42):
+    """Lấy ngẫu nhiên các cặp KHÔNG nằm trong candidates để ước lượng recall"""
+    n = len(symbols)
+    total = n * (n - 1) // 2
+    candidate_set = set(candidate_pairs)
+    n_excluded = total - len(candidate_set)
+    if n_excluded <= 0 or sample_size <= 0:
+        return [], n_excluded
+
+    rng = random.Random(seed)
+    sample_size = min(sample_size, n_excluded)
+    sampled = set()
+    # Rejection sampling - O(sample_size) thay vì liệt kê toàn bộ O(N^2) cặp
+    while len(sampled) < sample_size:
+        i, j = sorted(rng.sample(range(n), 2))
+        pair = (symbols[i], symbols[j])
+        if pair not in candidate_set:
+            sampled.add(pair)
+    return sorted(sampled), n_excluded
+
+def estimate_recall(found_in_candidates, hits_in_sample, sample_size, n_excluded):
+    """
+    Ước lượng recall so với scan exhaustive:
+    recall = found / (found + missed), với missed ≈ hits_in_sample * n_excluded / sample_size
+    """
+    if sample_size <= 0:
+        return None
+    estimated_missed = hits_in_sample * n_excluded / sample_size
+    total = found_in_candidates + estimated_missed
+    if total == 0:
+        return 1.0
+    return found_in_candidates / total
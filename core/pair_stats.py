@@ -0,0 +1,76 @@
+# pair_stats.py
+"""
+Memo thống kê cặp dùng chung cho scan, re-rank, signal và monitor trong cùng process:
+- Key: (pair1, pair2, interval) + thời điểm đóng của nến cuối trong dữ liệu đã căn
+- Mỗi key giữ nhiều thống kê theo tên (correlation/p-value/volatility, hedge ratio...),
+  mỗi thống kê chỉ tính một lần cho mỗi nến
+- Nến mới (close time lớn hơn) → toàn bộ thống kê cũ của cặp bị bỏ; LRU giới hạn số cặp
+"""
+import threading
+from collections import OrderedDict
+from config import PAIR_STATS_MEMO_SIZE
+from core import metrics
+from core.klines import INTERVAL_MS
+
+
+def last_close_ms(open_ms, interval):
+    """Close time của nến cuối (open_time + độ dài interval); None nếu không có nến"""
+    if len(open_ms) == 0:
+        return None
+    return int(open_ms[-1]) + INTERVAL_MS.get(interval, 3_600_000)
+
+
+class PairStatsMemo:
+    """LRU memo thống kê theo cặp, tự invalidation khi có nến mới"""
+
+    def __init__(self, max_pairs=4096):
+        self.max_pairs = max_pairs
+        self._lock = threading.Lock()
+        # (pair1, pair2, interval) → (close_ms, {stat: value})
+        self._entries = OrderedDict()
+
+    def get_or_compute(self, pair1, pair2, interval, close_ms, stat, compute):
+        """
+        Giá trị `stat` của cặp tại nến close_ms; chưa có thì gọi compute() (ngoài lock) và lưu lại.
+        stat là tên (có thể kèm số nến, vd ("correlation", 168)) để phân biệt cửa sổ khác nhau
+        """
+        key = (pair1, pair2, interval)
+        label = stat[0] if isinstance(stat, tuple) else stat
+        if close_ms is None:
+            return compute()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == close_ms and stat in entry[1]:
+                self._entries.move_to_end(key)
+                metrics.inc("pair_stats_memo_total", stat=label, result="hit")
+                return entry[1][stat]
+
+        value = compute()
+        metrics.inc("pair_stats_memo_total", stat=label, result="miss")
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > close_ms:
+                return value  # Dữ liệu cũ hơn bản đã memo → không ghi đè
+            if entry is None or entry[0] != close_ms:
+                entry = self._entries[key] = (close_ms, {})
+            entry[1][stat] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_pairs:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, pair1=None, pair2=None):
+        """Bỏ memo của một cặp (mọi interval) hoặc toàn bộ"""
+        with self._lock:
+            if pair1 is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[:2] == (pair1, pair2)]:
+                del self._entries[key]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+pair_stats_memo = PairStatsMemo(PAIR_STATS_MEMO_SIZE)
@@ -0,0 +1,142 @@
+# panel.py
+"""
+Panel giá đóng cửa căn theo timestamp cho nhiều symbol:
+- Lưới nến chung = hợp các open_time; mỗi symbol là một cột (Fortran order → cột contiguous, view zero-copy)
+- Missing-bar policy: "drop" (bỏ nến thiếu), "ffill" (lấy giá đóng cửa trước đó),
+  "mask" (giữ NaN trên cả lưới cho consumer xử lý NaN như returns_frame; pair() vẫn chỉ trả nến chung)
+- Cache theo (interval, limit, policy, nến hiện tại): panel lớn build một lần (scan, signal batch),
+  các lời gọi sau cho một cặp con được phục vụ từ panel đã có thay vì fetch + merge lại
+"""
+import threading
+from collections import OrderedDict
+import numpy as np
+from config import PANEL_MISSING_POLICY, PANEL_CACHE_SIZE
+from core import clock
+from core import metrics
+from core.klines import INTERVAL_MS
+
+POLICIES = ("drop", "ffill", "mask")
+
+_panel_cache = OrderedDict()
+_panel_lock = threading.Lock()
+
+
+def _forward_fill(closes):
+    """Forward-fill NaN theo từng cột (in-place); nến trước khi symbol được list vẫn là NaN"""
+    rows = np.arange(closes.shape[0])[:, None]
+    last_valid = np.where(np.isnan(closes), 0, rows)
+    np.maximum.accumulate(last_valid, axis=0, out=last_valid)
+    closes[:] = np.take_along_axis(closes, last_valid, axis=0)
+
+
+class Panel:
+    __slots__ = ('symbols', 'open_time', 'closes', 'valid', 'policy', '_index', '_complete')
+
+    def __init__(self, symbols, open_time, closes, policy):
+        self.symbols = tuple(symbols)
+        self.open_time = open_time
+        self.closes = closes
+        self.valid = ~np.isnan(closes)
+        self.policy = policy
+        self._index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self._complete = self.valid.all(axis=0)
+
+    @classmethod
+    def from_klines(cls, klines_by_symbol, policy=None):
+        """Ghép các Klines lên lưới open_time chung (symbol không có dữ liệu bị bỏ qua)"""
+        policy = policy or PANEL_MISSING_POLICY
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown missing-bar policy: {policy}")
+        items = [(symbol, k) for symbol, k in klines_by_symbol.items() if k is not None and len(k) > 0]
+        if not items:
+            return cls((), np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float64, order='F'), policy)
+
+        open_time = np.unique(np.concatenate([k.open_time for _, k in items]))
+        closes = np.full((len(open_time), len(items)), np.nan, dtype=np.float64, order='F')
+        for j, (_, k) in enumerate(items):
+            rows = np.searchsorted(open_time, k.open_time)
+            closes[rows, j] = k.close
+        if policy == "ffill":
+            _forward_fill(closes)
+        return cls([symbol for symbol, _ in items], open_time, closes, policy)
+
+    def __len__(self):
+        return len(self.open_time)
+
+    def __contains__(self, symbol):
+        return symbol in self._index
+
+    def covers(self, symbols):
+        return all(symbol in self._index for symbol in symbols)
+
+    def column(self, symbol):
+        """View zero-copy cột close của symbol trên toàn lưới (NaN ở nến thiếu)"""
+        return self.closes[:, self._index[symbol]]
+
+    def series(self, symbol):
+        """(open_time, close) chỉ gồm nến symbol có giá - view khi không thiếu nến"""
+        j = self._index[symbol]
+        if self._complete[j]:
+            return self.open_time, self.closes[:, j]
+        mask = self.valid[:, j]
+        return self.open_time[mask], self.closes[mask, j]
+
+    def pair(self, symbol1, symbol2):
+        """(open_time, close1, close2) chỉ gồm nến cả 2 symbol đều có giá (view zero-copy khi không thiếu nến)"""
+        i, j = self._index[symbol1], self._index[symbol2]
+        if self._complete[i] and self._complete[j]:
+            return self.open_time, self.closes[:, i], self.closes[:, j]
+        mask = self.valid[:, i] & self.valid[:, j]
+        return self.open_time[mask], self.closes[mask, i], self.closes[mask, j]
+
+    def returns_frame(self):
+        """DataFrame log-returns (index timestamp, cột symbol); mask giữ NaN, policy khác chỉ giữ nến mọi symbol đều có"""
+        import pandas as pd  # chỉ cần cho candidate generation
+        rows = np.ones(len(self), dtype=bool) if self.policy == "mask" else self.valid.all(axis=1)
+        prices = self.closes[rows]
+        returns = np.diff(np.log(prices), axis=0)
+        index = self.open_time[rows][1:].astype('datetime64[ms]')
+        return pd.DataFrame(returns, index=index, columns=list(self.symbols))
+
+    @property
+    def nbytes(self):
+        return self.open_time.nbytes + self.closes.nbytes + self.valid.nbytes
+
+
+def current_bar(interval):
+    return int(clock.time() * 1000) // INTERVAL_MS.get(interval, 3_600_000)
+
+def get_panel(symbols, interval, limit, loader, policy=None):
+    """
+    Panel cho các symbols, dùng lại panel đã cache nếu nó chứa đủ symbols cho cùng
+    (interval, limit, policy) và vẫn trong nến hiện tại; loader(symbol, interval, limit) → Klines
+    """
+    policy = policy or PANEL_MISSING_POLICY
+    symbols = list(dict.fromkeys(symbols))
+    bar = current_bar(interval)
+    with _panel_lock:
+        for key in list(_panel_cache):
+            if key[3] != bar:
+                del _panel_cache[key]
+        for key, panel in reversed(_panel_cache.items()):
+            if key[:3] == (interval, limit, policy) and panel.covers(symbols):
+                _panel_cache.move_to_end(key)
+                metrics.inc("cache_requests_total", cache="panel", result="hit")
+                return panel
+    metrics.inc("cache_requests_total", cache="panel", result="miss")
+
+    panel = load_panel(symbols, interval, limit, loader, policy)
+    with _panel_lock:
+        _panel_cache[(interval, limit, policy, bar, tuple(symbols))] = panel
+        while len(_panel_cache) > PANEL_CACHE_SIZE:
+            _panel_cache.popitem(last=False)
+    return panel
+
+def load_panel(symbols, interval, limit, loader, policy=None):
+    """Panel tải mới từ loader, không qua cache (cho đường cần giá mới nhất trong nến, vd monitor exit)"""
+    symbols = list(dict.fromkeys(symbols))
+    return Panel.from_klines({symbol: loader(symbol, interval, limit) for symbol in symbols}, policy)
+
+def clear_panel_cache():
+    with _panel_lock:
+        _panel_cache.clear()
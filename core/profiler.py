@@ -0,0 +1,205 @@
+# profiler.py
+"""
+Profiling opt-in cho scheduler jobs và executor loops (cProfile):
+- Bật bằng PROFILE_JOBS trong .env hoặc runtime qua file điều khiển STATE_DIR/profiles/control.json
+  (admin API ghi file này → không cần redeploy/restart process)
+- Mỗi lần chạy job lưu một file .prof (định dạng pstats chuẩn: snakeviz, gprof2dot, flameprof đọc được)
+  + summary JSON các hàm nóng; giữ PROFILE_KEEP file gần nhất cho mỗi job
+- Thread tạo ra trong lúc job chạy (ThreadPoolExecutor của scan) cũng được profile và gộp vào kết quả
+"""
+import os
+import sys
+import json
+import pstats
+import cProfile
+import threading
+import functools
+from datetime import datetime
+from contextlib import contextmanager
+from config import STATE_DIR, PROFILE_JOBS, PROFILE_KEEP
+
+PROFILES_DIR = os.path.join(STATE_DIR, "profiles")
+CONTROL_FILE = os.path.join(PROFILES_DIR, "control.json")
+# Các hàm hot path luôn có trong summary
+WATCHED_FUNCTIONS = ("calculate_correlation_cointegration", "coint", "get_data_with_retry", "save_pair_signals",
+                     "calculate_pair_z_score", "engle_granger_pvalue")
+
+_control_cache = {'mtime': None, 'jobs': None}
+_control_lock = threading.Lock()
+_profile_lock = threading.Lock()
+
+
+def _parse_jobs(value):
+    if isinstance(value, str):
+        value = value.split(",")
+    return {job.strip() for job in value or [] if job and job.strip()}
+
+def enabled_jobs():
+    """Tập job đang bật profiling: file điều khiển (nếu có) ưu tiên hơn PROFILE_JOBS"""
+    try:
+        mtime = os.path.getmtime(CONTROL_FILE)
+    except OSError:
+        return _parse_jobs(PROFILE_JOBS)
+    with _control_lock:
+        if _control_cache['mtime'] != mtime:
+            try:
+                with open(CONTROL_FILE) as f:
+                    _control_cache['jobs'] = _parse_jobs(json.load(f).get('jobs', []))
+                _control_cache['mtime'] = mtime
+            except (OSError, ValueError):
+                return _parse_jobs(PROFILE_JOBS)
+        return set(_control_cache['jobs'])
+
+def is_enabled(job):
+    jobs = enabled_jobs()
+    return "all" in jobs or job in jobs
+
+def set_enabled_jobs(jobs):
+    """Ghi file điều khiển (dùng bởi admin API); jobs rỗng = tắt toàn bộ"""
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    tmp_path = f"{CONTROL_FILE}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'jobs': sorted(_parse_jobs(jobs)), 'updated_at': datetime.now().isoformat()}, f)
+    os.replace(tmp_path, CONTROL_FILE)
+    return sorted(_parse_jobs(jobs))
+
+
+# ---------- Capture ----------
+
+class _JobProfile:
+    """cProfile cho thread gọi job + các thread được tạo trong lúc job chạy"""
+
+    def __init__(self):
+        self.main = cProfile.Profile()
+        self.thread_profiles = []
+        self._lock = threading.Lock()
+
+    def _thread_hook(self, frame, event, arg):
+        # Chạy một lần ở đầu mỗi thread mới: thay hook bằng cProfile riêng của thread đó
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            return  # Python 3.12+: chỉ một profiler active, bỏ qua thread phụ
+        with self._lock:
+            self.thread_profiles.append(profile)
+
+    def start(self):
+        threading.setprofile(self._thread_hook)
+        self.main.enable()
+
+    def stop(self):
+        self.main.disable()
+        threading.setprofile(None)
+
+    def stats(self):
+        stats = pstats.Stats(self.main)
+        with self._lock:
+            for profile in self.thread_profiles:
+                try:
+                    stats.add(profile)
+                except TypeError:
+                    continue  # Thread không ghi nhận được call nào
+        return stats
+
+
+@contextmanager
+def profile_job(job):
+    """Profile block nếu job đang bật; không bật thì gần như không tốn chi phí"""
+    if not is_enabled(job) or not _profile_lock.acquire(blocking=False):
+        # Chỉ một job được profile tại một thời điểm (hook thread là toàn cục)
+        yield
+        return
+    capture = _JobProfile()
+    started = datetime.now()
+    capture.start()
+    try:
+        yield
+    finally:
+        capture.stop()
+        _profile_lock.release()
+        try:
+            save_profile(job, capture.stats(), started, (datetime.now() - started).total_seconds())
+        except Exception as e:
+            print(f"⚠️ Không lưu được profile cho {job}: {e}")
+
+def profiled(job):
+    """Decorator: profile mỗi lần gọi function dưới tên job"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with profile_job(job):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ---------- Storage / summary ----------
+
+def summarize(stats, top=25):
+    """Top hàm theo cumulative time + thống kê các hàm hot path đã biết"""
+    rows = []
+    for (filename, line, name), (cc, nc, tt, ct, _) in stats.stats.items():
+        rows.append({'function': name, 'file': filename, 'line': line, 'calls': nc,
+                     'tottime': round(tt, 6), 'cumtime': round(ct, 6)})
+    rows.sort(key=lambda r: r['cumtime'], reverse=True)
+    watched = {}
+    for row in rows:
+        if row['function'] in WATCHED_FUNCTIONS:
+            entry = watched.setdefault(row['function'], {'calls': 0, 'tottime': 0.0, 'cumtime': 0.0})
+            entry['calls'] += row['calls']
+            entry['tottime'] += row['tottime']
+            # Hàm đệ quy/nhiều định nghĩa cùng tên: lấy cumtime lớn nhất thay vì cộng dồn
+            entry['cumtime'] = max(entry['cumtime'], row['cumtime'])
+    return {'total_calls': stats.total_calls, 'watched': watched, 'top': rows[:top]}
+
+def save_profile(job, stats, started, duration, keep=PROFILE_KEEP):
+    job_dir = os.path.join(PROFILES_DIR, job)
+    os.makedirs(job_dir, exist_ok=True)
+    name = started.strftime("%Y%m%d_%H%M%S_%f")
+    prof_path = os.path.join(job_dir, f"{name}.prof")
+    stats.dump_stats(prof_path)
+    summary = {'job': job, 'started_at': started.isoformat(), 'duration_seconds': round(duration, 4),
+               'profile': os.path.basename(prof_path), **summarize(stats)}
+    with open(os.path.join(job_dir, f"{name}.json"), 'w') as f:
+        json.dump(summary, f, indent=2)
+    _rotate(job_dir, keep)
+    print(f"🧪 Profile {job}: {duration:.2f}s → {prof_path}")
+    return prof_path
+
+def _rotate(job_dir, keep):
+    runs = sorted(f[:-len(".prof")] for f in os.listdir(job_dir) if f.endswith(".prof"))
+    for name in runs[:-keep] if keep > 0 else []:
+        for ext in (".prof", ".json"):
+            try:
+                os.remove(os.path.join(job_dir, name + ext))
+            except OSError:
+                pass
+
+def list_profiles():
+    """{job: [summary ngắn của từng run, mới nhất trước]}"""
+    result = {}
+    if not os.path.isdir(PROFILES_DIR):
+        return result
+    for job in sorted(os.listdir(PROFILES_DIR)):
+        job_dir = os.path.join(PROFILES_DIR, job)
+        if not os.path.isdir(job_dir):
+            continue
+        runs = []
+        for filename in sorted((f for f in os.listdir(job_dir) if f.endswith(".json")), reverse=True):
+            try:
+                with open(os.path.join(job_dir, filename)) as f:
+                    summary = json.load(f)
+            except (OSError, ValueError):
+                continue
+            runs.append({k: summary.get(k) for k in ('profile', 'started_at', 'duration_seconds', 'watched')})
+        result[job] = runs
+    return result
+
+def profile_path(job, profile):
+    """Đường dẫn file .prof/.json của một run; None nếu tên không hợp lệ hoặc không tồn tại"""
+    if os.path.basename(job) != job or os.path.basename(profile) != profile:
+        return None
+    path = os.path.join(PROFILES_DIR, job, profile)
+    return path if os.path.isfile(path) else None
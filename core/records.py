@@ -0,0 +1,173 @@
+# records.py
+"""
+Record gọn cho các bản ghi đi qua hot path (thay dict JSON từ Supabase và DataFrame nhỏ):
+- Pair, Signal, Position, Ranking: dataclass slots=True (Python >= 3.10), không có __dict__ cho mỗi item
+- from_row()/to_row(): chuyển đổi nhanh với dict của DB layer (bỏ qua cột lạ)
+- get()/[] giữ tương thích với code cũ đang dùng position.get('tp'), pair['pair1']
+- to_structured(): NumPy structured array cho tập lớn (backtest, thống kê)
+"""
+from dataclasses import dataclass, fields
+from datetime import datetime
+import numpy as np
+
+
+class _RecordMixin:
+    __slots__ = ()
+
+    @classmethod
+    def field_names(cls):
+        names = cls.__dict__.get('_field_names')
+        if names is None:
+            names = tuple(f.name for f in fields(cls))
+            setattr(cls, '_field_names', names)
+        return names
+
+    @classmethod
+    def from_row(cls, row):
+        if isinstance(row, cls):
+            return row
+        return cls(**{name: row[name] for name in cls.field_names() if name in row})
+
+    @classmethod
+    def from_rows(cls, rows):
+        return [cls.from_row(row) for row in rows or []]
+
+    def to_row(self, skip_none=False):
+        row = {name: getattr(self, name) for name in self.field_names()}
+        if skip_none:
+            row = {k: v for k, v in row.items() if v is not None}
+        return row
+
+    # Tương thích dict
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.field_names() else default
+
+    def __getitem__(self, key):
+        if key not in self.field_names():
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.field_names()
+
+
+@dataclass(slots=True)
+class Pair(_RecordMixin):
+    pair1: str
+    pair2: str
+    id: int = None
+    date: str = None
+    correlation: float = None
+    rolling_correlation: float = None
+    cointegration_p_value: float = None
+    is_cointegrated: bool = None
+    volatility_1: float = None
+    volatility_2: float = None
+    rank: int = None
+
+
+@dataclass(slots=True)
+class Signal(_RecordMixin):
+    symbol: str
+    signal_type: str
+    z_score: float
+    pair1: str = None
+    pair2: str = None
+    pair_id: int = None
+    spread: float = None
+    timestamp: str = None
+    tp: float = None
+    sl: float = None
+    entry: float = None
+    confirmation_details: str = None
+    id: int = None
+
+    @property
+    def abs_z(self):
+        return abs(self.z_score)
+
+
+@dataclass(slots=True)
+class Position(_RecordMixin):
+    symbol: str
+    entry_price: float
+    quantity: float
+    id: int = None
+    pair_id: int = None
+    status: str = None
+    entry_time: str = None
+    exit_time: str = None
+    binance_order_id: str = None
+    pnl: float = None
+    tp: float = None
+    sl: float = None
+    z_score: float = None
+    signal_type: str = None
+    reason: str = None
+
+    @property
+    def notional(self):
+        return float(self.entry_price) * float(self.quantity)
+
+
+@dataclass(slots=True)
+class Ranking(_RecordMixin):
+    pair_id: int
+    current_rank: int
+    id: int = None
+    timestamp: str = None
+    current_correlation: float = None
+    rolling_correlation: float = None
+    volatility_1: float = None
+    volatility_2: float = None
+
+
+# ---------- Structured arrays ----------
+
+POSITION_DTYPE = np.dtype([
+    ('id', 'i8'), ('pair_id', 'i8'), ('symbol', 'U24'), ('signal_type', 'U4'),
+    ('entry_price', 'f8'), ('quantity', 'f8'), ('pnl', 'f8'),
+    ('entry_time', 'datetime64[ms]'), ('exit_time', 'datetime64[ms]')
+])
+
+SIGNAL_DTYPE = np.dtype([
+    ('pair_id', 'i8'), ('symbol', 'U24'), ('signal_type', 'U4'),
+    ('z_score', 'f8'), ('spread', 'f8'), ('timestamp', 'datetime64[ms]')
+])
+
+
+def _to_datetime64(value):
+    if value is None:
+        return np.datetime64('NaT', 'ms')
+    if isinstance(value, datetime):
+        value = value.replace(tzinfo=None)
+    else:
+        value = datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(tzinfo=None)
+    return np.datetime64(value, 'ms')
+
+def to_structured(rows, dtype):
+    """Dict/record → structured array; None: số → NaN (id → -1), thời gian → NaT"""
+    array = np.empty(len(rows), dtype=dtype)
+    for name in dtype.names:
+        kind = dtype[name].kind
+        values = [row.get(name) for row in rows]
+        if kind == 'M':
+            array[name] = [_to_datetime64(v) for v in values]
+        elif kind == 'i':
+            array[name] = [-1 if v is None else int(v) for v in values]
+        elif kind == 'f':
+            array[name] = [np.nan if v is None else float(v) for v in values]
+        else:
+            array[name] = ['' if v is None else str(v) for v in values]
+    return array
+
+
+def dedup_signals(signals):
+    """Mỗi (symbol, signal_type) giữ signal có |z_score| lớn nhất, sắp theo |z_score| giảm dần"""
+    best = {}
+    for signal in signals:
+        key = (signal.symbol, signal.signal_type)
+        current = best.get(key)
+        if current is None or signal.abs_z > current.abs_z:
+            best[key] = signal
+    return sorted(best.values(), key=lambda s: s.abs_z, reverse=True)
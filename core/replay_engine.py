@@ -0,0 +1,271 @@
+# replay_engine.py
+"""
+Replay engine cho trade executor simulation:
+- Đưa 1m klines hoặc aggTrades đã ghi lại qua execute_trade_simulation,
+  should_close_position_tp_sl và close_position_simulation
+- Dùng VirtualClock thay cho time.sleep()/datetime.now() → replay nhanh hơn thời gian thực
+- Báo cáo chất lượng fill (slippage so với entry của signal) và exit (trượt so với TP/SL)
+
+Chạy:
+    python -m core.replay_engine --klines BTCUSDT=btc_1m.csv --klines ETHUSDT=eth_1m.csv --signals signals.json
+"""
+import csv
+import json
+import heapq
+import argparse
+import time as wall_time
+from datetime import datetime
+from core import clock
+from core.clock import VirtualClock
+from core.account_ledger import AccountLedger
+from core.risk_engine import RiskEngine
+import core.trade_executor_simulation as executor
+
+
+class ReplayStore:
+    """Kho positions in-memory thay SupabaseManager trong lúc replay (chỉ các method executor dùng)"""
+
+    def __init__(self, pairs=None, rankings=None):
+        self.pairs = pairs or {}
+        self.rankings = rankings or []
+        self.positions = []
+        self._next_id = 1
+
+    def save_position(self, position_data):
+        position = dict(position_data)
+        position['id'] = self._next_id
+        self._next_id += 1
+        self.positions.append(position)
+        return [dict(position)]
+
+    def update_position_status(self, position_id, status, pnl=None, reason=None):
+        for position in self.positions:
+            if position['id'] == position_id:
+                position['status'] = status
+                if pnl is not None:
+                    position['pnl'] = pnl
+                if status == 'CLOSED':
+                    position['exit_time'] = clock.now().isoformat()
+                if reason is not None:
+                    position['reason'] = reason
+                return [dict(position)]
+        return None
+
+    def get_open_positions_by_symbol(self, symbol):
+        return [dict(p) for p in self.positions if p['symbol'] == symbol and p['status'] == 'OPEN']
+
+    def get_open_positions_by_pair_id(self, pair_id):
+        return [dict(p) for p in self.positions if p['pair_id'] == pair_id and p['status'] == 'OPEN']
+
+    def get_all_open_positions(self):
+        return [dict(p) for p in self.positions if p['status'] == 'OPEN']
+
+    def get_closed_positions(self):
+        return [dict(p) for p in self.positions if p['status'] == 'CLOSED']
+
+    def get_hourly_rankings(self):
+        return list(self.rankings)
+
+    def get_pair_by_id(self, pair_id):
+        return self.pairs.get(pair_id, {'id': pair_id})
+
+
+def kline_ticks(symbol, klines):
+    """
+    Tách mỗi nến 1m thành 4 tick theo đường đi hợp lý trong nến:
+    nến tăng O → L → H → C, nến giảm O → H → L → C
+    """
+    for k in klines:
+        open_time = int(k[0])
+        o, h, l, c = float(k[1]), float(k[2]), float(k[3]), float(k[4])
+        close_time = int(k[6]) if len(k) > 6 else open_time + 59_999
+        step = (close_time - open_time) // 3
+        path = (o, l, h, c) if c >= o else (o, h, l, c)
+        for i, price in enumerate(path):
+            yield open_time + i * step, symbol, price
+
+def trade_ticks(symbol, trades):
+    """aggTrades dạng (transact_time_ms, price)"""
+    for ts, price in trades:
+        yield int(ts), symbol, float(price)
+
+def parse_signal_time(signal):
+    timestamp = signal['timestamp']
+    if isinstance(timestamp, (int, float)):
+        return int(timestamp)
+    return int(datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp() * 1000)
+
+
+class ReplayEngine:
+    """Replay deterministic các signals trên tick stream với đồng hồ ảo"""
+
+    def __init__(self, klines_by_symbol=None, trades_by_symbol=None, signals=None,
+                 pairs=None, rankings=None, start_balance=executor.SIMULATION_BALANCE):
+        self.klines_by_symbol = klines_by_symbol or {}
+        self.trades_by_symbol = trades_by_symbol or {}
+        self.signals = sorted(signals or [], key=parse_signal_time)
+        self.store = ReplayStore(pairs, rankings)
+        self.start_balance = start_balance
+        self.prices = {}
+        self.fills = []
+        self.exits = []
+
+    def _tick_stream(self):
+        streams = [kline_ticks(s, k) for s, k in self.klines_by_symbol.items()]
+        streams += [trade_ticks(s, t) for s, t in self.trades_by_symbol.items()]
+        return heapq.merge(*streams, key=lambda tick: tick[0])
+
+    def _price(self, symbol):
+        return self.prices.get(symbol)
+
+    def _execute_signal(self, signal, signal_ms):
+        pair = self.store.get_pair_by_id(signal.get('pair_id'))
+        result = executor.execute_trade_simulation(signal, pair, executor.get_simulation_balance())
+        if not result:
+            return
+        fill = {
+            'symbol': signal['symbol'],
+            'side': signal['signal_type'],
+            'signal_time': signal_ms,
+            'fill_time': clock.get_clock().time_ms(),
+            'fill_price': result['price'],
+            'signal_entry': signal.get('entry')
+        }
+        if fill['signal_entry']:
+            direction = 1 if fill['side'] == 'BUY' else -1
+            fill['slippage_bps'] = direction * (fill['fill_price'] - fill['signal_entry']) / fill['signal_entry'] * 10_000
+        self.fills.append(fill)
+
+    def _check_exits(self, symbol, price):
+        for position in self.store.get_open_positions_by_symbol(symbol):
+            should_close, reason = executor.should_close_position_tp_sl(position, price)
+            if not should_close:
+                continue
+            result = executor.close_position_simulation(position, price, reason)
+            if not result:
+                continue
+            level = position['tp'] if reason == 'TP hit' else position['sl']
+            direction = 1 if position['signal_type'] == 'BUY' else -1
+            entry_ms = int(datetime.fromisoformat(position['entry_time']).timestamp() * 1000)
+            self.exits.append({
+                'symbol': symbol,
+                'reason': reason,
+                'exit_price': price,
+                'trigger_level': level,
+                # Dương = thoát tốt hơn mức trigger, âm = trượt giá
+                'overshoot_bps': direction * (price - level) / level * 10_000,
+                'holding_seconds': (clock.get_clock().time_ms() - entry_ms) / 1000,
+                'pnl': result['pnl']
+            })
+
+    def run(self):
+        """Chạy replay, trả về báo cáo fill/exit quality"""
+        started = wall_time.perf_counter()
+        virtual_clock = VirtualClock()
+        previous_clock = clock.set_clock(virtual_clock)
+        previous_source = executor.set_price_source(self._price)
+        previous_store = executor.supabase_manager
+        previous_ledger = executor.ledger
+        previous_risk_engine = executor.risk_engine
+        executor.supabase_manager = self.store
+        executor.ledger = AccountLedger(self.start_balance)
+        executor.risk_engine = RiskEngine()
+
+        pending = [(parse_signal_time(s), i, s) for i, s in enumerate(self.signals)]
+        heapq.heapify(pending)
+        first_ms = last_ms = None
+        try:
+            for ts, symbol, price in self._tick_stream():
+                virtual_clock.advance_to(ts)
+                first_ms = ts if first_ms is None else first_ms
+                last_ms = ts
+                self.prices[symbol] = price
+                # Signal được fill ở tick đầu tiên sau thời điểm phát ra (có giá cho symbol)
+                while pending and pending[0][0] <= ts and pending[0][2]['symbol'] in self.prices:
+                    signal_ms, _, signal = heapq.heappop(pending)
+                    self._execute_signal(signal, signal_ms)
+                self._check_exits(symbol, price)
+            final_balance = executor.get_simulation_balance()
+        finally:
+            executor.supabase_manager = previous_store
+            executor.ledger = previous_ledger
+            executor.risk_engine = previous_risk_engine
+            executor.set_price_source(previous_source)
+            clock.set_clock(previous_clock)
+
+        elapsed = wall_time.perf_counter() - started
+        replayed_seconds = (last_ms - first_ms) / 1000 if first_ms is not None else 0
+        return self._report(final_balance, elapsed, replayed_seconds, len(pending))
+
+    def _report(self, final_balance, elapsed, replayed_seconds, unfilled):
+        def mean(values):
+            values = [v for v in values if v is not None]
+            return sum(values) / len(values) if values else None
+
+        return {
+            'fills': self.fills,
+            'exits': self.exits,
+            'summary': {
+                'signals': len(self.signals),
+                'filled': len(self.fills),
+                'unfilled': unfilled,
+                'closed': len(self.exits),
+                'open': len(self.store.get_all_open_positions()),
+                'avg_slippage_bps': mean(f.get('slippage_bps') for f in self.fills),
+                'avg_fill_latency_seconds': mean((f['fill_time'] - f['signal_time']) / 1000 for f in self.fills),
+                'avg_exit_overshoot_bps': mean(e['overshoot_bps'] for e in self.exits),
+                'avg_holding_seconds': mean(e['holding_seconds'] for e in self.exits),
+                'realized_pnl': sum(e['pnl'] for e in self.exits),
+                'start_balance': self.start_balance,
+                'final_balance': final_balance,
+                'replayed_seconds': replayed_seconds,
+                'wall_seconds': elapsed,
+                'speedup': replayed_seconds / elapsed if elapsed > 0 else None
+            }
+        }
+
+
+def load_klines_csv(path):
+    """Đọc klines CSV (format data.binance.vision hoặc futures_klines), bỏ qua header nếu có"""
+    with open(path) as f:
+        return [row for row in csv.reader(f) if row and row[0].isdigit()]
+
+def load_agg_trades_csv(path):
+    """Đọc aggTrades CSV: agg_trade_id, price, quantity, first_id, last_id, transact_time, is_buyer_maker"""
+    with open(path) as f:
+        return [(int(row[5]), float(row[1])) for row in csv.reader(f) if row and row[0].isdigit()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay signals trên klines/aggTrades đã ghi lại")
+    parser.add_argument("--klines", action="append", default=[], help="SYMBOL=path.csv (1m klines)")
+    parser.add_argument("--trades", action="append", default=[], help="SYMBOL=path.csv (aggTrades)")
+    parser.add_argument("--signals", required=True, help="JSON list các signals (timestamp, symbol, signal_type, z_score, pair_id)")
+    parser.add_argument("--rankings", help="JSON list hourly_rankings (pair_id, current_rank)")
+    parser.add_argument("--balance", type=float, default=executor.SIMULATION_BALANCE)
+    parser.add_argument("--output", help="Ghi báo cáo đầy đủ ra file JSON")
+    args = parser.parse_args()
+
+    klines = {spec.split("=", 1)[0]: load_klines_csv(spec.split("=", 1)[1]) for spec in args.klines}
+    trades = {spec.split("=", 1)[0]: load_agg_trades_csv(spec.split("=", 1)[1]) for spec in args.trades}
+    with open(args.signals) as f:
+        signals = json.load(f)
+    rankings = []
+    if args.rankings:
+        with open(args.rankings) as f:
+            rankings = json.load(f)
+
+    report = ReplayEngine(klines, trades, signals, rankings=rankings, start_balance=args.balance).run()
+    summary = report['summary']
+    print("\n📊 REPLAY SUMMARY")
+    print("=" * 50)
+    for key, value in summary.items():
+        print(f"- {key}: {value:.4f}" if isinstance(value, float) else f"- {key}: {value}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Đã lưu báo cáo: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
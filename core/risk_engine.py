@@ -0,0 +1,182 @@
+# risk_engine.py
+import threading
+from datetime import datetime
+import numpy as np
+from config import (DAILY_LIMIT, MAX_PAIRS_PER_DAY, MAX_GROSS_EXPOSURE, MAX_NET_EXPOSURE,
+                    MAX_SYMBOL_EXPOSURE, MAX_CORRELATED_EXPOSURE, RISK_CORRELATION_THRESHOLD)
+from core import clock
+
+
+def side_sign(signal_type):
+    return 1.0 if signal_type == 'BUY' else -1.0
+
+
+class RiskEngine:
+    """
+    Pre-trade risk engine:
+    - Exposure hiện tại giữ trong numpy array (signed notional, BUY dương / SELL âm) theo index symbol
+    - evaluate() kiểm tra cả batch candidates trong một lượt vectorized: position đã mở, gross/net notional,
+      tập trung theo symbol, exposure tương quan (qua ma trận correlation) và giới hạn theo ngày
+    - Đồng bộ từ positions một lần mỗi chu kỳ thay vì query Supabase cho từng signal
+    """
+
+    def __init__(self, max_gross=MAX_GROSS_EXPOSURE, max_net=MAX_NET_EXPOSURE,
+                 max_symbol=MAX_SYMBOL_EXPOSURE, max_correlated=MAX_CORRELATED_EXPOSURE,
+                 daily_limit=DAILY_LIMIT, max_pairs_per_day=MAX_PAIRS_PER_DAY,
+                 correlation_threshold=RISK_CORRELATION_THRESHOLD):
+        self.max_gross = max_gross
+        self.max_net = max_net
+        self.max_symbol = max_symbol
+        self.max_correlated = max_correlated
+        self.daily_limit = daily_limit
+        self.max_pairs_per_day = max_pairs_per_day
+        self.correlation_threshold = correlation_threshold
+        self._lock = threading.RLock()
+        self._index = {}
+        self._exposure = np.zeros(0)
+        self._corr = np.zeros((0, 0))
+        self._day = None
+        self._opened_today = 0.0
+        self._pairs_today = set()
+
+    # ---------- State ----------
+
+    def _symbol_index(self, symbol):
+        """Index của symbol, mở rộng array khi gặp symbol mới"""
+        idx = self._index.get(symbol)
+        if idx is None:
+            idx = len(self._index)
+            self._index[symbol] = idx
+            self._exposure = np.append(self._exposure, 0.0)
+            corr = np.eye(idx + 1)
+            corr[:idx, :idx] = self._corr
+            self._corr = corr
+        return idx
+
+    def _roll_day(self):
+        today = clock.now().date()
+        if self._day != today:
+            self._day = today
+            self._opened_today = 0.0
+            self._pairs_today = set()
+
+    def sync_positions(self, open_positions):
+        """Đồng bộ exposure từ danh sách open positions (một query cho cả chu kỳ)"""
+        with self._lock:
+            self._exposure[:] = 0.0
+            for position in open_positions:
+                idx = self._symbol_index(position['symbol'])
+                notional = float(position['entry_price']) * float(position['quantity'])
+                self._exposure[idx] += side_sign(position.get('signal_type')) * notional
+
+    def rebuild(self, open_positions, closed_positions):
+        """Khôi phục exposure và hạn mức ngày (positions mở trong hôm nay) khi khởi động"""
+        with self._lock:
+            self.sync_positions(open_positions)
+            self._roll_day()
+            for position in list(open_positions) + list(closed_positions):
+                entry_time = position.get('entry_time')
+                try:
+                    entry_date = datetime.fromisoformat(str(entry_time).replace('Z', '+00:00')).date()
+                except ValueError:
+                    continue
+                if entry_date == self._day:
+                    self._opened_today += float(position['entry_price']) * float(position['quantity'])
+                    if position.get('pair_id') is not None:
+                        self._pairs_today.add(position['pair_id'])
+
+    def set_pair_correlations(self, pairs):
+        """Nạp ma trận correlation từ daily_pairs (pair1, pair2, correlation)"""
+        with self._lock:
+            for pair in pairs:
+                if pair.get('correlation') is None:
+                    continue
+                i = self._symbol_index(pair['pair1'])
+                j = self._symbol_index(pair['pair2'])
+                self._corr[i, j] = self._corr[j, i] = float(pair['correlation'])
+
+    def record_fill(self, symbol, signal_type, notional, pair_id=None):
+        with self._lock:
+            self._roll_day()
+            idx = self._symbol_index(symbol)
+            self._exposure[idx] += side_sign(signal_type) * notional
+            self._opened_today += notional
+            if pair_id is not None:
+                self._pairs_today.add(pair_id)
+
+    def record_close(self, symbol, signal_type, notional):
+        with self._lock:
+            idx = self._symbol_index(symbol)
+            self._exposure[idx] -= side_sign(signal_type) * notional
+            if abs(self._exposure[idx]) < 1e-9:
+                self._exposure[idx] = 0.0
+
+    def has_position(self, symbol):
+        with self._lock:
+            idx = self._index.get(symbol)
+            return idx is not None and self._exposure[idx] != 0.0
+
+    # ---------- Evaluation ----------
+
+    def evaluate(self, candidates):
+        """
+        Đánh giá batch candidates (dict: symbol, signal_type, notional, pair_id, group) so với exposure hiện tại.
+        Các legs cùng `group` (vd. 2 legs của một pair signal) được cộng dồn; các group xét độc lập với nhau.
+        Trả về (approved: np.ndarray[bool], reasons: list[str | None])
+        """
+        n = len(candidates)
+        if n == 0:
+            return np.zeros(0, dtype=bool), []
+        with self._lock:
+            self._roll_day()
+            idx = np.array([self._symbol_index(c['symbol']) for c in candidates])
+            notional = np.array([float(c['notional']) for c in candidates])
+            delta = np.array([side_sign(c['signal_type']) for c in candidates]) * notional
+            group_keys = [c.get('group', i) for i, c in enumerate(candidates)]
+            _, group = np.unique(np.array([str(k) for k in group_keys]), return_inverse=True)
+            same_group = group[:, None] == group[None, :]
+
+            exposure = self._exposure
+            current = exposure[idx]
+            # Delta cộng dồn của các legs cùng group trên cùng symbol
+            after = current + (same_group & (idx[:, None] == idx[None, :])) @ delta
+            gross_change = np.abs(after) - np.abs(current)
+            gross_after = np.abs(exposure).sum() + np.bincount(group, weights=gross_change)[group]
+            net_after = exposure.sum() + np.bincount(group, weights=delta)[group]
+
+            # Exposure tương quan: tổng exposure có dấu của các symbol có |rho| >= threshold (gồm chính nó)
+            weights = np.where(np.abs(self._corr[idx]) >= self.correlation_threshold, self._corr[idx], 0.0)
+            weights[np.arange(n), idx] = 1.0
+            correlated_after = np.abs(weights @ exposure + (weights[:, idx] * same_group) @ delta)
+
+            daily_after = self._opened_today + np.bincount(group, weights=notional)[group]
+            new_pair = np.array([c.get('pair_id') not in self._pairs_today for c in candidates])
+            pairs_after = len(self._pairs_today) + new_pair.astype(int)
+
+            checks = [
+                (current != 0.0, "existing position"),
+                (gross_after > self.max_gross, "gross exposure"),
+                (np.abs(net_after) > self.max_net, "net exposure"),
+                (np.abs(after) > self.max_symbol, "symbol concentration"),
+                (correlated_after > self.max_correlated, "correlated exposure"),
+                (daily_after > self.daily_limit, "DAILY_LIMIT"),
+                (new_pair & (pairs_after > self.max_pairs_per_day), "MAX_PAIRS_PER_DAY"),
+            ]
+
+        approved = np.ones(n, dtype=bool)
+        reasons = [None] * n
+        for failed, reason in checks:
+            for i in np.nonzero(failed & approved)[0]:
+                reasons[i] = reason
+            approved &= ~failed
+        return approved, reasons
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'exposure': {s: float(self._exposure[i]) for s, i in self._index.items() if self._exposure[i] != 0.0},
+                'gross': float(np.abs(self._exposure).sum()),
+                'net': float(self._exposure.sum()),
+                'opened_today': self._opened_today,
+                'pairs_today': len(self._pairs_today)
+            }
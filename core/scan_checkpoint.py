@@ -0,0 +1,210 @@
+# scan_checkpoint.py
+import os
+import json
+import threading
+import numpy as np
+from config import STATE_DIR, SCAN_CHECKPOINT_KEEP_DAYS
+from core import clock
+
+try:
+    import fcntl
+except ImportError:  # Windows: không có flock, chỉ còn exclusivity trong process (job queue)
+    fcntl = None
+
+SCAN_CHECKPOINT_DIR = os.path.join(STATE_DIR, "scan_checkpoints")
+SCAN_LOCK_FILE = os.path.join(STATE_DIR, "scan.lock")
+
+
+def _json_default(value):
+    # Kết quả phân tích cặp có thể chứa numpy scalar (np.bool_, np.float64...)
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Không serialize được {type(value).__name__}")
+
+def pair_key(symbol1, symbol2):
+    return f"{symbol1}|{symbol2}"
+
+
+class ScanInProgress(Exception):
+    """Một daily scan khác (scheduler, catch-up hoặc job API) đang giữ scan lock"""
+
+
+class ScanLock:
+    """
+    Lock liên process (flock trên STATE_DIR/scan.lock) cho daily scan: scheduler và API cùng ghi checkpoint
+    của một ngày, chạy song song sẽ trùng chunk/daily_pairs. Không chờ: đang bị giữ thì raise ScanInProgress.
+    OS tự nhả lock khi process chết nên không có lock "mồ côi".
+    """
+
+    def __init__(self, path=SCAN_LOCK_FILE):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        if fcntl is None:
+            return self
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        lock_file = open(self.path, 'a+')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.seek(0)
+            owner = lock_file.read().strip() or "?"
+            lock_file.close()
+            raise ScanInProgress(f"Daily scan đang chạy ở process {owner}")
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+        self._file = lock_file
+        return self
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class ScanCheckpoint:
+    """
+    Checkpoint của daily scan theo ngày, để scan chết giữa chừng chạy lại tiếp từ chỗ dừng:
+    - <day>.json: output của các stage đã xong (volume_filter, quality_filter, pair_analysis, daily_pairs, ranking),
+      ghi lại toàn bộ file bằng atomic rename sau mỗi stage
+    - <day>.chunks.jsonl: kết quả từng chunk phân tích cặp (append + fsync) → chạy lại bỏ qua các cặp đã xong;
+      dòng cuối ghi dở khi crash bị bỏ qua, chunk đó được phân tích lại
+    - Stage "ranking" có trong checkpoint = scan của ngày đã hoàn thành
+    """
+
+    STAGES = ("volume_filter", "quality_filter", "pair_analysis", "daily_pairs", "ranking")
+
+    def __init__(self, day=None, directory=SCAN_CHECKPOINT_DIR, keep_days=SCAN_CHECKPOINT_KEEP_DAYS):
+        self.day = str(day or clock.now().date())
+        self.directory = directory
+        self.keep_days = keep_days
+        self.stage_path = os.path.join(directory, f"{self.day}.json")
+        self.chunk_path = os.path.join(directory, f"{self.day}.chunks.jsonl")
+        self._lock = threading.Lock()
+        self._chunk_file = None
+        self._stages = self._load_stages()
+
+    # ---------- Stages ----------
+
+    def get(self, stage, default=None):
+        with self._lock:
+            return self._stages.get(stage, default)
+
+    def put(self, stage, value):
+        """Lưu output của stage; stage pair_analysis xong thì chunk log không còn cần"""
+        with self._lock:
+            self._stages[stage] = value
+            self._write_stages()
+            if stage == "pair_analysis":
+                self._close_chunks()
+                self._remove(self.chunk_path)
+
+    @property
+    def is_complete(self):
+        with self._lock:
+            return "ranking" in self._stages
+
+    def completed_stages(self):
+        with self._lock:
+            return [stage for stage in self.STAGES if stage in self._stages]
+
+    def clear(self):
+        """Bỏ checkpoint của ngày (chạy lại scan từ đầu)"""
+        with self._lock:
+            self._stages = {}
+            self._close_chunks()
+            self._remove(self.stage_path)
+            self._remove(self.chunk_path)
+
+    # ---------- Pair analysis chunks ----------
+
+    def load_chunks(self):
+        """(set cặp đã phân tích, list kết quả hợp lệ) từ chunk log"""
+        done, results = set(), []
+        try:
+            with open(self.chunk_path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        done.update(entry['pairs'])
+                        results.extend(entry['results'])
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"⚠️ Không đọc được scan chunk log ({self.chunk_path}): {e}")
+        return done, results
+
+    def record_chunk(self, pairs, results):
+        entry = {'pairs': [pair_key(symbol1, symbol2) for symbol1, symbol2 in pairs], 'results': results}
+        line = json.dumps(entry, default=_json_default) + '\n'
+        with self._lock:
+            try:
+                if self._chunk_file is None:
+                    os.makedirs(self.directory, exist_ok=True)
+                    self._chunk_file = open(self.chunk_path, 'a')
+                self._chunk_file.write(line)
+                self._chunk_file.flush()
+                os.fsync(self._chunk_file.fileno())
+            except Exception as e:
+                print(f"❌ Không ghi được scan chunk log ({self.chunk_path}): {e}")
+
+    def close(self):
+        with self._lock:
+            self._close_chunks()
+
+    # ---------- Internals ----------
+
+    def _load_stages(self):
+        try:
+            with open(self.stage_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"⚠️ Không đọc được scan checkpoint ({self.stage_path}): {e}")
+            return {}
+
+    def _write_stages(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{self.stage_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self._stages, f, default=_json_default)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.stage_path)
+            self._prune()
+        except Exception as e:
+            print(f"❌ Không lưu được scan checkpoint ({self.stage_path}): {e}")
+
+    def _close_chunks(self):
+        if self._chunk_file is not None:
+            self._chunk_file.close()
+            self._chunk_file = None
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _prune(self):
+        """Giữ checkpoint của keep_days ngày gần nhất"""
+        days = sorted({name.split('.')[0] for name in os.listdir(self.directory)})
+        for day in days[:-self.keep_days] if self.keep_days > 0 else []:
+            if day == self.day:
+                continue
+            for suffix in (".json", ".chunks.jsonl"):
+                self._remove(os.path.join(self.directory, f"{day}{suffix}"))
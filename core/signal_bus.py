@@ -0,0 +1,129 @@
+# signal_bus.py
+"""
+Signal bus cho handoff signal generator → executor:
+- Trong cùng process: publish() đẩy thẳng vào queue của các subscriber
+- Khác process: executor mở listener local (multiprocessing.connection), generator gửi qua socket.
+  Chỉ bật khi có SIGNAL_BUS_AUTHKEY; payload là JSON (send_bytes/recv_bytes), không dùng pickle
+- Database vẫn là kênh durable: executor poll DB như fallback khi bus không có gì
+"""
+import json
+import queue
+import threading
+from datetime import datetime
+from multiprocessing.connection import Listener, Client
+from config import SIGNAL_BUS_HOST, SIGNAL_BUS_PORT, SIGNAL_BUS_AUTHKEY
+
+_subscribers = []
+_subscribers_lock = threading.Lock()
+_server_thread = None
+# Giới hạn kích thước một message nhận qua socket
+MAX_MESSAGE_BYTES = 1024 * 1024
+
+
+def signal_key(signal):
+    """Khóa idempotency giống ràng buộc trùng trong save_pair_signals: pair_id + symbol + type + timestamp"""
+    timestamp = signal.get('timestamp')
+    try:
+        timestamp = datetime.fromisoformat(str(timestamp).replace('Z', '+00:00')).replace(tzinfo=None).isoformat()
+    except ValueError:
+        pass
+    return f"{signal.get('pair_id')}|{signal.get('symbol')}|{signal.get('signal_type')}|{timestamp}"
+
+def subscribe(maxsize=1000):
+    """Đăng ký nhận signals trong process hiện tại, trả về queue (mỗi phần tử là list signals)"""
+    q = queue.Queue(maxsize=maxsize)
+    with _subscribers_lock:
+        _subscribers.append(q)
+    return q
+
+def unsubscribe(q):
+    with _subscribers_lock:
+        if q in _subscribers:
+            _subscribers.remove(q)
+
+def publish_local(signals):
+    """Đẩy signals cho các subscriber trong process, trả về số subscriber nhận được"""
+    with _subscribers_lock:
+        subscribers = list(_subscribers)
+    delivered = 0
+    for q in subscribers:
+        try:
+            q.put_nowait(list(signals))
+            delivered += 1
+        except queue.Full:
+            print("⚠️ Signal bus queue đầy, bỏ qua (executor sẽ lấy lại từ DB)")
+    return delivered
+
+def remote_enabled():
+    return bool(SIGNAL_BUS_AUTHKEY)
+
+def encode_signals(signals):
+    return json.dumps(list(signals), default=str).encode()
+
+def decode_signals(payload):
+    """List signal dict từ payload JSON; ValueError nếu không đúng định dạng"""
+    signals = json.loads(payload)
+    if not isinstance(signals, list) or not all(isinstance(signal, dict) for signal in signals):
+        raise ValueError("payload signal bus phải là list các dict")
+    return signals
+
+def publish_remote(signals, timeout=1.0):
+    """Gửi signals tới executor process qua local socket; False nếu bus tắt hoặc executor không lắng nghe"""
+    if not remote_enabled():
+        return False
+    try:
+        conn = Client((SIGNAL_BUS_HOST, SIGNAL_BUS_PORT), authkey=SIGNAL_BUS_AUTHKEY.encode())
+    except (ConnectionRefusedError, OSError):
+        return False
+    try:
+        conn.send_bytes(encode_signals(signals))
+        return True
+    except Exception as e:
+        print(f"⚠️ Không gửi được signals qua bus: {e}")
+        return False
+    finally:
+        conn.close()
+
+def publish(signals):
+    """Publish tới subscriber local, nếu không có thì gửi sang executor process"""
+    if not signals:
+        return False
+    if publish_local(signals) > 0:
+        return True
+    return publish_remote(signals)
+
+def _serve(listener):
+    while True:
+        try:
+            conn = listener.accept()
+        except Exception as e:
+            print(f"⚠️ Signal bus accept lỗi: {e}")
+            continue
+        try:
+            while True:
+                signals = decode_signals(conn.recv_bytes(MAX_MESSAGE_BYTES))
+                publish_local(signals)
+        except EOFError:
+            pass
+        except Exception as e:
+            print(f"⚠️ Signal bus nhận lỗi: {e}")
+        finally:
+            conn.close()
+
+def start_server():
+    """Mở listener local để nhận signals từ process khác (idempotent)"""
+    global _server_thread
+    if _server_thread is not None:
+        return True
+    if not remote_enabled():
+        print("ℹ️ SIGNAL_BUS_AUTHKEY chưa đặt - signal bus giữa các process tắt, executor dùng DB polling")
+        return False
+    try:
+        listener = Listener((SIGNAL_BUS_HOST, SIGNAL_BUS_PORT), authkey=SIGNAL_BUS_AUTHKEY.encode())
+    except OSError as e:
+        print(f"⚠️ Không mở được signal bus tại {SIGNAL_BUS_HOST}:{SIGNAL_BUS_PORT}: {e} - dùng DB polling")
+        return False
+    _server_thread = threading.Thread(target=_serve, args=(listener,), daemon=True)
+    _server_thread.start()
+    print(f"📡 Signal bus lắng nghe tại {SIGNAL_BUS_HOST}:{SIGNAL_BUS_PORT}")
+    return True
@@ -1,5 +1,4 @@
 # signal_generator.py
-from binance.client import Client
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
@@ -8,17 +7,25 @@ import requests
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
 from functools import lru_cache
-from config import BINANCE_API_KEY, BINANCE_API_SECRET, DAILY_TOP_N
-from core.supabase_manager import SupabaseManager
-from statsmodels.tsa.stattools import coint
-from sklearn.linear_model import LinearRegression
+from config import (DAILY_TOP_N, SPREAD_MODEL,
+                    SIGNAL_TIMEFRAME, SIGNAL_WINDOW, KALMAN_DELTA, KALMAN_OBS_VAR,
+                    SIGNAL_TIMEFRAMES, SIGNAL_BASE_INTERVAL, SIGNAL_MTF_BARS)
+from core.clients import get_binance_client, get_supabase_manager
+from core.exchange_metadata import price_precision, round_price
+from core.kernels import rolling_mean, rolling_std, ols_hedge_ratio, bollinger_bands
+from core.pair_stats import pair_stats_memo, last_close_ms
+from core.zscore_snapshot import zscore_board
+from core.kalman_filter import KalmanHedgeRatio, kalman_store
+from core import signal_bus
+from core import metrics
+from core.klines import parse_klines, concat_klines, resample, INTERVAL_MS
+from core.panel import Panel, get_panel, load_panel
+from core.records import Signal, dedup_signals
 import warnings
 warnings.filterwarnings('ignore')
 
-# Khởi tạo Binance client với retry mechanism
-client = Client(BINANCE_API_KEY, BINANCE_API_SECRET, testnet=False)
-client.timeout = 30
-supabase_manager = SupabaseManager()
+# Binance client / SupabaseManager dùng chung, khởi tạo lazy (xem core/clients.py)
+supabase_manager = get_supabase_manager()
 
 
 
@@ -66,52 +73,87 @@ def get_top_pairs_from_db():
         print(f"❌ Error getting top pairs from DB: {e}")
         return []
 
-def get_klines_data(symbol, interval="15m", limit=168):
-    """Lấy dữ liệu klines từ Binance API - sử dụng futures API"""
+def get_klines(symbol, interval="15m", limit=168):
+    """Lấy klines từ Binance futures API dạng mảng NumPy (Klines)"""
     try:
-        # Sử dụng futures API thay vì spot API
-        klines = client.futures_klines(symbol=symbol, interval=interval, limit=limit)
-        
-        if not klines:
-            return None
-        
-        # Chuyển đổi thành DataFrame
-        df = pd.DataFrame(klines, columns=[
-            'timestamp', 'open', 'high', 'low', 'close', 'volume',
-            'close_time', 'quote_asset_volume', 'number_of_trades',
-            'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'
-        ])
-        
-        # Chuyển đổi kiểu dữ liệu
-        numeric_columns = ['open', 'high', 'low', 'close', 'volume']
-        for col in numeric_columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        # Chuyển đổi timestamp và đảm bảo timezone consistency
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        
-        # Thêm cột open_time để tương thích với code cũ
-        df['open_time'] = df['timestamp']
-        
-        return df
-        
+        return parse_klines(get_binance_client().futures_klines(symbol=symbol, interval=interval, limit=limit))
     except Exception as e:
         print(f"❌ Error getting klines data for {symbol}: {e}")
         return None
 
+def get_klines_data(symbol, interval="15m", limit=168):
+    """Lấy dữ liệu klines từ Binance API dạng DataFrame (open_time = timestamp cho code cũ)"""
+    klines = get_klines(symbol, interval, limit)
+    return klines.to_frame() if klines is not None else None
+
+def get_signal_panel(symbols, timeframe="1h", window=60, fresh=False):
+    """
+    Panel giá căn theo timestamp cho signal generator (cache theo nến hiện tại, dùng chung giữa các cặp).
+    fresh=True: luôn tải lại (monitor exit cần giá mới trong nến đang chạy)
+    """
+    if fresh:
+        return load_panel(symbols, timeframe, max(500, window + 100), loader=get_klines)
+    return get_panel(symbols, timeframe, max(500, window + 100), loader=get_klines)
+
+def get_klines_history(symbol, interval, total, page_limit=1500):
+    """Lấy `total` nến gần nhất, phân trang lùi theo endTime (futures_klines tối đa 1500 nến/lần)"""
+    pages = []
+    end_time = None
+    remaining = total
+    try:
+        while remaining > 0:
+            params = {'symbol': symbol, 'interval': interval, 'limit': min(page_limit, remaining)}
+            if end_time is not None:
+                params['endTime'] = end_time
+            page = parse_klines(get_binance_client().futures_klines(**params))
+            if page is None:
+                break
+            pages.append(page)
+            remaining -= len(page)
+            if len(page) < params['limit']:
+                break
+            end_time = int(page.open_time[0]) - 1
+    except Exception as e:
+        print(f"❌ Error getting klines history for {symbol}: {e}")
+        return None
+    return concat_klines(pages[::-1])
+
+def build_timeframe_panels(symbols, timeframes, base_interval=None, window=60, bars=None):
+    """
+    Panel cho nhiều timeframe từ MỘT chuỗi base mỗi symbol:
+    - base mặc định = timeframe nhỏ nhất; mọi timeframe phải là bội của base
+    - Số API call không tăng theo số timeframe (chỉ phụ thuộc số nến base cần cho timeframe lớn nhất)
+    """
+    base_interval = base_interval or min(timeframes, key=lambda tf: INTERVAL_MS[tf])
+    base_ms = INTERVAL_MS[base_interval]
+    for tf in timeframes:
+        if INTERVAL_MS[tf] < base_ms or INTERVAL_MS[tf] % base_ms:
+            raise ValueError(f"Timeframe {tf} không resample được từ base {base_interval}")
+    bars = bars or window + 100
+    # Thêm một bucket để bù bucket đầu bị bỏ khi base bắt đầu giữa bucket
+    base_limit = (bars + 1) * max(INTERVAL_MS[tf] for tf in timeframes) // base_ms
+
+    base = {symbol: get_klines_history(symbol, base_interval, base_limit) for symbol in dict.fromkeys(symbols)}
+    metrics.inc("mtf_base_series_total", len(base), interval=base_interval)
+    panels = {}
+    for tf in timeframes:
+        frames = {}
+        for symbol, klines in base.items():
+            resampled = klines if tf == base_interval else resample(klines, tf)
+            frames[symbol] = resampled.tail(bars) if resampled is not None else None
+        panels[tf] = Panel.from_klines(frames)
+    return panels
+
 def calculate_volatility_ratio(df1, df2, window=20):
     """Tính tỷ lệ biến động giữa 2 coins sử dụng log-returns để công bằng"""
     try:
         # Tính volatility cho từng coin (rolling standard deviation của log-returns)
-        log_returns1 = np.log(df1['close']).diff()
-        log_returns2 = np.log(df2['close']).diff()
-        
-        vol1 = log_returns1.rolling(window=window).std(ddof=1)
-        vol2 = log_returns2.rolling(window=window).std(ddof=1)
+        log_returns1 = np.diff(np.log(df1['close'].to_numpy(dtype=np.float64)))
+        log_returns2 = np.diff(np.log(df2['close'].to_numpy(dtype=np.float64)))
         
         # Lấy giá trị hiện tại
-        current_vol1 = vol1.iloc[-1]
-        current_vol2 = vol2.iloc[-1]
+        current_vol1 = rolling_std(log_returns1, window)[-1]
+        current_vol2 = rolling_std(log_returns2, window)[-1]
         
         # Tính tỷ lệ biến động với xử lý NaN và zero
         vol_ratio = 1.0
@@ -124,83 +166,169 @@ def calculate_volatility_ratio(df1, df2, window=20):
         print(f"❌ Error calculating volatility ratio: {e}")
         return 1.0, 0.0, 0.0
 
-def calculate_pair_z_score(pair1, pair2, window=60, timeframe="1h"):
+def calculate_pair_z_score_kalman(pair1, pair2, window=60, timeframe="1h", panel=None, fresh=False, state=None):
+    """
+    Z-score theo Kalman hedge ratio động:
+    - State filter lưu theo cặp + timeframe, chỉ cập nhật các nến đã đóng chưa xử lý (O(1) mỗi nến)
+    - Chỉ fetch số nến còn thiếu kể từ lần cập nhật trước
+    - Spread = logA - (alpha + beta*logB) theo state hiện tại, z = spread / sqrt(Q)
+    """
+    try:
+        key = f"{pair1}-{pair2}_{timeframe}"
+        interval_ms = INTERVAL_MS.get(timeframe, 3_600_000)
+        full_limit = max(500, window + 100)
+        now_ms = int(time.time() * 1000)
+
+        kf = kalman_store.get(key)
+        if kf is not None and kf.last_timestamp is not None:
+            missing = (now_ms - kf.last_timestamp) // interval_ms + 2
+            if missing > full_limit:
+                kf = None  # State quá cũ → khởi tạo lại
+        if kf is None or kf.last_timestamp is None:
+            kf = KalmanHedgeRatio(delta=KALMAN_DELTA, obs_var=KALMAN_OBS_VAR)
+            limit = full_limit
+        else:
+            limit = int(max(2, missing))
+
+        # Panel của cả batch (đủ full_limit nến) nếu có, không thì chỉ fetch số nến còn thiếu
+        if panel is None:
+            load = load_panel if fresh else get_panel
+            panel = load([pair1, pair2], timeframe, limit, loader=get_klines)
+        if pair1 not in panel or pair2 not in panel:
+            return None, None, None, None, None, None, None
+
+        open_ms, close_a, close_b = panel.pair(pair1, pair2)
+        if len(open_ms) == 0:
+            return None, None, None, None, None, None, None
+
+        df = pd.DataFrame({'logA': np.log(close_a), 'logB': np.log(close_b)})
+        closed = open_ms + interval_ms <= now_ms
+
+        # Chỉ đưa nến đã đóng vào state (nến đang chạy chỉ dùng để đọc z-score hiện tại)
+        updated = 0
+        for ts, log_a, log_b, is_closed in zip(open_ms, df['logA'], df['logB'], closed):
+            if is_closed and (kf.last_timestamp is None or ts > kf.last_timestamp):
+                kf.update(log_b, log_a, timestamp=ts)
+                updated += 1
+        if updated:
+            kalman_store.put(key, kf)
+
+        # Cần đủ burn-in trước khi tin hedge ratio
+        if kf.n_updates < window:
+            return None, None, None, None, None, None, None
+
+        spread, spread_std = kf.predict(df['logB'].iloc[-1], df['logA'].iloc[-1])
+        if spread_std == 0 or np.isnan(spread_std):
+            return None, None, None, None, None, None, None
+        z_score = spread / spread_std
+
+        volA = volB = vol_ratio = None
+        if len(df) > window:
+            volA = rolling_std(np.diff(df['logA'].to_numpy()), window)[-1]
+            volB = rolling_std(np.diff(df['logB'].to_numpy()), window)[-1]
+            if pd.notna(volA) and pd.notna(volB) and volB != 0:
+                vol_ratio = volA / volB
+
+        if state is not None:
+            state.update(model="kalman", z_score=z_score, spread=spread, spread_mean=0.0, spread_std=spread_std,
+                         hedge_ratio=kf.hedge_ratio, intercept=kf.intercept, vol_ratio=vol_ratio,
+                         price1=close_a[-1], price2=close_b[-1], candle_open_ms=int(open_ms[-1]))
+
+        return (
+            float(z_score),
+            float(spread),
+            0.0,
+            float(spread_std),
+            float(vol_ratio) if vol_ratio is not None and pd.notna(vol_ratio) else None,
+            float(volA) if volA is not None and pd.notna(volA) else None,
+            float(volB) if volB is not None and pd.notna(volB) else None
+        )
+
+    except Exception as e:
+        print(f"❌ Error calculating Kalman z-score for {pair1}-{pair2}: {e}")
+        return None, None, None, None, None, None, None
+
+def calculate_pair_z_score(pair1, pair2, window=60, timeframe="1h", spread_model=None, panel=None, fresh=False,
+                           state=None):
     """
     Tính z-score của spread chuẩn hóa giữa 2 tài sản với hedge ratio:
-    - Align theo timestamp
-    - Ước lượng hedge ratio beta (và alpha) bằng OLS
+    - Align theo timestamp (panel giá dùng chung, không merge theo từng cặp)
+    - Ước lượng hedge ratio beta (và alpha) bằng OLS, hoặc Kalman filter khi SPREAD_MODEL="kalman"
     - Rolling mean/std của spread
     - Xử lý NaN và division by zero
+    fresh=True (panel=None): tải giá mới, bỏ qua panel cache theo nến - dùng cho monitor exit
+    state: dict (tuỳ chọn) nhận thêm hedge ratio, intercept, giá cuối... cho snapshot /zscores
     """
+    if (spread_model or SPREAD_MODEL) == "kalman":
+        return calculate_pair_z_score_kalman(pair1, pair2, window, timeframe, panel, fresh, state)
     try:
         # Lấy nhiều dữ liệu hơn cho OLS estimation
-        df1 = get_klines_data(pair1, interval=timeframe, limit=max(500, window+100))
-        df2 = get_klines_data(pair2, interval=timeframe, limit=max(500, window+100))
+        if panel is None:
+            panel = get_signal_panel([pair1, pair2], timeframe, window, fresh=fresh)
         
-        if df1 is None or df2 is None:
+        if pair1 not in panel or pair2 not in panel:
             return None, None, None, None, None, None, None
         
-        # Chỉ giữ cột cần thiết, đổi tên cho dễ join
-        a = df1[['timestamp','close']].rename(columns={'close': 'A'})
-        b = df2[['timestamp','close']].rename(columns={'close': 'B'})
-        
-        # Align dữ liệu theo timestamp (inner join để tránh lệch nến)
-        df = pd.merge(a, b, on='timestamp', how='inner').sort_values('timestamp').reset_index(drop=True)
+        # Align dữ liệu theo timestamp (chỉ giữ nến chung để tránh lệch nến)
+        open_ms, close_a, close_b = panel.pair(pair1, pair2)
         
         # Đảm bảo đủ dữ liệu
-        if len(df) < max(window, 50):
+        if len(close_a) < max(window, 50):
             return None, None, None, None, None, None, None
         
         # Sử dụng log-price để giảm hiệu ứng scale
-        df['logA'] = np.log(df['A'])
-        df['logB'] = np.log(df['B'])
+        log_a = np.log(close_a)
+        log_b = np.log(close_b)
         
         # Ước lượng alpha, beta bằng OLS (trên toàn bộ mẫu gần đây)
         # beta = cov(B,A)/var(B); alpha = mean(A) - beta*mean(B)
-        cov_matrix = np.cov(df['logB'], df['logA'], ddof=1)
-        var_B = np.var(df['logB'], ddof=1)
-        
-        if var_B == 0 or np.isnan(var_B):
+        # Hedge ratio và volatility ước lượng một lần mỗi nến (memo theo process: các batch/timeframe của
+        # signal generator, hoặc các lần check liên tiếp của monitor trong executor)
+        close_ms = last_close_ms(open_ms, timeframe)
+        alpha, beta = pair_stats_memo.get_or_compute(
+            pair1, pair2, timeframe, close_ms, ("hedge_ratio", len(log_a)), lambda: ols_hedge_ratio(log_a, log_b))
+        if np.isnan(beta):
             return None, None, None, None, None, None, None
-            
-        beta = cov_matrix[0,1] / var_B
-        alpha = df['logA'].mean() - beta * df['logB'].mean()
         
         # Residual (spread) = logA - (alpha + beta*logB)
-        df['spread'] = df['logA'] - (alpha + beta * df['logB'])
+        spread = log_a - (alpha + beta * log_b)
         
-        # Rolling stats trên spread
-        roll_mean = df['spread'].rolling(window=window, min_periods=window).mean()
-        roll_std = df['spread'].rolling(window=window, min_periods=window).std(ddof=1)
+        # Rolling stats trên spread (kernel trên mảng thô, NaN cho window-1 nến đầu)
+        roll_mean = rolling_mean(spread, window)
+        roll_std = rolling_std(spread, window)
         
         # Tránh chia 0 và thay thế bằng NaN
-        roll_std = roll_std.replace(0, np.nan)
+        roll_std[roll_std == 0] = np.nan
         
         # Tính z-score
-        df['zscore'] = (df['spread'] - roll_mean) / roll_std
+        zscore = (spread - roll_mean) / roll_std
         
         # Giá trị hiện tại (bỏ NaN đầu window)
-        valid = df.dropna(subset=['zscore', 'spread'])
-        if valid.empty:
+        valid = np.flatnonzero(~np.isnan(zscore) & ~np.isnan(spread))
+        if len(valid) == 0:
             return None, None, None, None, None, None, None
         
-        last = valid.iloc[-1]
+        last = valid[-1]
         
         # Volatility info (trên log-returns để công bằng)
-        df['rA'] = df['logA'].diff()
-        df['rB'] = df['logB'].diff()
-        volA = df['rA'].rolling(window=window).std(ddof=1).iloc[-1]
-        volB = df['rB'].rolling(window=window).std(ddof=1).iloc[-1]
+        volA, volB = pair_stats_memo.get_or_compute(
+            pair1, pair2, timeframe, close_ms, ("return_volatility", window),
+            lambda: (rolling_std(np.diff(log_a), window)[-1], rolling_std(np.diff(log_b), window)[-1]))
         
         vol_ratio = np.nan
         if pd.notna(volA) and pd.notna(volB) and volB != 0:
             vol_ratio = volA / volB
         
+        if state is not None:
+            state.update(model="ols", z_score=zscore[last], spread=spread[last], spread_mean=roll_mean[-1],
+                         spread_std=roll_std[-1], hedge_ratio=beta, intercept=alpha, vol_ratio=vol_ratio,
+                         price1=close_a[-1], price2=close_b[-1], candle_open_ms=int(open_ms[-1]))
+        
         return (
-            float(last['zscore']),
-            float(last['spread']), 
-            float(roll_mean.iloc[-1]),
-            float(roll_std.iloc[-1]),
+            float(zscore[last]),
+            float(spread[last]), 
+            float(roll_mean[-1]),
+            float(roll_std[-1]),
             float(vol_ratio) if pd.notna(vol_ratio) else None,
             float(volA) if pd.notna(volA) else None,
             float(volB) if pd.notna(volB) else None
@@ -211,7 +339,7 @@ def calculate_pair_z_score(pair1, pair2, window=60, timeframe="1h"):
         return None, None, None, None, None, None, None
 
 
-def calculate_pair_z_score_batch(pairs_batch, window=60, timeframe="1h"):
+def calculate_pair_z_score_batch(pairs_batch, window=60, timeframe="1h", panel=None):
     """
     Simplified signal generation với 2 điều kiện:
     1. Z-score > 2.5 hoặc < -2.5
@@ -224,90 +352,85 @@ def calculate_pair_z_score_batch(pairs_batch, window=60, timeframe="1h"):
         pair2 = pair['pair2']
         
         # Lấy z-score với improved method
-        z_score, spread, rolling_mean, rolling_std, vol_ratio, volA, volB = calculate_pair_z_score(pair1, pair2, window, timeframe)
+        state = {}
+        z_score, spread, rolling_mean, rolling_std, vol_ratio, volA, volB = calculate_pair_z_score(pair1, pair2, window, timeframe, panel=panel, state=state)
+        
+        # Trạng thái live cho snapshot /zscores: z-score/spread/hedge ratio + Bollinger bands của cả hai coin
+        # (bands dùng lại cho điều kiện breakout bên dưới)
+        bands = {}
+        if z_score is not None and panel is not None:
+            bands = {symbol: bollinger_bands(panel.series(symbol)[1], window=20, num_std=2.0) for symbol in (pair1, pair2)}
+            state['bollinger'] = {symbol: {'upper': upper[-1], 'middle': middle[-1], 'lower': lower[-1]}
+                                  for symbol, (upper, middle, lower) in bands.items()}
+        if z_score is not None:
+            zscore_board.update(pair1, pair2, timeframe, **state)
         
         # Điều kiện 1: Z-score threshold
         if z_score is None or abs(z_score) < 2.5:
             continue
             
         try:
-            # Chọn coin có momentum mạnh hơn để trade
-            df1 = get_klines_data(pair1, interval=timeframe, limit=max(500, window+100))
-            df2 = get_klines_data(pair2, interval=timeframe, limit=max(500, window+100))
-            if df1 is None or df2 is None:
-                continue
+            # Chọn coin có momentum mạnh hơn để trade (giá lấy từ panel đã có, không fetch lại)
+            pair_panel = panel if panel is not None else get_signal_panel([pair1, pair2], timeframe, window)
+            close1 = pair_panel.series(pair1)[1]
+            close2 = pair_panel.series(pair2)[1]
                 
-            momentum1 = (df1['close'].iloc[-1] - df1['close'].iloc[-10]) / df1['close'].iloc[-10]
-            momentum2 = (df2['close'].iloc[-1] - df2['close'].iloc[-10]) / df2['close'].iloc[-10]
+            momentum1 = (close1[-1] - close1[-10]) / close1[-10]
+            momentum2 = (close2[-1] - close2[-10]) / close2[-10]
             
             if abs(momentum1) > abs(momentum2):
                 selected_coin = pair1
-                selected_df = df1
+                selected_close = close1
             else:
                 selected_coin = pair2
-                selected_df = df2
-
-            # Điều kiện 2: Bollinger Bands breakout
-            def calculate_bollinger_bands(prices, window=20, std_dev=2):
-                sma = prices.rolling(window=window).mean()
-                std = prices.rolling(window=window).std()
-                upper_band = sma + (std * std_dev)
-                lower_band = sma - (std * std_dev)
-                return upper_band, sma, lower_band
-            
-            upper_band, middle_band, lower_band = calculate_bollinger_bands(selected_df['close'])
-            current_price = selected_df['close'].iloc[-1]
+                selected_close = close2
+
+            # Điều kiện 2: Bollinger Bands breakout (SMA20 ± 2 std)
+            upper_band, middle_band, lower_band = bands.get(selected_coin) or bollinger_bands(selected_close, window=20, num_std=2.0)
+            current_price = selected_close[-1]
             
             signal_type = None
             signal_reason = ""
             
             # Logic quyết định signal
-            if current_price < lower_band.iloc[-1]:
+            if current_price < lower_band[-1]:
                 signal_type = "BUY"  # Long khi vượt qua biên dưới
-                signal_reason = f"BB_BREAKOUT_DOWN (Price: {current_price:.4f} < Lower: {lower_band.iloc[-1]:.4f})"
+                signal_reason = f"BB_BREAKOUT_DOWN (Price: {current_price:.4f} < Lower: {lower_band[-1]:.4f})"
                 print(f"🟢 {pair1}-{pair2}: Z-score {z_score:.3f} + Bollinger breakout DOWN → LONG {selected_coin}")
                 
-            elif current_price > upper_band.iloc[-1]:
+            elif current_price > upper_band[-1]:
                 signal_type = "SELL"  # Short khi vượt qua biên trên
-                signal_reason = f"BB_BREAKOUT_UP (Price: {current_price:.4f} > Upper: {upper_band.iloc[-1]:.4f})"
+                signal_reason = f"BB_BREAKOUT_UP (Price: {current_price:.4f} > Upper: {upper_band[-1]:.4f})"
                 print(f"🔴 {pair1}-{pair2}: Z-score {z_score:.3f} + Bollinger breakout UP → SHORT {selected_coin}")
             else:
                 print(f"⚪ {pair1}-{pair2}: Z-score {z_score:.3f} nhưng giá trong Bollinger bands → Không trade")
                 continue
 
             if signal_type is not None:
-                selected_close = float(selected_df['close'].iloc[-1])
-                
-                # Detect precision từ current price để match exchange format
-                def get_price_precision(price):
-                    """Detect số decimal places từ price để match exchange format"""
-                    price_str = f"{price:.10f}".rstrip('0').rstrip('.')
-                    if '.' in price_str:
-                        return len(price_str.split('.')[1])
-                    return 0
+                selected_close = float(selected_close[-1])
                 
-                precision = get_price_precision(selected_close)
-                # Minimum 2 decimal places, maximum 8 cho crypto (ETH ~2, altcoins có thể >6)
-                precision = max(2, min(8, precision))
-                print(f"💰 Price precision detected: {precision} decimals for {selected_coin}")
+                # Precision theo tickSize thật của sàn (exchange metadata cache)
+                precision = price_precision(selected_coin, selected_close)
+                print(f"💰 Price precision: {precision} decimals for {selected_coin}")
                 
-                # Tính TP/SL: TP = middle band, SL = 2%
-                middle_band_price = float(middle_band.iloc[-1])
+                # Tính TP/SL: TP = middle band, SL = 2%, làm tròn theo bội số tickSize
+                middle_band_price = float(middle_band[-1])
                 
                 if signal_type == "BUY":
-                    tp = round(middle_band_price, precision)  # TP = middle band
-                    sl = round(selected_close * 0.98, precision)  # -2% SL
-                    entry = round(selected_close, precision)
+                    tp = round_price(selected_coin, middle_band_price)  # TP = middle band
+                    sl = round_price(selected_coin, selected_close * 0.98)  # -2% SL
+                    entry = round_price(selected_coin, selected_close)
                     print(f"📊 BUY: Entry {entry} → TP {tp} (middle band) | SL {sl} (-2%)")
                 else:  # SELL
-                    tp = round(middle_band_price, precision)  # TP = middle band  
-                    sl = round(selected_close * 1.02, precision)  # +2% SL
-                    entry = round(selected_close, precision)
+                    tp = round_price(selected_coin, middle_band_price)  # TP = middle band  
+                    sl = round_price(selected_coin, selected_close * 1.02)  # +2% SL
+                    entry = round_price(selected_coin, selected_close)
                     print(f"📊 SELL: Entry {entry} → TP {tp} (middle band) | SL {sl} (+2%)")
                 
                 results.append({
                     'pair1': pair1,
                     'pair2': pair2,
+                    'pair_id': pair.get('pair_id') or pair.get('id'),
                     'symbol': selected_coin,
                     'signal_type': signal_type,
                     'z_score': z_score,
@@ -316,7 +439,7 @@ def calculate_pair_z_score_batch(pairs_batch, window=60, timeframe="1h"):
                     'tp': tp,
                     'sl': sl,
                     'entry': entry,
-                    'confirmation_details': f"Z_SCORE_{z_score:.3f}; {signal_reason}"
+                    'confirmation_details': f"Z_SCORE_{z_score:.3f}; TF_{timeframe}; {signal_reason}"
                 })
                 
         except Exception as e:
@@ -325,9 +448,13 @@ def calculate_pair_z_score_batch(pairs_batch, window=60, timeframe="1h"):
             
     return results
 
-def generate_signals_for_top_pairs(timeframe="1h"):
-    """Tạo signals cho top 10 pairs từ database với timeframe tuỳ chọn, lọc trùng symbol."""
-    print(f"🚀 GENERATING SIGNALS FOR TOP 10 PAIRS (timeframe={timeframe})")
+def generate_signals_for_top_pairs(timeframe="1h", timeframes=None):
+    """
+    Tạo signals cho top 10 pairs từ database với timeframe tuỳ chọn, lọc trùng symbol.
+    timeframes (vd ["15m", "1h", "4h"]): chạy z-score/Bollinger trên mọi timeframe trong một lượt,
+    dữ liệu resample từ một chuỗi base mỗi symbol (SIGNAL_BASE_INTERVAL)
+    """
+    print(f"🚀 GENERATING SIGNALS FOR TOP 10 PAIRS (timeframe={','.join(timeframes) if timeframes else timeframe})")
     print("=" * 60)
     # Lấy top 10 pairs từ database
     top_pairs = get_top_pairs_from_db()
@@ -338,43 +465,48 @@ def generate_signals_for_top_pairs(timeframe="1h"):
     # Chia pairs thành batches cho parallel processing
     batch_size = max(1, len(top_pairs) // 4)  # 4 workers
     batches = [top_pairs[i:i + batch_size] for i in range(0, len(top_pairs), batch_size)]
+    # Một panel giá căn theo timestamp cho mọi symbol của top pairs (mỗi timeframe), dùng chung giữa các batch
+    symbols = [symbol for pair in top_pairs for symbol in (pair['pair1'], pair['pair2'])]
+    if timeframes:
+        panels = build_timeframe_panels(symbols, timeframes, SIGNAL_BASE_INTERVAL or None,
+                                        SIGNAL_WINDOW, SIGNAL_MTF_BARS or None)
+    else:
+        panels = {timeframe: get_signal_panel(symbols, timeframe, SIGNAL_WINDOW)}
+    tasks = [(batch, tf) for tf in panels for batch in batches]
     # Parallel processing
     all_signals = []
     with ThreadPoolExecutor(max_workers=4) as executor:
-        future_to_batch = {executor.submit(calculate_pair_z_score_batch, batch, 60, timeframe): batch for batch in batches}
+        future_to_batch = {executor.submit(calculate_pair_z_score_batch, batch, SIGNAL_WINDOW, tf, panels[tf]): batch
+                           for batch, tf in tasks}
         completed = 0
         for future in as_completed(future_to_batch):
             batch_results = future.result()
             all_signals.extend(batch_results)
             completed += 1
-            print(f"📊 Hoàn thành batch {completed}/{len(batches)} ({len(all_signals)} signals)")
+            print(f"📊 Hoàn thành batch {completed}/{len(tasks)} ({len(all_signals)} signals)")
+    # Snapshot z-score/spread/Bollinger của mọi cặp cho API /zscores (kể cả cặp không có signal)
+    zscore_board.publish()
     if not all_signals:
         print("❌ Không tạo được signals")
         return []
     # Lọc trùng: chỉ giữ signal có |z_score| lớn nhất cho mỗi symbol/signal_type
-    signals_df = pd.DataFrame(all_signals)
-    signals_df['abs_z'] = signals_df['z_score'].abs()
-    signals_df = signals_df.sort_values('abs_z', ascending=False)
-    signals_df = signals_df.drop_duplicates(subset=['symbol', 'signal_type'], keep='first')
-    signals_df = signals_df.drop(columns=['abs_z'])
+    signals = dedup_signals(Signal.from_rows(all_signals))
     print(f"\n📊 KẾT QUẢ SIGNAL GENERATION:")
-    print(f"- Tổng signals: {len(signals_df)}")
-    print(f"- Buy: {len(signals_df[signals_df['signal_type'] == 'BUY'])}")
-    print(f"- Sell: {len(signals_df[signals_df['signal_type'] == 'SELL'])}")
+    print(f"- Tổng signals: {len(signals)}")
+    print(f"- Buy: {sum(1 for s in signals if s.signal_type == 'BUY')}")
+    print(f"- Sell: {sum(1 for s in signals if s.signal_type == 'SELL')}")
     # Hiển thị top signals
     print(f"\n🏆 TOP SIGNALS:")
     print("=" * 100)
     print(f"{'Rank':<5} {'Symbol':<12} {'Z-Score':<10} {'Signal':<8} {'Spread':<12}")
     print("-" * 100)
-    top_signals = signals_df.nlargest(10, 'z_score')
-    for i, row in top_signals.iterrows():
-        rank = i + 1
-        symbol = row['symbol']
-        z_score = f"{row['z_score']:.3f}"
-        signal = row['signal_type']
-        spread = f"{row['spread']:.2f}"
-        print(f"{rank:<5} {symbol:<12} {z_score:<10} {signal:<8} {spread:<12}")
-    return signals_df.to_dict('records')
+    top_signals = sorted(signals, key=lambda s: s.z_score, reverse=True)[:10]
+    for rank, signal in enumerate(top_signals, 1):
+        z_score = f"{signal.z_score:.3f}"
+        spread = f"{signal.spread:.2f}"
+        print(f"{rank:<5} {signal.symbol:<12} {z_score:<10} {signal.signal_type:<8} {spread:<12}")
+    # Dict cho DB layer và signal bus
+    return [signal.to_row() for signal in signals]
 
 def generate_and_save_signals():
     """Tạo và lưu signals cho pairs"""
@@ -384,16 +516,31 @@ def generate_and_save_signals():
     # Bỏ logic check thời gian để tránh bỏ lỡ signals quan trọng
     # Chỉ dựa vào database check để filter trùng lặp
     
-    # Tạo signals cho top pairs với timeframe 15m
-    signals = generate_signals_for_top_pairs(timeframe="15m")
+    # Tạo signals cho top pairs với timeframe cấu hình (mặc định 15m) hoặc nhiều timeframe (SIGNAL_TIMEFRAMES)
+    with metrics.timer("signal_cycle_seconds"):
+        signals = generate_signals_for_top_pairs(timeframe=SIGNAL_TIMEFRAME, timeframes=SIGNAL_TIMEFRAMES or None)
+    metrics.set_gauge("signals_last_cycle", len(signals or []))
+    for signal in signals or []:
+        metrics.inc("signals_generated_total", signal_type=signal.get('signal_type'))
     
     if not signals:
         print("❌ Không tạo được signals")
         return []
     
+    # pair_id của hourly_rankings có thể khác daily_pairs.id mới nhất (sau scan 09:00):
+    # resolve một lần để bản trên bus và bản trong DB có cùng signal_key
+    signals = supabase_manager.resolve_signal_pair_ids(signals)
+    if not signals:
+        print("❌ Không có signal nào có pair_id")
+        return []
+
+    # Publish ngay cho executor qua signal bus, DB write bên dưới để durable
+    if signal_bus.publish(signals):
+        print(f"📡 Đã publish {len(signals)} signals qua signal bus")
+
     # Lưu signals vào database
     print(f"[DEBUG] Đang lưu {len(signals)} signals vào database...")
-    success = supabase_manager.save_pair_signals(signals)
+    success = supabase_manager.save_pair_signals(signals, resolved=True)
     
     if success:
         print("✅ Signal generation hoàn thành!")
@@ -0,0 +1,57 @@
+# singleflight.py
+import threading
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Gộp các request đồng thời cùng key thành một lần gọi (kiểu Go singleflight):
+    - Thread đầu tiên thực thi fn, các thread cùng key chờ và nhận chung kết quả/exception
+    - Key khác nhau chạy song song; lock chỉ giữ khi tra/ghi bảng in-flight, không giữ trong lúc gọi mạng
+    - Không cache: xong lượt gọi là key được xoá, lần gọi sau sẽ chạy lại (cache do caller quản lý)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        """Trả về (result, shared) - shared=True nếu dùng chung kết quả của thread khác"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
@@ -1,13 +1,37 @@
 # supabase_manager.py
-from supabase import create_client, Client
+import threading
 from datetime import datetime, timedelta
 from config import SUPABASE_URL, SUPABASE_KEY
+from core.metrics import instrument_methods
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Supabase client tạo lazy ở query đầu tiên (import module không cần network/.env)
+supabase = None
+_supabase_lock = threading.Lock()
 
+def get_supabase_client():
+    global supabase
+    if supabase is None:
+        with _supabase_lock:
+            if supabase is None:
+                from supabase import create_client
+                supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return supabase
+
+# Latency/lỗi theo từng method: stat_arb_supabase_query_seconds{method=...}
+@instrument_methods("supabase_query")
 class SupabaseManager:
     def __init__(self):
-        self.client = supabase
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = get_supabase_client()
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
 
     def save_daily_pairs(self, pairs_data):
         try:
@@ -187,17 +211,34 @@ class SupabaseManager:
             print(f"Error getting hourly rankings: {e}")
             return []
 
-    def save_pair_signals(self, signals):
+    def resolve_signal_pair_ids(self, signals):
+        """
+        Gán pair_id = daily_pairs.id mới nhất của cặp cho từng signal (bỏ signal không tìm thấy pair_id).
+        Signal bus và DB dùng chung kết quả này để cùng một signal có cùng signal_key
+        """
+        resolved = []
+        pair_ids = {}
+        for signal in signals:
+            pair = (signal['pair1'], signal['pair2'])
+            if pair not in pair_ids:
+                pair_ids[pair] = self.get_latest_pair_id(*pair)
+            if pair_ids[pair] is None:
+                print(f"⚠️ Bỏ qua signal cho {signal['pair1']}-{signal['pair2']} (không tìm thấy pair_id)")
+                continue
+            resolved.append({**signal, 'pair_id': pair_ids[pair]})
+        return resolved
+
+    def save_pair_signals(self, signals, resolved=False):
         """
         Lưu signals vào database với 4 lớp confirmation tracking
+        resolved=True: signals đã qua resolve_signal_pair_ids, giữ nguyên pair_id
         """
         try:
+            if not resolved:
+                signals = self.resolve_signal_pair_ids(signals)
             signals_for_db = []
             for signal in signals:
-                pair_id = self.get_latest_pair_id(signal['pair1'], signal['pair2'])
-                if pair_id is None:
-                    print(f"⚠️ Bỏ qua signal cho {signal['pair1']}-{signal['pair2']} (không tìm thấy pair_id)")
-                    continue
+                pair_id = signal['pair_id']
                 existing = self.client.table('trading_signals') \
                     .select('id') \
                     .eq('pair_id', pair_id) \
@@ -0,0 +1,123 @@
+# task_dispatcher.py
+import time
+import threading
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from core import metrics
+
+
+def iter_chunks(items, size):
+    """Chia iterable thành các list nhỏ một cách lazy (không materialize toàn bộ)"""
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class TaskDispatcher:
+    """
+    Dispatcher streaming cho các tác vụ CPU/IO nhỏ (vd phân tích cặp trong daily scan):
+    - Items được sinh lazy và chia thành chunk nhỏ; worker rảnh tự lấy chunk tiếp theo
+      → không có batch tĩnh nào thành straggler, wall time ≈ tổng công việc / số worker
+    - Progress theo từng chunk: throughput (items/s) và ETA, báo qua print/metrics/callback
+    - worker_fn(chunk) trả về list kết quả, được gộp lại theo thứ tự hoàn thành
+    - cancel_event (threading.Event, tuỳ chọn): set từ bên ngoài để dừng như stop(), vd job bị huỷ qua API
+    """
+
+    def __init__(self, worker_fn, max_workers=6, chunk_size=16, total=None, name="tasks",
+                 report_interval=5.0, on_progress=None, cancel_event=None):
+        self.worker_fn = worker_fn
+        self.max_workers = max(1, int(max_workers))
+        self.chunk_size = max(1, int(chunk_size))
+        self.total = total
+        self.name = name
+        self.report_interval = report_interval
+        self.on_progress = on_progress
+        self.cancel_event = cancel_event
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.done = 0
+        self.results = []
+        self._started = None
+        self._last_report = 0.0
+        self._stop = threading.Event()
+
+    def progress(self):
+        """Snapshot tiến độ: done/total, throughput, ETA (None nếu chưa biết total)"""
+        with self._lock:
+            return self._progress()
+
+    def _progress(self):
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.total is not None and rate > 0:
+            eta = max(0.0, (self.total - self.done) / rate)
+        return {
+            'name': self.name,
+            'done': self.done,
+            'total': self.total,
+            'found': len(self.results),
+            'elapsed_seconds': elapsed,
+            'items_per_second': rate,
+            'eta_seconds': eta
+        }
+
+    def _report(self, force=False):
+        now = time.perf_counter()
+        if not force and now - self._last_report < self.report_interval:
+            return
+        self._last_report = now
+        progress = self._progress()
+        metrics.set_gauge("dispatcher_items_per_second", progress['items_per_second'], task=self.name)
+        if progress['eta_seconds'] is not None:
+            metrics.set_gauge("dispatcher_eta_seconds", progress['eta_seconds'], task=self.name)
+            percent = progress['done'] / self.total * 100 if self.total else 100.0
+            print(f"📈 Progress: {percent:.1f}% ({progress['done']}/{self.total}) - "
+                  f"{progress['items_per_second']:.1f}/s - ETA {progress['eta_seconds']:.0f}s - Found {progress['found']}")
+        else:
+            print(f"📈 Progress: {progress['done']} - {progress['items_per_second']:.1f}/s - Found {progress['found']}")
+        if self.on_progress is not None:
+            try:
+                self.on_progress(progress)
+            except Exception as e:
+                print(f"⚠️ on_progress callback lỗi: {e}")
+
+    def _worker(self, chunks):
+        while not self._stop.is_set() and not (self.cancel_event is not None and self.cancel_event.is_set()):
+            with self._lock:
+                chunk = next(chunks, None)
+            if chunk is None:
+                return
+            try:
+                output = self.worker_fn(chunk)
+            except BaseException:
+                self._stop.set()
+                raise
+            with self._lock:
+                self.results.extend(output or [])
+                self.done += len(chunk)
+                self._report()
+
+    def stop(self):
+        """Dừng lấy chunk mới (chunk đang chạy vẫn hoàn thành)"""
+        self._stop.set()
+
+    def run(self, items):
+        """Chạy worker_fn trên toàn bộ items, trả về list kết quả gộp"""
+        with self._lock:
+            self._reset()
+            self._started = time.perf_counter()
+        chunks = iter_chunks(items, self.chunk_size)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._worker, chunks) for _ in range(self.max_workers)]
+            for future in futures:
+                future.result()
+        with self._lock:
+            self._report(force=True)
+            metrics.observe("dispatcher_run_seconds", self._progress()['elapsed_seconds'], task=self.name)
+            return list(self.results)
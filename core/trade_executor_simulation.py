@@ -1,10 +1,26 @@
 # trade_executor_simulation.py
+import os
 from datetime import datetime, timedelta
-import time
-from core.supabase_manager import SupabaseManager
-from core.data_collector import get_data
+from core import clock
+import queue
+import threading
+from core.clients import get_binance_client, get_supabase_manager
+from core import signal_bus
+from core.signal_bus import signal_key
+from core.account_ledger import AccountLedger, position_key
+from core.execution_journal import ExecutionJournal
+from core.risk_engine import RiskEngine
+from core import metrics
+from core.logger import get_logger, NO_RATE_LIMIT
+from core.profiler import profile_job
+from core.records import Position
+from core.signal_generator import calculate_pair_z_score
+from config import (SIGNAL_TIMEFRAME, SIGNAL_WINDOW, SIGNAL_POLL_INTERVAL, STATE_DIR, DAILY_TOP_N,
+                    EXECUTION_JOURNAL_TTL, EXECUTION_JOURNAL_COMPACT_EVERY, LEDGER_RELEASED_TTL)
 from collections import defaultdict
 
+logger = get_logger("executor")
+
 # =====================
 # 1. Helper functions
 # =====================
@@ -27,19 +43,72 @@ def get_capital_by_rank(rank, daily_limit=None):
         return 0.0
 
 SIMULATION_BALANCE = 100.0
-simulation_balance = SIMULATION_BALANCE
-supabase_manager = SupabaseManager()
+supabase_manager = get_supabase_manager()
+# Vốn simulation được quản lý bởi ledger (thread-safe, rebuild từ positions khi khởi động).
+# Chỉ process đã restore_account_state() mới ghi snapshot: import module ở process khác không ghi đè ledger.json
+LEDGER_SNAPSHOT_FILE = os.path.join(STATE_DIR, "ledger.json")
+ledger = AccountLedger(SIMULATION_BALANCE, released_ttl=LEDGER_RELEASED_TTL)
+# Pre-trade risk: exposure/limits giữ trong bộ nhớ, đồng bộ từ positions một lần mỗi chu kỳ
+risk_engine = RiskEngine()
 
 def get_simulation_balance():
-    global simulation_balance
-    return simulation_balance
+    return ledger.available()
+
+def restore_account_state():
+    """
+    Khôi phục ledger + risk engine: snapshot cục bộ trước, sau đó replay từ bảng positions (nguồn chuẩn).
+    Process gọi hàm này trở thành owner của ledger snapshot
+    """
+    ledger.snapshot_path = LEDGER_SNAPSHOT_FILE
+    if ledger.load_snapshot():
+        print(f"💾 Đã nạp ledger snapshot: balance {ledger.available():.2f} USD")
+    try:
+        open_positions = supabase_manager.get_all_open_positions()
+        closed_positions = supabase_manager.get_closed_positions()
+        if open_positions or closed_positions:
+            ledger.rebuild(open_positions, closed_positions)
+            print(f"🔁 Rebuild ledger từ {len(open_positions)} open + {len(closed_positions)} closed positions")
+        risk_engine.rebuild(open_positions, closed_positions)
+    except Exception as e:
+        print(f"⚠️ Không rebuild được ledger từ positions: {e}")
+    return ledger.available()
+
+def sync_risk_state():
+    """Đồng bộ risk engine mỗi chu kỳ: 1 query open positions + correlation của top pairs hôm nay"""
+    try:
+        risk_engine.sync_positions(supabase_manager.get_all_open_positions())
+        risk_engine.set_pair_correlations(supabase_manager.get_current_top_n(DAILY_TOP_N))
+        return True
+    except Exception as e:
+        print(f"⚠️ Không đồng bộ được risk state: {e}")
+        return False
+
+def get_rank_map():
+    """pair_id → current_rank từ hourly_rankings mới nhất (một query cho cả batch signals)"""
+    try:
+        rank_map = {}
+        for ranking in supabase_manager.get_hourly_rankings():
+            rank_map.setdefault(ranking.get('pair_id'), ranking.get('current_rank', 10))
+        return rank_map
+    except Exception as e:
+        print(f"⚠️ Không lấy được hourly rankings: {e}")
+        return {}
+
+# Nguồn giá thay thế (replay engine); None = lấy giá từ Binance
+_price_source = None
+
+def set_price_source(price_source):
+    """Đặt hàm price_source(symbol) -> giá, trả về nguồn cũ để restore"""
+    global _price_source
+    previous = _price_source
+    _price_source = price_source
+    return previous
 
 def get_current_price(symbol):
+    if _price_source is not None:
+        return _price_source(symbol)
     try:
-        from binance.client import Client as BinanceClient
-        from config import BINANCE_API_KEY, BINANCE_API_SECRET
-        client = BinanceClient(BINANCE_API_KEY, BINANCE_API_SECRET, testnet=False)
-        ticker = client.futures_symbol_ticker(symbol=symbol)
+        ticker = get_binance_client().futures_symbol_ticker(symbol=symbol)
         return float(ticker['price'])
     except Exception as e:
         print(f"❌ Không lấy được giá cho {symbol}: {e}")
@@ -50,12 +119,8 @@ def get_current_price(symbol):
 # =====================
 
 def check_existing_position(symbol):
-    try:
-        positions = supabase_manager.get_open_positions_by_symbol(symbol)
-        return len(positions) > 0
-    except Exception as e:
-        print(f"Lỗi khi kiểm tra existing position: {e}")
-        return False
+    # Tra exposure trong risk engine (đã đồng bộ từ DB mỗi chu kỳ) thay vì query từng symbol
+    return risk_engine.has_position(symbol)
 
 def get_open_positions():
     try:
@@ -64,18 +129,20 @@ def get_open_positions():
         print(f"Lỗi khi lấy open positions: {e}")
         return []
 
-def get_unique_pair_ids():
+def get_open_positions_by_pair():
+    """Một query open positions → {pair_id: [Position]} cho cả vòng monitor"""
     try:
-        positions = get_open_positions()
-        pair_ids = set()
-        for position in positions:
-            pair_id = position.get('pair_id')
-            if pair_id:
-                pair_ids.add(pair_id)
-        return list(pair_ids)
+        positions_by_pair = defaultdict(list)
+        for position in Position.from_rows(get_open_positions()):
+            if position.pair_id:
+                positions_by_pair[position.pair_id].append(position)
+        return dict(positions_by_pair)
     except Exception as e:
-        print(f"Lỗi khi lấy unique pair IDs: {e}")
-        return []
+        print(f"Lỗi khi group open positions theo pair: {e}")
+        return {}
+
+def get_unique_pair_ids():
+    return list(get_open_positions_by_pair())
 
 # =====================
 # 3. Z-score logic
@@ -92,18 +159,11 @@ def calculate_current_zscore(position):
         if not pair:
             return None
         
-        # Tính z-score dựa trên pair1, pair2 từ pair info
-        df1 = get_data(pair['pair1'], interval='1h', limit=100)
-        df2 = get_data(pair['pair2'], interval='1h', limit=100)
-        if df1 is None or df2 is None:
-            return None
-        spread = df1['close'] - df2['close']
-        mean = spread.rolling(window=30).mean()
-        std = spread.rolling(window=30).std()
-        zscore = (spread - mean) / std
-        if len(zscore) == 0:
-            return None
-        return zscore.iloc[-1]
+        # Dùng cùng spread model/timeframe với signal generator để entry và exit nhất quán;
+        # fresh=True: giá mới mỗi lần check, không dùng panel đã cache từ đầu nến
+        zscore = calculate_pair_z_score(pair['pair1'], pair['pair2'], window=SIGNAL_WINDOW, timeframe=SIGNAL_TIMEFRAME,
+                                        fresh=True)[0]
+        return zscore
     except Exception as e:
         print(f"Lỗi khi tính z-score: {e}")
         return None
@@ -112,22 +172,13 @@ def calculate_current_zscore(position):
 # 4. Position logic
 # =====================
 
-def execute_trade_simulation(signal, pair, account_balance):
-    global simulation_balance
+def execute_trade_simulation(signal, pair, account_balance, rank=None):
     symbol = signal['symbol']
     side = signal['signal_type']
     z_score = signal['z_score']
     pair_id = signal.get('pair_id')
-    rank = 10
-    if pair_id:
-        try:
-            hourly_rankings = supabase_manager.get_hourly_rankings()
-            for ranking in hourly_rankings:
-                if ranking.get('pair_id') == pair_id:
-                    rank = ranking.get('current_rank', 10)
-                    break
-        except Exception as e:
-            print(f"⚠️ Không lấy được rank cho pair_id {pair_id}: {e}")
+    if rank is None:
+        rank = get_rank_map().get(pair_id, 10) if pair_id else 10
     print(f"🚨 SIMULATION SIGNAL: {side} {symbol} (rank {rank}, z={z_score:.2f})")
     if check_existing_position(symbol):
         print(f"⚠️ Đã có position cho {symbol}, bỏ qua signal")
@@ -136,11 +187,14 @@ def execute_trade_simulation(signal, pair, account_balance):
     if capital == 0:
         print(f"⚠️ Không đủ vốn cho rank {rank}")
         return None
-    if capital > simulation_balance or simulation_balance <= 0:
-        print(f"⚠️ Không đủ balance: cần {capital:.2f}, có {simulation_balance:.2f}")
+    # Giữ vốn nguyên tử trước khi lấy giá để hai luồng không cùng tiêu một khoản balance
+    order_id = f"SIM_{int(clock.time())}_{symbol}"
+    if not ledger.reserve(order_id, capital, symbol=symbol, pair_id=pair['id']):
+        print(f"⚠️ Không đủ balance: cần {capital:.2f}, có {ledger.available():.2f}")
         return None
     entry_price = get_current_price(symbol)
     if entry_price is None:
+        ledger.cancel(order_id)
         return None
     quantity = capital / entry_price
     # --- TP/SL logic ---
@@ -154,15 +208,13 @@ def execute_trade_simulation(signal, pair, account_balance):
         tp = None
         sl = None
     try:
-        simulation_balance -= capital
-        order_id = f"SIM_{int(time.time())}_{symbol}"
         position_data = {
             'pair_id': pair['id'],
             'symbol': symbol,
             'entry_price': float(entry_price),
             'quantity': float(quantity),
             'status': 'OPEN',
-            'entry_time': datetime.now().isoformat(),
+            'entry_time': clock.now().isoformat(),
             'binance_order_id': order_id,
             'pnl': 0.0,
             'tp': float(tp) if tp is not None else None,
@@ -172,17 +224,18 @@ def execute_trade_simulation(signal, pair, account_balance):
         }
         saved_position = supabase_manager.save_position(position_data)
         if saved_position:
+            risk_engine.record_fill(symbol, side, capital, pair_id=pair['id'])
             print(f"✅ SIMULATION EXECUTE: {side} {symbol}")
             print(f"   - Vốn: {capital:.2f} USD")
             print(f"   - Giá: {entry_price:.4f}")
             print(f"   - Số lượng: {quantity:.4f}")
             print(f"   - Z-score: {z_score:.2f}")
-            print(f"   - Balance còn lại: {simulation_balance:.2f} USD")
-            print(f"   - Thời gian: {datetime.now().strftime('%H:%M:%S')}")
+            print(f"   - Balance còn lại: {ledger.available():.2f} USD")
+            print(f"   - Thời gian: {clock.now().strftime('%H:%M:%S')}")
             print(f"   - Position ID: {saved_position[0]['id'] if saved_position else 'N/A'}")
         else:
             print(f"❌ Lỗi khi lưu position cho {symbol}")
-            simulation_balance += capital
+            ledger.cancel(order_id)
             return None
         return {
             'orderId': order_id,
@@ -194,7 +247,7 @@ def execute_trade_simulation(signal, pair, account_balance):
         }
     except Exception as e:
         print(f"❌ Lỗi khi execute simulation trade: {e}")
-        simulation_balance += capital
+        ledger.cancel(order_id)
         return None
 
 # --- 1. Kiểm tra điều kiện đóng lệnh ---
@@ -248,7 +301,6 @@ def should_close_pair_zscore(pair_id):
 
 # --- 2. Thực thi đóng lệnh ---
 def close_position_simulation(position, exit_price, reason):
-    global simulation_balance
     try:
         entry_price = position['entry_price']
         quantity = position['quantity']
@@ -265,7 +317,8 @@ def close_position_simulation(position, exit_price, reason):
             pnl = 0
         
         capital_used = entry_price * quantity
-        simulation_balance += capital_used + pnl
+        balance = ledger.release(position_key(position), pnl=pnl, amount=capital_used)
+        risk_engine.record_close(position['symbol'], signal_type, capital_used)
         
         supabase_manager.update_position_status(position['id'], 'CLOSED', pnl=pnl, reason=reason)
         print(f"✅ Đã đóng position {position['symbol']} (SIMULATION)")
@@ -273,14 +326,14 @@ def close_position_simulation(position, exit_price, reason):
         print(f"   - Exit: {exit_price:.4f}")
         print(f"   - Signal type: {signal_type}")
         print(f"   - PnL: {pnl:.2f} USD")
-        print(f"   - Balance mới: {simulation_balance:.2f} USD")
+        print(f"   - Balance mới: {balance:.2f} USD")
         print(f"   - Reason: {reason}")
         return {
             'symbol': position['symbol'],
             'entry_price': entry_price,
             'exit_price': exit_price,
             'pnl': pnl,
-            'balance': simulation_balance,
+            'balance': balance,
             'reason': reason
         }
     except Exception as e:
@@ -318,200 +371,231 @@ def close_pair_positions(pair_id):
 # 5. Monitor logic
 # =====================
 
+def process_signals(signals, executed_signals, account_balance):
+    """
+    Execute các signals (từ bus hoặc DB): group theo pair + phút, cần đủ 2 symbol mới mở.
+    Toàn bộ candidates được risk engine kiểm tra trong một lượt, không query DB cho từng symbol.
+    executed_signals: ExecutionJournal (hoặc set) các signal key đã execute
+    """
+    executed_count = 0
+    rank_map = get_rank_map()
+    
+    # Group signals theo pair_id và khoảng thời gian (±30s)
+    signals_by_pair_time = defaultdict(list)
+    for signal in signals:
+        if signal_key(signal) in executed_signals:
+            continue
+        # Làm tròn timestamp về phút (bỏ giây và microsecond)
+        timestamp = datetime.fromisoformat(signal['timestamp'].replace('Z', '+00:00'))
+        timestamp_rounded = timestamp.replace(second=0, microsecond=0)
+        key = (signal['pair_id'], timestamp_rounded.isoformat())
+        signals_by_pair_time[key].append(signal)
+    
+    # Chỉ giữ group đủ 2 symbol khác nhau
+    groups = []
+    for (pair_id, timestamp_rounded), group in signals_by_pair_time.items():
+        symbols_in_group = set(signal['symbol'] for signal in group)
+        if len(symbols_in_group) == 2:
+            groups.append((pair_id, timestamp_rounded, group))
+        else:
+            print(f"⚠️ Bỏ qua pair {pair_id} tại {timestamp_rounded} vì không đủ 2 signal (có {len(symbols_in_group)} symbol: {symbols_in_group})")
+    
+    def to_candidates(group_key, group):
+        return [{'symbol': signal['symbol'], 'signal_type': signal['signal_type'], 'pair_id': signal['pair_id'],
+                 'notional': get_capital_by_rank(rank_map.get(signal['pair_id'], 10), account_balance),
+                 'group': group_key}
+                for signal in group]
+    
+    # Một lượt vectorized cho tất cả legs; group chỉ mở khi cả 2 legs qua risk check
+    candidates = [c for pair_id, timestamp_rounded, group in groups
+                  for c in to_candidates((pair_id, timestamp_rounded), group)]
+    approved, reasons = risk_engine.evaluate(candidates)
+    offset = 0
+    filled_since_evaluation = False
+    for pair_id, timestamp_rounded, group in groups:
+        legs = slice(offset, offset + len(group))
+        offset += len(group)
+        group_approved, group_reasons = approved[legs], reasons[legs]
+        if filled_since_evaluation and group_approved.all():
+            # Exposure đã đổi sau các lệnh vừa mở → kiểm tra lại riêng group này
+            group_approved, group_reasons = risk_engine.evaluate(to_candidates((pair_id, timestamp_rounded), group))
+        if not group_approved.all():
+            rejected = {signal['symbol']: reason for signal, reason in zip(group, group_reasons) if reason}
+            for reason in rejected.values():
+                metrics.inc("risk_rejections_total", reason=reason)
+            print(f"⚠️ Bỏ qua pair {pair_id} tại {timestamp_rounded} (risk): {rejected}")
+            continue
+        print(f"✅ Đủ 2 signals cho pair {pair_id} tại {timestamp_rounded}")
+        
+        pair = supabase_manager.get_pair_by_id(pair_id)
+        if not pair:
+            print(f"⚠️ Không tìm thấy pair cho pair_id {pair_id}")
+            continue
+        rank = rank_map.get(pair_id, 10)
+        for signal in group:
+            signal_id = signal.get('id') or signal_key(signal)
+            required_capital = get_capital_by_rank(rank, account_balance)
+            if required_capital > account_balance:
+                print(f"⚠️ Không đủ vốn cho signal {signal_id}: cần {required_capital:.2f}, có {account_balance:.2f}")
+                continue
+            result = execute_trade_simulation(signal, pair, account_balance, rank=rank)
+            if result:
+                executed_signals.add(signal_key(signal))
+                executed_count += 1
+                filled_since_evaluation = True
+                metrics.inc("trades_executed_total", signal_type=signal['signal_type'])
+                print(f"✅ Đã execute signal {signal_id}")
+                account_balance = get_simulation_balance()
+                print(f"💰 Balance còn lại: {account_balance:.2f} USD")
+                if account_balance <= 0:
+                    print("⚠️ Hết vốn, dừng execute trades")
+                    return executed_count
+            else:
+                print(f"❌ Không thể execute signal {signal_id}")
+    return executed_count
+
 def monitor_and_execute_trades_simulation():
     print("🔄 Bắt đầu monitor và execute trades (SIMULATION)...")
-    executed_signals = set()
+    # Journal trên disk: restart trong cửa sổ get_recent_signals không execute lại signal cũ
+    executed_signals = ExecutionJournal(os.path.join(STATE_DIR, "executed_signals.jsonl"),
+                                        ttl_seconds=EXECUTION_JOURNAL_TTL,
+                                        compact_every=EXECUTION_JOURNAL_COMPACT_EVERY)
+    print(f"📒 Execution journal: {len(executed_signals)} signals đã execute còn hiệu lực")
+    # Signals từ generator đến ngay qua bus; DB poll định kỳ để không bỏ lỡ signal nào
+    bus_queue = signal_bus.subscribe()
+    signal_bus.start_server()
+    next_poll = 0
     while True:
         try:
             account_balance = get_simulation_balance()
-            print(f"💰 Simulation balance: {account_balance:.2f} USD")
             if account_balance <= 0:
                 print("⚠️ Hết vốn simulation, không execute thêm trades")
-                time.sleep(60)
+                clock.sleep(60)
                 continue
-            recent_time = datetime.now() - timedelta(minutes=5)
-            signals = supabase_manager.get_recent_signals(recent_time)
+            wait_seconds = max(0.0, next_poll - clock.time())
+            try:
+                signals = bus_queue.get(timeout=wait_seconds) if wait_seconds > 0 else bus_queue.get_nowait()
+                source = "bus"
+            except queue.Empty:
+                logger.info("💰 Simulation balance: %.2f USD", account_balance)
+                metrics.set_gauge("simulation_balance_usd", account_balance)
+                recent_time = clock.now() - timedelta(minutes=5)
+                signals = supabase_manager.get_recent_signals(recent_time)
+                source = "DB"
+                next_poll = clock.time() + SIGNAL_POLL_INTERVAL
             if signals:
-                print(f"📊 Tìm thấy {len(signals)} signals mới trong 5 phút")
-                executed_count = 0
-                
-                # Group signals theo pair_id và khoảng thời gian (±30s)
-                signals_by_pair_time = defaultdict(list)
-                for signal in signals:
-                    # Làm tròn timestamp về phút (bỏ giây và microsecond)
-                    timestamp = datetime.fromisoformat(signal['timestamp'].replace('Z', '+00:00'))
-                    timestamp_rounded = timestamp.replace(second=0, microsecond=0)
-                    key = (signal['pair_id'], timestamp_rounded.isoformat())
-                    signals_by_pair_time[key].append(signal)
-                
-                for (pair_id, timestamp_rounded), group in signals_by_pair_time.items():
-                    # Kiểm tra có đủ 2 symbol khác nhau trong group
-                    symbols_in_group = set(signal['symbol'] for signal in group)
-                    if len(symbols_in_group) == 2:
-                        print(f"✅ Đủ 2 signals cho pair {pair_id} tại {timestamp_rounded}")
-                        
-                        # Kiểm tra trùng position cho cả 2 symbol TRƯỚC khi mở
-                        symbols_to_check = list(symbols_in_group)
-                        positions_exist = []
-                        
-                        for symbol in symbols_to_check:
-                            existing_positions = supabase_manager.get_open_positions_by_symbol(symbol)
-                            if existing_positions:
-                                positions_exist.append(symbol)
-                        
-                        if positions_exist:
-                            print(f"⚠️ Bỏ qua pair {pair_id} vì đã có position cho symbols: {positions_exist}")
-                            continue
-                        
-                        # Nếu cả 2 symbol đều chưa có position, mở cả 2
-                        for signal in group:
-                            signal_id = signal.get('id')
-                            if signal_id in executed_signals:
-                                continue
-                            pair_id = signal.get('pair_id')
-                            if not pair_id:
-                                print(f"⚠️ Không có pair_id cho signal {signal_id}")
-                                continue
-                            pair = supabase_manager.get_pair_by_id(pair_id)
-                            if not pair:
-                                print(f"⚠️ Không tìm thấy pair cho pair_id {pair_id}")
-                                continue
-                            # Lấy rank từ hourly_rankings
-                            rank = 10
-                            try:
-                                hourly_rankings = supabase_manager.get_hourly_rankings()
-                                for ranking in hourly_rankings:
-                                    if ranking.get('pair_id') == pair_id:
-                                        rank = ranking.get('current_rank', 10)
-                                        break
-                            except Exception as e:
-                                print(f"⚠️ Không lấy được rank cho pair_id {pair_id}: {e}")
-                            required_capital = get_capital_by_rank(rank, account_balance)
-                            if required_capital > account_balance:
-                                print(f"⚠️ Không đủ vốn cho signal {signal_id}: cần {required_capital:.2f}, có {account_balance:.2f}")
-                                continue
-                            result = execute_trade_simulation(signal, pair, account_balance)
-                            if result:
-                                executed_signals.add(signal_id)
-                                executed_count += 1
-                                print(f"✅ Đã execute signal {signal_id}")
-                                account_balance = get_simulation_balance()
-                                print(f"💰 Balance còn lại: {account_balance:.2f} USD")
-                                if account_balance <= 0:
-                                    print("⚠️ Hết vốn, dừng execute trades")
-                                    break
-                            else:
-                                print(f"❌ Không thể execute signal {signal_id}")
-                    else:
-                        print(f"⚠️ Bỏ qua pair {pair_id} tại {timestamp_rounded} vì không đủ 2 signal (có {len(symbols_in_group)} symbol: {symbols_in_group})")
+                print(f"📊 Nhận {len(signals)} signals từ {source}")
+                metrics.inc("signals_received_total", len(signals), source=source)
+                sync_risk_state()
+                with metrics.timer("execute_cycle_seconds"), profile_job("execute_signals"):
+                    executed_count = process_signals(signals, executed_signals, account_balance)
                 if executed_count > 0:
                     print(f"🎯 Đã execute {executed_count} signals mới")
                 else:
                     print("📊 Không có signals mới để execute")
-            else:
-                print("📊 Không có signals mới trong 5 phút")
-            time.sleep(60)
+            elif source == "DB":
+                logger.info("📊 Không có signals mới trong 5 phút")
         except KeyboardInterrupt:
             print("\n⏹️ Dừng monitor trades...")
             break
         except Exception as e:
             print(f"❌ Lỗi trong monitor loop: {e}")
-            time.sleep(60)
+            clock.sleep(60)
 
 # --- 3. Monitor logic ---
 def monitor_and_close_positions():
     print("🔍 MONITORING POSITIONS FOR CLOSING (REALTIME)...")
     while True:
         try:
-            pair_ids = get_unique_pair_ids()
+            positions_by_pair = get_open_positions_by_pair()
+            pair_ids = list(positions_by_pair)
             if not pair_ids:
                 # Không có open positions, sleep 5 phút rồi kiểm tra lại
-                time.sleep(300)
+                clock.sleep(300)
                 continue
+            loop_started = clock.time()
             closed_positions = []
-            for pair_id in pair_ids:
-                try:
-                    # 1. Đóng từng lệnh nếu chạm TP/SL
-                    pair_positions = supabase_manager.get_open_positions_by_pair_id(pair_id)
-                    for position in pair_positions:
-                        if position.get('status') != 'OPEN':
-                            continue
-                        current_price = get_current_price(position['symbol'])
-                        if current_price is None:
-                            continue
+            with profile_job("monitor_positions"):
+                for pair_id in pair_ids:
+                    try:
+                        # 1. Đóng từng lệnh nếu chạm TP/SL
+                        for position in positions_by_pair[pair_id]:
+                            if position.status != 'OPEN':
+                                continue
+                            current_price = get_current_price(position['symbol'])
+                            if current_price is None:
+                                continue
                         
-                        # Debug info
-                        print(f"   Checking position {position['id']}: {position['symbol']}")
-                        print(f"     Entry price: {position['entry_price']}")
-                        print(f"     Current price: {current_price}")
-                        print(f"     TP: {position.get('tp')}")
-                        print(f"     SL: {position.get('sl')}")
-                        print(f"     Signal type: {position.get('signal_type')}")
+                            logger.debug("Checking position %s: %s entry=%s price=%s tp=%s sl=%s type=%s",
+                                         position['id'], position['symbol'], position['entry_price'], current_price,
+                                         position.get('tp'), position.get('sl'), position.get('signal_type'))
                         
-                        should_close, reason = should_close_position_tp_sl(position, current_price)
-                        if should_close:
-                            print(f"     ✅ Should close: {reason}")
-                            print(f"     🚀 Testing close position for {reason}")
-                            result = close_position_simulation(position, current_price, reason)
-                            if result:
-                                closed_positions.append(result)
-                        else:
-                            print(f"     ❌ Should not close")
-                    # Lấy lại positions sau khi có thể đã đóng bớt
-                    pair_positions = supabase_manager.get_open_positions_by_pair_id(pair_id)
-                    # 2. Đóng cả cặp nếu còn đủ 2 lệnh và đạt điều kiện z-score
-                    if len(pair_positions) >= 2:
-                        print(f"   📊 Checking z-score for pair with {len(pair_positions)} positions")
-                        if should_close_pair_zscore(pair_id):
-                            # Lấy lại positions mới nhất trước khi đóng cặp
-                            pair_positions = supabase_manager.get_open_positions_by_pair_id(pair_id)
-                            success = close_pair_positions(pair_id)
-                            if success:
-                                # Lấy lại positions vừa đóng để append vào closed_positions
-                                closed = [p for p in pair_positions if p.get('status') == 'CLOSED']
-                                closed_positions.extend(closed)
-                        else:
-                            print(f"   📊 Z-score chưa đạt điều kiện đóng cặp")
-                    else:
-                        print(f"   ⚠️ Không đủ 2 positions để check z-score pair")
-                    # 3. Nếu chỉ còn 1 lệnh mở, kiểm tra z-score, nếu đạt thì đóng luôn lệnh đó
-                    pair_positions = supabase_manager.get_open_positions_by_pair_id(pair_id)
-                    if len(pair_positions) == 1:
-                        position = pair_positions[0]
-                        print(f"   📊 Checking z-score for single position")
-                        current_zscore = calculate_current_zscore(position)
-                        entry_zscore = position.get('z_score', 0)
-                        # Chỉ đóng lệnh nếu cả hai đều là số thực
-                        if (
-                            entry_zscore is not None and current_zscore is not None
-                            and isinstance(entry_zscore, (float, int))
-                            and isinstance(current_zscore, (float, int))
-                        ):
-                            print(f"   📊 Single position z-score: {entry_zscore:.2f} → {current_zscore:.2f}")
-                            if entry_zscore > 0 and current_zscore < 0.5:
-                                print(f"   ✅ Should close single position: Z-score mean reversion (BUY)")
-                                result = close_position_simulation(position, get_current_price(position['symbol']), reason='Z-score mean reversion (1 leg)')
-                                if result:
-                                    closed_positions.append(result)
-                            elif entry_zscore < 0 and current_zscore > -0.5:
-                                print(f"   ✅ Should close single position: Z-score mean reversion (SELL)")
-                                result = close_position_simulation(position, get_current_price(position['symbol']), reason='Z-score mean reversion (1 leg)')
+                            should_close, reason = should_close_position_tp_sl(position, current_price)
+                            if should_close:
+                                logger.info("✅ Đóng position %s %s: %s", position['id'], position['symbol'], reason,
+                                            extra=NO_RATE_LIMIT)
+                                result = close_position_simulation(position, current_price, reason)
                                 if result:
                                     closed_positions.append(result)
+                        # Lấy lại positions sau khi có thể đã đóng bớt
+                        pair_positions = supabase_manager.get_open_positions_by_pair_id(pair_id)
+                        # 2. Đóng cả cặp nếu còn đủ 2 lệnh và đạt điều kiện z-score
+                        if len(pair_positions) >= 2:
+                            logger.debug("📊 Checking z-score for pair %s with %d positions", pair_id, len(pair_positions))
+                            if should_close_pair_zscore(pair_id):
+                                # Lấy lại positions mới nhất trước khi đóng cặp
+                                pair_positions = supabase_manager.get_open_positions_by_pair_id(pair_id)
+                                success = close_pair_positions(pair_id)
+                                if success:
+                                    # Lấy lại positions vừa đóng để append vào closed_positions
+                                    closed = [p for p in pair_positions if p.get('status') == 'CLOSED']
+                                    closed_positions.extend(closed)
                             else:
-                                print(f"   ❌ Single position z-score chưa đạt điều kiện đóng")
+                                logger.debug("📊 Z-score pair %s chưa đạt điều kiện đóng cặp", pair_id)
                         else:
-                            print(f"⚠️ Không đủ dữ liệu z-score để đóng lệnh đơn cho position {position.get('id')}, entry_zscore={entry_zscore}, current_zscore={current_zscore}")
-                except Exception as e:
-                    print(f"❌ Lỗi khi monitor pair {pair_id}: {e}")
+                            logger.debug("Pair %s không đủ 2 positions để check z-score pair", pair_id)
+                        # 3. Nếu chỉ còn 1 lệnh mở, kiểm tra z-score, nếu đạt thì đóng luôn lệnh đó
+                        pair_positions = supabase_manager.get_open_positions_by_pair_id(pair_id)
+                        if len(pair_positions) == 1:
+                            position = pair_positions[0]
+                            logger.debug("📊 Checking z-score for single position %s", position.get('id'))
+                            current_zscore = calculate_current_zscore(position)
+                            entry_zscore = position.get('z_score', 0)
+                            # Chỉ đóng lệnh nếu cả hai đều là số thực
+                            if (
+                                entry_zscore is not None and current_zscore is not None
+                                and isinstance(entry_zscore, (float, int))
+                                and isinstance(current_zscore, (float, int))
+                            ):
+                                logger.debug("📊 Single position z-score: %.2f → %.2f", entry_zscore, current_zscore)
+                                if entry_zscore > 0 and current_zscore < 0.5:
+                                    print(f"   ✅ Should close single position: Z-score mean reversion (BUY)")
+                                    result = close_position_simulation(position, get_current_price(position['symbol']), reason='Z-score mean reversion (1 leg)')
+                                    if result:
+                                        closed_positions.append(result)
+                                elif entry_zscore < 0 and current_zscore > -0.5:
+                                    print(f"   ✅ Should close single position: Z-score mean reversion (SELL)")
+                                    result = close_position_simulation(position, get_current_price(position['symbol']), reason='Z-score mean reversion (1 leg)')
+                                    if result:
+                                        closed_positions.append(result)
+                                else:
+                                    logger.debug("Single position z-score chưa đạt điều kiện đóng")
+                            else:
+                                logger.warning("⚠️ Không đủ dữ liệu z-score để đóng lệnh đơn cho position %s, entry_zscore=%s, current_zscore=%s",
+                                               position.get('id'), entry_zscore, current_zscore)
+                    except Exception as e:
+                        print(f"❌ Lỗi khi monitor pair {pair_id}: {e}")
+            metrics.observe("monitor_loop_seconds", clock.time() - loop_started)
+            metrics.set_gauge("open_pairs", len(pair_ids))
             if closed_positions:
-                print(f"✅ Đã đóng {len(closed_positions)} positions")
+                metrics.inc("positions_closed_total", len(closed_positions))
+                logger.info("✅ Đã đóng %d positions", len(closed_positions), extra=NO_RATE_LIMIT)
             else:
-                print("📊 Không có positions nào cần đóng")
-            time.sleep(2)  # Sleep ngắn khi có open position
+                logger.info("📊 Không có positions nào cần đóng")
+            clock.sleep(2)  # Sleep ngắn khi có open position
         except Exception as e:
             print(f"❌ Lỗi trong monitor_and_close_positions: {e}")
-            time.sleep(2)
+            clock.sleep(2)
 
 # =====================
 # 6. Main entrypoint
@@ -520,9 +604,10 @@ def monitor_and_close_positions():
 def main():
     print("🎯 Trade Executor SIMULATION - $100 Virtual Account")
     print("=" * 60)
-    global simulation_balance
-    simulation_balance = SIMULATION_BALANCE
-    print(f"💰 Khởi tạo simulation account: ${simulation_balance:.2f}")
+    balance = restore_account_state()
+    print(f"💰 Simulation account: ${balance:.2f}")
+    # Close monitor chạy cùng process để entry và exit dùng chung một ledger đã restore
+    threading.Thread(target=monitor_and_close_positions, name="close-monitor", daemon=True).start()
     monitor_and_execute_trades_simulation()
 
 if __name__ == "__main__":
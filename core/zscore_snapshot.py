@@ -0,0 +1,211 @@
+# zscore_snapshot.py
+"""
+Snapshot z-score/spread live của các cặp đang theo dõi, chia sẻ giữa process qua file mmap:
+- Signal generator (scheduler process) cập nhật z-score, spread, hedge ratio, Bollinger bands của mọi cặp
+  vào ZScoreBoard trong mỗi lượt tạo signal rồi publish() toàn bộ snapshot (JSON) vào STATE_DIR/zscores.snap.
+  Snapshot mới cỡ lượt signal gần nhất (SIGNAL_CHECK_INTERVAL); monitor exit của executor không ghi vào đây
+- API process map cùng file và đọc không tốn Binance/DB; snapshot không đổi thì trả lại bản đã parse (vài µs)
+- Ghi/đọc kiểu seqlock: seq lẻ khi đang ghi, reader đọc lại nếu seq đổi giữa chừng (không cần lock liên process)
+
+Layout file: header 16 byte (magic "ZSN1", seq uint64, độ dài payload uint32) + vùng payload ZSCORE_SNAPSHOT_SIZE byte
+"""
+import os
+import json
+import math
+import mmap
+import struct
+import threading
+from config import STATE_DIR, ZSCORE_SNAPSHOT_SIZE, ZSCORE_SNAPSHOT_MAX_AGE
+from core import clock
+from core import metrics
+
+ZSCORE_SNAPSHOT_FILE = os.path.join(STATE_DIR, "zscores.snap")
+MAGIC = b"ZSN1"
+HEADER = struct.Struct("<4sQI")
+SEQ_OFFSET = 4
+LENGTH_OFFSET = 12
+
+
+def pair_key(pair1, pair2, timeframe):
+    return f"{pair1}-{pair2}_{timeframe}"
+
+def _finite(value):
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    if isinstance(value, dict):
+        return {name: _finite(item) for name, item in value.items()}
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    number = float(value)  # numpy scalar → float
+    return number if math.isfinite(number) else None
+
+
+class ZScoreBoard:
+    """Trạng thái z-score mới nhất theo cặp + timeframe trong signal process (writer của snapshot)"""
+
+    def __init__(self, path=ZSCORE_SNAPSHOT_FILE, capacity=ZSCORE_SNAPSHOT_SIZE, max_age=ZSCORE_SNAPSHOT_MAX_AGE):
+        self.path = path
+        self.capacity = int(capacity)
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._pairs = {}
+        self._mm = None
+        self._seq = 0
+
+    def update(self, pair1, pair2, timeframe, **fields):
+        """Gộp các field mới (z_score, spread, hedge_ratio, bollinger...) vào trạng thái của cặp"""
+        key = pair_key(pair1, pair2, timeframe)
+        with self._lock:
+            entry = self._pairs.get(key)
+            if entry is None:
+                entry = self._pairs[key] = {'pair1': pair1, 'pair2': pair2, 'timeframe': timeframe}
+            # NaN/inf → None để JSON của API hợp lệ
+            entry.update({name: _finite(value) for name, value in fields.items()})
+            entry['updated_at'] = clock.time()
+
+    def get(self, pair1, pair2, timeframe):
+        with self._lock:
+            entry = self._pairs.get(pair_key(pair1, pair2, timeframe))
+            return dict(entry) if entry is not None else None
+
+    def snapshot(self):
+        """Dict snapshot hiện tại; bỏ các cặp không được cập nhật quá max_age giây (cặp đã rời top)"""
+        now = clock.time()
+        with self._lock:
+            if self.max_age:
+                for key in [key for key, entry in self._pairs.items() if now - entry['updated_at'] > self.max_age]:
+                    del self._pairs[key]
+            pairs = [dict(entry) for entry in self._pairs.values()]
+        return {'published_at': now, 'pid': os.getpid(), 'pairs': pairs}
+
+    def publish(self):
+        """Ghi snapshot vào file mmap; False nếu lỗi hoặc payload vượt capacity (giữ bản cũ)"""
+        payload = json.dumps(self.snapshot(), default=float).encode()
+        if len(payload) > self.capacity:
+            print(f"⚠️ Z-score snapshot {len(payload)} bytes vượt ZSCORE_SNAPSHOT_SIZE={self.capacity}, bỏ qua")
+            metrics.inc("zscore_snapshot_publish_total", result="too_large")
+            return False
+        try:
+            with self._lock:
+                mm = self._map()
+                # seqlock: seq lẻ trong lúc ghi → reader biết cần đọc lại
+                self._seq += 1
+                mm[SEQ_OFFSET:SEQ_OFFSET + 8] = struct.pack("<Q", self._seq)
+                mm[HEADER.size:HEADER.size + len(payload)] = payload
+                mm[LENGTH_OFFSET:LENGTH_OFFSET + 4] = struct.pack("<I", len(payload))
+                self._seq += 1
+                mm[SEQ_OFFSET:SEQ_OFFSET + 8] = struct.pack("<Q", self._seq)
+        except OSError as e:
+            print(f"⚠️ Không ghi được z-score snapshot: {e}")
+            metrics.inc("zscore_snapshot_publish_total", result="error")
+            return False
+        metrics.inc("zscore_snapshot_publish_total", result="ok")
+        metrics.set_gauge("zscore_snapshot_pairs", len(self._pairs))
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._pairs.clear()
+
+    def close(self):
+        with self._lock:
+            if self._mm is not None:
+                self._mm.close()
+                self._mm = None
+
+    def _map(self):
+        if self._mm is not None:
+            return self._mm
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        size = HEADER.size + self.capacity
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, size)
+            mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        magic, seq, _ = HEADER.unpack_from(mm, 0)
+        # Tiếp tục seq của lần chạy trước để reader đang map file không nhầm snapshot mới là bản cũ
+        self._seq = seq + (seq & 1) if magic == MAGIC else 0
+        if magic != MAGIC:
+            HEADER.pack_into(mm, 0, MAGIC, 0, 0)
+        self._mm = mm
+        return mm
+
+
+class ZScoreSnapshotReader:
+    """Đọc snapshot từ file mmap (process khác, vd API); cache bản đã parse theo seq"""
+
+    def __init__(self, path=ZSCORE_SNAPSHOT_FILE, retries=100):
+        self.path = path
+        self.retries = retries
+        self._lock = threading.Lock()
+        self._mm = None
+        self._size = 0
+        self._seq = None
+        self._data = None
+
+    def read(self):
+        """Dict snapshot ({'published_at', 'pid', 'pairs'}) hoặc None nếu chưa có writer nào publish"""
+        with self._lock:
+            mm = self._map()
+            if mm is None:
+                return None
+            for _ in range(self.retries):
+                magic, seq, length = HEADER.unpack_from(mm, 0)
+                if magic != MAGIC or seq == 0:
+                    return None
+                if seq & 1:
+                    continue  # Writer đang ghi
+                if seq == self._seq:
+                    return self._data
+                payload = mm[HEADER.size:HEADER.size + length]
+                if HEADER.unpack_from(mm, 0)[1] != seq:
+                    continue  # Bị ghi đè giữa lúc copy → đọc lại
+                try:
+                    self._data = json.loads(payload)
+                except ValueError:
+                    continue
+                self._seq = seq
+                return self._data
+            # Writer ghi liên tục: dùng tạm bản đã đọc được gần nhất
+            return self._data
+
+    def close(self):
+        with self._lock:
+            if self._mm is not None:
+                self._mm.close()
+                self._mm = None
+
+    def _map(self):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return None
+        if self._mm is not None and size == self._size:
+            return self._mm
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if size < HEADER.size:
+            return None
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        self._size = size
+        return self._mm
+
+
+zscore_board = ZScoreBoard()
+_reader = None
+_reader_lock = threading.Lock()
+
+
+def read_zscores():
+    """Snapshot mới nhất do signal process publish (reader dùng chung của process)"""
+    global _reader
+    if _reader is None:
+        with _reader_lock:
+            if _reader is None:
+                _reader = ZScoreSnapshotReader()
+    return _reader.read()
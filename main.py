@@ -1,4 +1,9 @@
 # main.py
-from scheduler.scheduler import run_scheduler
+import sys
+from scheduler.scheduler import run_scheduler, run_daily_task
 if __name__ == "__main__":  
-    run_scheduler()   
+    # python main.py scan [--fresh]: chạy daily scan ngay (mặc định tiếp tục từ checkpoint hôm nay)
+    if len(sys.argv) > 1 and sys.argv[1] == "scan":
+        run_daily_task(resume="--fresh" not in sys.argv[2:])
+    else:
+        run_scheduler()   
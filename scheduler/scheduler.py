@@ -2,26 +2,49 @@
 import time
 from datetime import datetime
 import threading
-from core.data_collector import scan_market_for_stable_pairs, reorder_pairs_by_correlation
-from core.signal_generator import generate_and_save_signals
-from core.supabase_manager import SupabaseManager
-from config import HOURLY_UPDATE_INTERVAL, SIGNAL_CHECK_INTERVAL
+from core.clients import get_supabase_manager
+from core.profiler import profiled
+from config import HOURLY_UPDATE_INTERVAL, SIGNAL_CHECK_INTERVAL, SCAN_CATCHUP, SCAN_CATCHUP_INTERVAL
 
 # Force fix SIGNAL_CHECK_INTERVAL cho scheduler  
 SIGNAL_CHECK_INTERVAL = 15
-print(f"🔧 Scheduler forcing SIGNAL_CHECK_INTERVAL = {SIGNAL_CHECK_INTERVAL} minutes")
 
-supabase_manager = SupabaseManager()
+supabase_manager = get_supabase_manager()
 
-def daily_task():
+DAILY_SCAN_HOUR = 9
+
+@profiled("daily_task")
+def daily_task(resume=True):
+    # Import lazy: pandas/statsmodels/sklearn chỉ nạp khi job chạy lần đầu
+    from core.data_collector import scan_market_for_stable_pairs
     print(f"[Daily] {datetime.now()} - Scanning market for stable pairs...")
-    scan_market_for_stable_pairs()
+    scan_market_for_stable_pairs(resume=resume)
+
+def run_daily_task(resume=True):
+    """Chạy daily scan, lỗi không làm chết loop (lần sau tiếp tục từ checkpoint)"""
+    from core.scan_checkpoint import ScanInProgress
+    try:
+        daily_task(resume=resume)
+    except ScanInProgress as e:
+        print(f"[Daily] ⏭️ {e} - bỏ qua lần này")
+    except Exception as e:
+        print(f"[Daily] ❌ Daily scan lỗi: {e} - lần chạy sau sẽ tiếp tục từ checkpoint")
+
+def daily_scan_pending(now=None):
+    """Đã qua giờ scan mà scan hôm nay chưa hoàn thành (scan lỗi, process restart hoặc lỡ mốc 9:00)"""
+    from core.scan_checkpoint import ScanCheckpoint
+    now = now or datetime.now()
+    return now.hour >= DAILY_SCAN_HOUR and not ScanCheckpoint(day=now.date()).is_complete
 
+@profiled("hourly_task")
 def hourly_task():
+    from core.data_collector import reorder_pairs_by_correlation
     print(f"[4h] {datetime.now()} - Reordering pairs by correlation...")
     reorder_pairs_by_correlation()
 
+@profiled("signal_task")
 def signal_task():
+    from core.signal_generator import generate_and_save_signals
     print(f"[Signal] {datetime.now()} - Generating trading signals...")
     print(f"[Signal] Đang tạo signals cho timeframe 15m...")
     signals = generate_and_save_signals()
@@ -31,13 +54,21 @@ def signal_task():
         print(f"[Signal] ⚠️ Không có signals nào cho timeframe 15m")
 
 def run_scheduler():
+    print(f"🔧 Scheduler forcing SIGNAL_CHECK_INTERVAL = {SIGNAL_CHECK_INTERVAL} minutes")
     # Run daily at 9:00
     def daily_loop():
+        last_attempt = 0.0
         while True:
             now = datetime.now()
-            # Chạy daily_task lúc 9:00
-            if now.hour == 9 and now.minute == 0:
-                daily_task()
+            # Chạy daily_task lúc 9:00; catch-up nếu scan hôm nay chưa hoàn thành
+            scheduled = now.hour == DAILY_SCAN_HOUR and now.minute == 0
+            catch_up = (SCAN_CATCHUP and time.time() - last_attempt >= SCAN_CATCHUP_INTERVAL * 60
+                        and daily_scan_pending(now))
+            if scheduled or catch_up:
+                if not scheduled:
+                    print(f"[Daily] Catch-up: scan ngày {now.date()} chưa hoàn thành, chạy tiếp từ checkpoint")
+                last_attempt = time.time()
+                run_daily_task()
                 time.sleep(60)
             time.sleep(30)
     # Run every 4 hours
@@ -0,0 +1,83 @@
+# bench_kernels.py
+"""
+Micro-benchmark cho core/kernels.py: mỗi kernel so với cách tính cũ (pandas rolling / np.cov / statsmodels).
+
+Chạy:
+    python tests/bench_kernels.py                    # n=500, window=60, backend theo KERNEL_BACKEND
+    KERNEL_BACKEND=numpy python tests/bench_kernels.py --n 1500 --repeat 500
+Lần gọi đầu (JIT compile khi dùng Numba) được warm-up trước khi đo.
+"""
+import os
+import sys
+import time
+import argparse
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from core import kernels
+
+
+def best_of(fn, repeat):
+    fn()  # warm-up (JIT compile)
+    best = float('inf')
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        best = min(best, (time.perf_counter() - start) / repeat)
+    return best
+
+
+def cases(n, window):
+    rng = np.random.default_rng(0)
+    x = np.log(100 * np.exp(np.cumsum(rng.normal(0, 0.01, n))))
+    y = 0.9 * x + rng.normal(0, 0.01, n)
+    sx, sy = pd.Series(x), pd.Series(y)
+    resid = y - 0.9 * x
+
+    def pandas_ols():
+        cov = np.cov(sx, sy, ddof=1)
+        beta = cov[0, 1] / np.var(sx, ddof=1)
+        return sy.mean() - beta * sx.mean(), beta
+
+    def statsmodels_adf():
+        from statsmodels.tsa.stattools import adfuller
+        return adfuller(resid, maxlag=1, regression='n', autolag=None)[0]
+
+    def pandas_bollinger():
+        sma = sx.rolling(20).mean()
+        std = sx.rolling(20).std()
+        return sma + 2 * std, sma, sma - 2 * std
+
+    return [
+        ("rolling_mean", lambda: sx.rolling(window).mean(), lambda: kernels.rolling_mean(x, window)),
+        ("rolling_std", lambda: sx.rolling(window).std(ddof=1), lambda: kernels.rolling_std(x, window)),
+        ("rolling_corr", lambda: sx.rolling(7).corr(sy), lambda: kernels.rolling_corr(x, y, 7)),
+        ("ols_hedge_ratio", pandas_ols, lambda: kernels.ols_hedge_ratio(y, x)),
+        ("adf_tstat", statsmodels_adf, lambda: kernels.adf_tstat(resid, 1)),
+        ("bollinger_bands", pandas_bollinger, lambda: kernels.bollinger_bands(x, 20, 2.0)),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark kernels vs pandas/statsmodels")
+    parser.add_argument("--n", type=int, default=500, help="Số nến mỗi chuỗi")
+    parser.add_argument("--window", type=int, default=60, help="Rolling window")
+    parser.add_argument("--repeat", type=int, default=200, help="Số lần gọi mỗi vòng đo")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore", FutureWarning)  # adfuller đổi kiểu trả về ở statsmodels mới
+
+    print(f"🧮 Kernel backend: {kernels.BACKEND} | n={args.n} window={args.window}")
+    print(f"{'Kernel':<18} {'Baseline (µs)':>14} {'Kernel (µs)':>12} {'Speedup':>9}")
+    print("-" * 56)
+    for name, baseline, kernel in cases(args.n, args.window):
+        base_s = best_of(baseline, args.repeat)
+        kernel_s = best_of(kernel, args.repeat)
+        print(f"{name:<18} {base_s * 1e6:>14.1f} {kernel_s * 1e6:>12.1f} {base_s / kernel_s:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+# benchmark.py
+"""
+Benchmark offline cho data / signal / executor paths trên synthetic market.
+
+Binance client và Supabase được stub hoàn toàn (không cần .env hay network).
+Chạy:
+    python tests/benchmark.py                        # sizes 10,100,500
+    python tests/benchmark.py --sizes 10,100 --skip daily_scan
+    python tests/benchmark.py --save-baseline        # ghi kết quả làm baseline
+Kết quả lưu JSON trong tests/bench_results/, so sánh với baseline.json và báo regression.
+"""
+import os
+import sys
+import io
+import json
+import time
+import argparse
+import platform
+import tempfile
+import contextlib
+from datetime import datetime
+from itertools import combinations
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_market import SyntheticMarket, FakeBinanceClient, FakeSupabaseClient
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_results")
+BASELINE_FILE = os.path.join(RESULTS_DIR, "baseline.json")
+LATEST_FILE = os.path.join(RESULTS_DIR, "latest.json")
+BENCHMARKS = ["calculate_correlation_cointegration", "daily_scan", "calculate_pair_z_score",
+              "save_pair_signals", "monitor_and_close_positions"]
+
+
+class _StopLoop(BaseException):
+    """Dừng vòng lặp vô hạn của monitor sau đúng một iteration (không bị except Exception bắt)"""
+
+
+class _OneShotClock:
+    """Đồng hồ thật nhưng sleep() kết thúc vòng lặp"""
+
+    def now(self):
+        return datetime.now()
+
+    def time(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        raise _StopLoop()
+
+
+def install_stubs():
+    """Stub Binance client và Supabase client TRƯỚC khi các client lazy được tạo"""
+    os.environ.setdefault("STATE_DIR", tempfile.mkdtemp(prefix="stat_arb_bench_"))
+    import binance.client
+    import supabase
+    binance.client.Client = FakeBinanceClient
+    supabase.create_client = lambda url, key: FakeSupabaseClient()
+
+
+def load_modules():
+    with contextlib.redirect_stdout(io.StringIO()):
+        import core.supabase_manager as supabase_module
+        import core.data_collector as data_collector
+        import core.signal_generator as signal_generator
+        import core.trade_executor_simulation as executor
+    return supabase_module, data_collector, signal_generator, executor
+
+
+def reset_state(market, modules):
+    """Gắn market mới và database in-memory mới cho tất cả module"""
+    supabase_module, data_collector, signal_generator, executor = modules
+    from core import clients
+    FakeBinanceClient.market = market
+    clients.set_binance_client(FakeBinanceClient())
+    db = FakeSupabaseClient()
+    supabase_module.supabase = db
+    # Các module dùng chung một SupabaseManager (core/clients.py)
+    clients.get_supabase_manager().client = db
+    data_collector._data_cache.clear()
+    from core.panel import clear_panel_cache
+    from core.exchange_metadata import clear_exchange_metadata
+    from core.pair_stats import pair_stats_memo
+    from core.zscore_snapshot import zscore_board
+    clear_panel_cache()
+    clear_exchange_metadata()
+    pair_stats_memo.invalidate()
+    zscore_board.clear()
+    return db
+
+
+def timed(fn, *args, verbose=False, **kwargs):
+    out = sys.stdout if verbose else io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(out):
+        result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def sample_pairs(market, count):
+    """Ưu tiên cặp trong cùng nhóm cointegrated, bổ sung bằng cặp bất kỳ"""
+    grouped = [(a, b) for a, b in combinations(market.symbols, 2)
+               if a in market.group_of and market.group_of.get(a) == market.group_of.get(b)]
+    others = [(a, b) for a, b in combinations(market.symbols[:50], 2) if (a, b) not in set(grouped)]
+    return (grouped + others)[:count]
+
+
+def seed_pairs(db, pairs):
+    today = str(datetime.now().date())
+    rows = [{'date': today, 'pair1': a, 'pair2': b, 'correlation': 0.9, 'rolling_correlation': 0.9,
+             'cointegration_p_value': 0.01, 'is_cointegrated': True, 'rank': i + 1}
+            for i, (a, b) in enumerate(pairs)]
+    return db.table('daily_pairs').insert(rows).execute().data
+
+
+def bench_corr_coint(modules, market, verbose):
+    data_collector = modules[1]
+    pairs = sample_pairs(market, 50)
+    elapsed, _ = timed(lambda: [data_collector.calculate_correlation_cointegration(a, b) for a, b in pairs], verbose=verbose)
+    return elapsed / max(1, len(pairs))
+
+def bench_daily_scan(modules, market, verbose):
+    data_collector = modules[1]
+    # resume=False: bỏ checkpoint của lần chạy trước để đo scan đầy đủ
+    elapsed, _ = timed(data_collector.scan_market_for_stable_pairs_optimized, resume=False, verbose=verbose)
+    return elapsed
+
+def bench_pair_z_score(modules, market, verbose):
+    signal_generator = modules[2]
+    pairs = sample_pairs(market, 20)
+    elapsed, _ = timed(lambda: [signal_generator.calculate_pair_z_score(a, b, 60, "15m") for a, b in pairs], verbose=verbose)
+    return elapsed / max(1, len(pairs))
+
+def bench_save_pair_signals(modules, market, verbose):
+    db = modules[0].supabase
+    pairs = sample_pairs(market, min(50, len(market.symbols)))
+    seed_pairs(db, pairs)
+    now = datetime.now().isoformat()
+    signals = [{'pair1': a, 'pair2': b, 'symbol': a, 'signal_type': 'BUY', 'z_score': 2.7, 'spread': 0.01,
+                'timestamp': now, 'tp': 1.0, 'sl': 0.9, 'entry': 0.95, 'confirmation_details': 'BENCH'}
+               for a, b in pairs]
+    elapsed, _ = timed(modules[1].supabase_manager.save_pair_signals, signals, verbose=verbose)
+    return elapsed
+
+def bench_monitor_iteration(modules, market, verbose):
+    executor = modules[3]
+    db = modules[0].supabase
+    pairs = sample_pairs(market, min(20, len(market.symbols) // 2))
+    saved = seed_pairs(db, pairs)
+    positions = []
+    for pair in saved:
+        for symbol in (pair['pair1'], pair['pair2']):
+            price = market.last_price(symbol)
+            positions.append({'pair_id': pair['id'], 'symbol': symbol, 'entry_price': price, 'quantity': 1.0,
+                              'status': 'OPEN', 'tp': price * 1.1, 'sl': price * 0.9, 'z_score': 2.6,
+                              'signal_type': 'BUY', 'binance_order_id': f"SIM_BENCH_{symbol}",
+                              'entry_time': datetime.now().isoformat(), 'pnl': 0.0})
+    db.table('positions').insert(positions).execute()
+
+    from core import clock
+    previous_clock = clock.set_clock(_OneShotClock())
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stdout if verbose else io.StringIO()):
+            try:
+                executor.monitor_and_close_positions()
+            except _StopLoop:
+                pass
+        return time.perf_counter() - start
+    finally:
+        clock.set_clock(previous_clock)
+
+
+BENCH_FUNCTIONS = {
+    "calculate_correlation_cointegration": bench_corr_coint,
+    "daily_scan": bench_daily_scan,
+    "calculate_pair_z_score": bench_pair_z_score,
+    "save_pair_signals": bench_save_pair_signals,
+    "monitor_and_close_positions": bench_monitor_iteration,
+}
+
+
+def run_benchmarks(sizes, skip=(), verbose=False):
+    install_stubs()
+    modules = load_modules()
+    results = {}
+    for size in sizes:
+        results[str(size)] = {}
+        for name in BENCHMARKS:
+            if name in skip:
+                continue
+            market = SyntheticMarket(n_symbols=size)
+            reset_state(market, modules)
+            elapsed = BENCH_FUNCTIONS[name](modules, market, verbose)
+            results[str(size)][name] = elapsed
+            print(f"⏱️  {size:>4} symbols | {name:<38} {elapsed * 1000:10.2f} ms")
+    return {
+        'metadata': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sizes': sizes
+        },
+        'results': results
+    }
+
+
+def compare_with_baseline(report, baseline, tolerance=0.25):
+    """Trả về danh sách regression: thời gian vượt baseline quá tolerance"""
+    regressions = []
+    for size, metrics in report['results'].items():
+        for name, elapsed in metrics.items():
+            base = baseline.get('results', {}).get(size, {}).get(name)
+            if base and elapsed > base * (1 + tolerance):
+                regressions.append((size, name, base, elapsed))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark trên synthetic market")
+    parser.add_argument("--sizes", default="10,100,500", help="Số symbols, phân tách bằng dấu phẩy")
+    parser.add_argument("--skip", default="", help="Benchmarks bỏ qua, phân tách bằng dấu phẩy")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Ngưỡng regression (0.25 = chậm hơn 25%%)")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--output", default=LATEST_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    skip = {s.strip() for s in args.skip.split(",") if s.strip()}
+    report = run_benchmarks(sizes, skip=skip, verbose=args.verbose)
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Đã lưu kết quả: {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Đã lưu baseline: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("⚠️ Chưa có baseline - chạy với --save-baseline để tạo")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare_with_baseline(report, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ REGRESSIONS (> {args.tolerance:.0%} so với baseline):")
+        for size, name, base, elapsed in regressions:
+            print(f"   {size:>4} symbols | {name:<38} {base * 1000:.2f} ms → {elapsed * 1000:.2f} ms")
+        return 1
+    print("✅ Không có regression so với baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
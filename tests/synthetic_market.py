@@ -0,0 +1,231 @@
+# synthetic_market.py
+"""
+Synthetic market cho benchmark offline:
+- SyntheticMarket: sinh panel giá gồm các nhóm cointegrated (chung stochastic trend) và random walk độc lập
+- FakeBinanceClient: thay binance.client.Client, trả klines/ticker/exchange_info từ SyntheticMarket
+- FakeSupabaseClient: query builder in-memory đủ cho các method của SupabaseManager
+"""
+import re
+import time
+import zlib
+import numpy as np
+
+INTERVAL_MS = {
+    '1m': 60_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '1h': 3_600_000, '4h': 14_400_000, '1d': 86_400_000
+}
+
+
+class SyntheticMarket:
+    """
+    Panel giá tổng hợp:
+    - cointegrated_fraction symbols chia thành nhóm group_size, log-price = a + b * trend_nhóm + OU noise
+    - phần còn lại là random walk độc lập
+    """
+
+    def __init__(self, n_symbols=100, n_bars=1500, cointegrated_fraction=0.3, group_size=4, seed=42):
+        self.n_bars = n_bars
+        self.seed = seed
+        self.symbols = [f"SYN{i:04d}USDT" for i in range(n_symbols)]
+        n_coint = int(n_symbols * cointegrated_fraction)
+        self.group_of = {}
+        for idx, symbol in enumerate(self.symbols[:n_coint]):
+            self.group_of[symbol] = idx // group_size
+        self._series = {}
+        self.end_ms = int(time.time() * 1000)
+
+    def _rng(self, *parts):
+        key = "|".join(str(p) for p in (self.seed,) + parts)
+        return np.random.default_rng(zlib.crc32(key.encode()))
+
+    def _group_trend(self, group, interval):
+        rng = self._rng('trend', group, interval)
+        return np.cumsum(rng.normal(0, 0.01, self.n_bars))
+
+    def series(self, symbol, interval="1h"):
+        """Trả về (open_time, open, high, low, close, volume) dạng numpy cho symbol/interval"""
+        key = (symbol, interval)
+        if key in self._series:
+            return self._series[key]
+
+        rng = self._rng(symbol, interval)
+        if symbol in self.group_of:
+            trend = self._group_trend(self.group_of[symbol], interval)
+            noise = np.zeros(self.n_bars)
+            shocks = rng.normal(0, 0.004, self.n_bars)
+            for t in range(1, self.n_bars):
+                noise[t] = 0.8 * noise[t - 1] + shocks[t]
+            log_close = rng.uniform(0, 5) + rng.uniform(0.5, 1.5) * trend + noise
+        else:
+            log_close = rng.uniform(0, 5) + np.cumsum(rng.normal(0, 0.01, self.n_bars))
+
+        close = np.exp(log_close)
+        open_ = np.concatenate(([close[0]], close[:-1]))
+        spread = np.abs(rng.normal(0, 0.003, self.n_bars)) * close
+        high = np.maximum(open_, close) + spread
+        low = np.minimum(open_, close) - spread
+        volume = rng.lognormal(8, 1, self.n_bars)
+
+        interval_ms = INTERVAL_MS[interval]
+        last_open = self.end_ms - self.end_ms % interval_ms
+        open_time = last_open - interval_ms * np.arange(self.n_bars - 1, -1, -1, dtype=np.int64)
+
+        self._series[key] = (open_time, open_, high, low, close, volume)
+        return self._series[key]
+
+    def klines(self, symbol, interval="1h", limit=500, startTime=None, endTime=None):
+        """Klines đúng format Binance (list các list, giá trị là string)"""
+        open_time, open_, high, low, close, volume = self.series(symbol, interval)
+        mask = np.ones(len(open_time), dtype=bool)
+        if startTime is not None:
+            mask &= open_time >= int(startTime)
+        if endTime is not None:
+            mask &= open_time <= int(endTime)
+        idx = np.nonzero(mask)[0]
+        idx = idx[:limit] if startTime is not None else idx[-limit:]
+        interval_ms = INTERVAL_MS[interval]
+        return [
+            [int(open_time[i]), f"{open_[i]:.8f}", f"{high[i]:.8f}", f"{low[i]:.8f}",
+             f"{close[i]:.8f}", f"{volume[i]:.4f}", int(open_time[i]) + interval_ms - 1,
+             f"{volume[i] * close[i]:.4f}", 100, f"{volume[i] / 2:.4f}",
+             f"{volume[i] * close[i] / 2:.4f}", "0"]
+            for i in idx
+        ]
+
+    def last_price(self, symbol):
+        return float(self.series(symbol, "1m")[4][-1])
+
+    def exchange_info(self):
+        return {
+            'symbols': [
+                {
+                    'symbol': symbol,
+                    'status': 'TRADING',
+                    'contractType': 'PERPETUAL',
+                    'onboardDate': self.end_ms - 365 * 86_400_000,
+                    'filters': [
+                        {'filterType': 'PRICE_FILTER', 'tickSize': '0.00010000'},
+                        {'filterType': 'LOT_SIZE', 'stepSize': '0.001'},
+                        {'filterType': 'MIN_NOTIONAL', 'notional': '5'}
+                    ]
+                }
+                for symbol in self.symbols
+            ]
+        }
+
+
+class FakeBinanceClient:
+    """Thay binance.client.Client - không gọi network, dữ liệu lấy từ FakeBinanceClient.market"""
+
+    market = None
+
+    def __init__(self, *args, **kwargs):
+        self.timeout = 30
+
+    def ping(self):
+        return {}
+
+    def futures_klines(self, symbol, interval="1h", limit=500, startTime=None, endTime=None, **kwargs):
+        return self.market.klines(symbol, interval, limit, startTime, endTime)
+
+    def futures_exchange_info(self):
+        return self.market.exchange_info()
+
+    def futures_symbol_ticker(self, symbol):
+        return {'symbol': symbol, 'price': f"{self.market.last_price(symbol):.8f}"}
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    """Query builder in-memory mô phỏng postgrest (select/eq/gte/or_/order/limit/insert/update)"""
+
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.filters = []
+        self.op = 'select'
+        self.payload = None
+        self._order = None
+        self._limit = None
+
+    def select(self, *columns):
+        self.op = 'select'
+        return self
+
+    def insert(self, data):
+        self.op = 'insert'
+        self.payload = data
+        return self
+
+    def update(self, data):
+        self.op = 'update'
+        self.payload = data
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: str(row.get(column)) == str(value))
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and str(row.get(column)) >= str(value))
+        return self
+
+    def or_(self, expression):
+        groups = re.findall(r'and\(([^)]*)\)', expression)
+        conditions = []
+        for group in groups:
+            conditions.append([part.split('.eq.') for part in group.split(',')])
+        self.filters.append(lambda row: any(all(str(row.get(c)) == v for c, v in cond) for cond in conditions))
+        return self
+
+    def order(self, column, desc=False):
+        self._order = (column, desc)
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def execute(self):
+        rows = self.db.tables.setdefault(self.table, [])
+        if self.op == 'insert':
+            records = self.payload if isinstance(self.payload, list) else [self.payload]
+            inserted = []
+            for record in records:
+                row = dict(record)
+                row['id'] = self.db.next_id()
+                rows.append(row)
+                inserted.append(dict(row))
+            return _Result(inserted)
+
+        matched = [row for row in rows if all(f(row) for f in self.filters)]
+        if self.op == 'update':
+            for row in matched:
+                row.update(self.payload)
+            return _Result([dict(row) for row in matched])
+
+        if self._order:
+            column, desc = self._order
+            matched.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+        if self._limit is not None:
+            matched = matched[:self._limit]
+        return _Result([dict(row) for row in matched])
+
+
+class FakeSupabaseClient:
+    """Supabase client in-memory cho SupabaseManager"""
+
+    def __init__(self):
+        self.tables = {}
+        self._id = 0
+
+    def next_id(self):
+        self._id += 1
+        return self._id
+
+    def table(self, name):
+        return _Query(self, name)
@@ -0,0 +1,43 @@
+# test_account_ledger.py
+"""
+AccountLedger: release hai lần không cộng vốn hai lần, kể cả sau restart từ snapshot; key đã release hết hạn theo TTL;
+reservation còn mở qua restart vẫn release được bằng key gốc (int)
+"""
+from core import clock
+from core.account_ledger import AccountLedger
+
+
+def test_double_release_guard_survives_restart_and_expires(tmp_path):
+    previous = clock.get_clock()
+    virtual = clock.VirtualClock(start_ms=1_000_000)
+    clock.set_clock(virtual)
+    try:
+        path = str(tmp_path / "ledger.json")
+        ledger = AccountLedger(1000, snapshot_path=path, released_ttl=3600)
+        assert ledger.reserve(101, 200, symbol="AUSDT", pair_id=1)
+        assert ledger.release(101, pnl=10) == 1010
+        assert ledger.release(101, pnl=10) == 1010  # Luồng thứ hai đóng cùng lệnh
+
+        restarted = AccountLedger(1000, snapshot_path=path, released_ttl=3600)
+        assert restarted.load_snapshot()
+        assert restarted.release(101, pnl=10, amount=200) == 1010
+
+        virtual.sleep(3601)
+        restarted.release(102, amount=0)
+        assert "101" not in restarted.snapshot()['released']  # Hết hạn → bộ nhớ bị chặn
+    finally:
+        clock.set_clock(previous)
+
+
+def test_open_reservation_released_after_restart(tmp_path):
+    path = str(tmp_path / "ledger.json")
+    ledger = AccountLedger(1000, snapshot_path=path)
+    assert ledger.reserve(101, 200, symbol="AUSDT", pair_id=1)
+
+    restarted = AccountLedger(1000, snapshot_path=path)
+    assert restarted.load_snapshot()
+    assert not restarted.reserve(101, 200)  # Key đã được giữ từ trước restart
+    assert restarted.release(101, pnl=10) == 1010
+    assert restarted.gross_exposure() == 0
+    assert restarted.exposure_by_symbol("AUSDT") == 0
+    assert restarted.exposure_by_pair(1) == 0
@@ -0,0 +1,44 @@
+# test_exchange_metadata.py
+"""
+Exchange metadata: precision/rounding theo tickSize, lọc symbol mới list theo onboard date, chỉ gọi exchange info một lần
+"""
+from core import clients
+from core.exchange_metadata import (clear_exchange_metadata, get_symbol_info, round_price, price_precision,
+                                    split_by_listing_age, usdt_perpetual_symbols)
+
+NOW_MS = 1_700_000_000_000
+HOUR_MS = 3_600_000
+
+
+class ExchangeInfoClient:
+    calls = 0
+
+    def futures_exchange_info(self):
+        ExchangeInfoClient.calls += 1
+        return {'symbols': [
+            {'symbol': "BTCUSDT", 'status': 'TRADING', 'contractType': 'PERPETUAL', 'onboardDate': NOW_MS - 1000 * HOUR_MS,
+             'filters': [{'filterType': 'PRICE_FILTER', 'tickSize': '0.10'},
+                         {'filterType': 'LOT_SIZE', 'stepSize': '0.001'},
+                         {'filterType': 'MIN_NOTIONAL', 'notional': '100'}]},
+            {'symbol': "NEWUSDT", 'status': 'TRADING', 'contractType': 'PERPETUAL', 'onboardDate': NOW_MS - 50 * HOUR_MS,
+             'filters': [{'filterType': 'PRICE_FILTER', 'tickSize': '0.0000100'}]},
+            {'symbol': "OLDUSDT", 'status': 'SETTLING', 'contractType': 'PERPETUAL', 'filters': []}
+        ]}
+
+
+def test_metadata_precision_and_listing_age():
+    previous = clients.set_binance_client(ExchangeInfoClient())
+    clear_exchange_metadata()
+    try:
+        assert usdt_perpetual_symbols() == ["BTCUSDT", "NEWUSDT"]
+        btc = get_symbol_info("BTCUSDT")
+        assert (btc.price_precision, btc.quantity_precision, btc.min_notional) == (1, 3, 100.0)
+        assert round_price("BTCUSDT", 43251.2731) == 43251.3
+        assert btc.round_quantity(0.0129) == 0.012
+        assert price_precision("NEWUSDT") == 5
+        assert split_by_listing_age(["BTCUSDT", "NEWUSDT", "XUSDT"], 100, "1h", now_ms=NOW_MS) == \
+            (["BTCUSDT", "XUSDT"], ["NEWUSDT"])
+        assert ExchangeInfoClient.calls == 1
+    finally:
+        clients.set_binance_client(previous)
+        clear_exchange_metadata()
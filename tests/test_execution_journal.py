@@ -0,0 +1,74 @@
+# test_execution_journal.py
+"""
+ExecutionJournal: signal đã execute còn nhớ sau restart, dòng cuối ghi dở khi crash bị bỏ qua,
+entry hết hạn theo TTL (VirtualClock) và log được compact chỉ còn entry còn hạn
+"""
+import pytest
+from core import clock
+from core.execution_journal import ExecutionJournal
+
+
+@pytest.fixture
+def virtual_clock():
+    previous = clock.get_clock()
+    virtual = clock.VirtualClock(start_ms=1_000_000)
+    clock.set_clock(virtual)
+    yield virtual
+    clock.set_clock(previous)
+
+
+def read_lines(path):
+    with open(path) as f:
+        return f.read().splitlines()
+
+
+def test_restart_replays_journal_and_skips_torn_line(tmp_path, virtual_clock):
+    path = str(tmp_path / "journal.jsonl")
+    journal = ExecutionJournal(path, ttl_seconds=3600)
+    assert journal.add("1|AUSDT|BUY|t1")
+    assert not journal.add("1|AUSDT|BUY|t1")  # Đã execute
+    assert journal.add("2|BUSDT|SELL|t1")
+    journal.close()
+    with open(path, 'a') as f:
+        f.write('{"k": "3|CUSDT|BU')  # crash giữa lúc ghi
+
+    restarted = ExecutionJournal(path, ttl_seconds=3600)
+    assert "1|AUSDT|BUY|t1" in restarted and "2|BUSDT|SELL|t1" in restarted
+    assert "3|CUSDT|BUY|t1" not in restarted
+    assert not restarted.add("1|AUSDT|BUY|t1")
+    # Dòng hỏng đã được compact đi → entry ghi sau restart không dính vào dòng hỏng
+    assert restarted.add("3|CUSDT|BUY|t1")
+    restarted.close()
+    assert len(ExecutionJournal(path, ttl_seconds=3600)) == 3
+
+
+def test_entries_expire_after_ttl(tmp_path, virtual_clock):
+    path = str(tmp_path / "journal.jsonl")
+    journal = ExecutionJournal(path, ttl_seconds=60)
+    journal.add("old")
+    virtual_clock.sleep(30)
+    journal.add("new")
+    virtual_clock.sleep(31)
+    assert "old" not in journal and "new" in journal
+    assert len(journal) == 1
+    assert journal.add("old")  # Hết hạn → được ghi nhận lại
+    journal.close()
+
+    virtual_clock.sleep(120)
+    assert len(ExecutionJournal(path, ttl_seconds=60)) == 0
+
+
+def test_compaction_keeps_only_live_entries(tmp_path, virtual_clock):
+    path = str(tmp_path / "journal.jsonl")
+    journal = ExecutionJournal(path, ttl_seconds=10, compact_every=5)
+    for i in range(5):
+        journal.add(f"k{i}")
+    virtual_clock.sleep(11)
+    for i in range(5, 10):
+        journal.add(f"k{i}")  # Entry cũ hết hạn → đủ 5 dòng chết → compact
+    assert len(read_lines(path)) < 10
+    journal.compact()
+    assert sorted(read_lines(path)) == sorted(f'{{"k": "k{i}", "t": {1_011.0}}}' for i in range(5, 10))
+    journal.add("k10")
+    journal.close()
+    assert len(ExecutionJournal(path, ttl_seconds=10)) == 6
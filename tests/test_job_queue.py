@@ -0,0 +1,45 @@
+# test_job_queue.py
+"""
+JobQueue: job giống hệt đang chạy được dedupe, huỷ giữa chừng, progress/kết quả tạm đọc được trong lúc chạy
+"""
+import time
+import threading
+from core.job_queue import JobQueue
+
+
+def wait_for(job, statuses, timeout=2.0):
+    deadline = time.time() + timeout
+    while job.status not in statuses and time.time() < deadline:
+        time.sleep(0.01)
+    return job.status
+
+
+def test_dedupe_progress_and_cancel():
+    queue = JobQueue(max_workers=2, max_queued=4)
+    started = threading.Event()
+
+    def slow_job(job, steps=100):
+        started.set()
+        for step in range(steps):
+            job.check_cancelled()
+            job.update(done=step + 1, total=steps)
+            job.add_results([step])
+            time.sleep(0.01)
+        return steps
+
+    queue.register("slow", slow_job)
+    job, deduplicated = queue.submit("slow", {'steps': 100})
+    same, same_deduplicated = queue.submit("slow", {'steps': 100})
+    other, _ = queue.submit("slow", {'steps': 3})
+    assert not deduplicated and same_deduplicated and same is job and other is not job
+
+    assert started.wait(1.0)
+    time.sleep(0.05)
+    snapshot = job.to_dict()
+    assert snapshot['status'] == "running" and snapshot['progress']['done'] >= 1 and snapshot['partial_results']
+
+    queue.cancel(job.id)
+    assert wait_for(job, ("cancelled",)) == "cancelled"
+    assert wait_for(other, ("succeeded",)) == "succeeded" and other.result == 3
+    assert queue.submit("slow", {'steps': 100})[1] is False  # job đã xong không còn bị dedupe
+    queue.shutdown()
@@ -0,0 +1,39 @@
+# test_kalman_store.py
+"""
+KalmanStateStore dùng chung giữa generator và monitor (hai process): không mất cập nhật, không lùi state
+"""
+import multiprocessing
+from core.kalman_filter import KalmanHedgeRatio, KalmanStateStore
+
+
+def make_filter(timestamp):
+    kf = KalmanHedgeRatio()
+    kf.update(1.0, 1.0, timestamp=timestamp)
+    return kf
+
+
+def write_keys(path, prefix):
+    store = KalmanStateStore(path)
+    for i in range(20):
+        store.put(f"{prefix}{i}", make_filter(i))
+
+
+def test_concurrent_writers_keep_all_keys(tmp_path):
+    path = str(tmp_path / "kalman_state.json")
+    workers = [multiprocessing.Process(target=write_keys, args=(path, prefix)) for prefix in ("A", "B")]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    store = KalmanStateStore(path)
+    assert all(store.get(f"{prefix}{i}") is not None for prefix in ("A", "B") for i in range(20))
+
+
+def test_older_state_does_not_overwrite_newer(tmp_path):
+    path = str(tmp_path / "kalman_state.json")
+    generator, monitor = KalmanStateStore(path), KalmanStateStore(path)
+    generator.put("AB_1h", make_filter(1_000))
+    stale = monitor.get("AB_1h")
+    generator.put("AB_1h", make_filter(5_000))
+    monitor.put("AB_1h", stale)
+    assert KalmanStateStore(path).get("AB_1h").last_timestamp == 5_000
@@ -0,0 +1,47 @@
+# test_kernels.py
+"""
+Kernels: khớp pandas rolling / OLS / ADF tham chiếu; loop kernel (Numba) và backend NumPy cho cùng kết quả
+"""
+import numpy as np
+import pandas as pd
+from core import kernels
+
+
+def make_series(n=300, seed=5):
+    rng = np.random.default_rng(seed)
+    x = 40000 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))  # giá lớn để bắt sai số running sum
+    y = 0.8 * x + rng.normal(0, 50, n)
+    return x, y
+
+
+def test_rolling_kernels_match_pandas():
+    x, y = make_series()
+    sx, sy = pd.Series(x), pd.Series(y)
+    np.testing.assert_allclose(kernels.rolling_mean(x, 20), sx.rolling(20).mean(), rtol=1e-10)
+    np.testing.assert_allclose(kernels.rolling_std(x, 20), sx.rolling(20).std(), rtol=1e-8)
+    np.testing.assert_allclose(kernels.rolling_corr(x, y, 7), sx.rolling(7).corr(sy), rtol=1e-8, atol=1e-10)
+    upper, middle, lower = kernels.bollinger_bands(x, 20, 2.0)
+    np.testing.assert_allclose(upper - middle, 2 * sx.rolling(20).std(), rtol=1e-8)
+    assert np.isnan(kernels.rolling_std(x[:5], 20)).all()
+
+
+def test_ols_and_adf_match_reference():
+    x, y = make_series()
+    alpha, beta = kernels.ols_hedge_ratio(y, x)
+    ref_beta, ref_alpha = np.polyfit(x, y, 1)
+    assert np.isclose(beta, ref_beta) and np.isclose(alpha, ref_alpha)
+
+    from statsmodels.tsa.stattools import adfuller
+    resid = y - alpha - beta * x
+    assert np.isclose(kernels.adf_tstat(resid, 1), adfuller(resid, maxlag=1, regression='n', autolag=None)[0])
+    assert np.isnan(kernels.adf_tstat(np.ones(50), 1))
+
+
+def test_loop_kernels_match_numpy_backend():
+    x, y = make_series(120)
+    np.testing.assert_allclose(kernels._rolling_mean_loop(x, 20), kernels._rolling_mean_numpy(x, 20), rtol=1e-12)
+    np.testing.assert_allclose(kernels._rolling_std_loop(x, 20, 1), kernels._rolling_std_numpy(x, 20, 1), rtol=1e-10)
+    np.testing.assert_allclose(kernels._rolling_corr_loop(x, y, 7), kernels._rolling_corr_numpy(x, y, 7), rtol=1e-10)
+    np.testing.assert_allclose(kernels._ols_loop(y, x), kernels._ols_numpy(y, x), rtol=1e-12)
+    resid = y - 0.8 * x
+    assert np.isclose(kernels._adf_loop(resid, 2), kernels._adf_numpy(resid, 2), rtol=1e-9)
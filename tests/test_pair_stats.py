@@ -0,0 +1,59 @@
+# test_pair_stats.py
+"""
+PairStatsMemo: mỗi thống kê tính một lần mỗi nến, nến mới bỏ toàn bộ thống kê cũ của cặp;
+cache klines của get_data hết hạn khi sang nến mới (để memo/panel của scan và re-rank thấy nến mới)
+"""
+from core.pair_stats import PairStatsMemo, last_close_ms
+
+HOUR_MS = 3_600_000
+
+
+def test_stats_computed_once_per_candle():
+    memo = PairStatsMemo(max_pairs=2)
+    calls = []
+
+    def compute(value):
+        calls.append(value)
+        return value
+
+    close_ms = last_close_ms([0, HOUR_MS], "1h")
+    assert close_ms == 2 * HOUR_MS
+    assert memo.get_or_compute("A", "B", "1h", close_ms, ("correlation", 168), lambda: compute(1)) == 1
+    assert memo.get_or_compute("A", "B", "1h", close_ms, ("correlation", 168), lambda: compute(2)) == 1
+    assert memo.get_or_compute("A", "B", "1h", close_ms, "hedge_ratio", lambda: compute(3)) == 3
+
+    # Nến mới → tính lại; dữ liệu cũ hơn không ghi đè bản mới
+    assert memo.get_or_compute("A", "B", "1h", close_ms + HOUR_MS, ("correlation", 168), lambda: compute(4)) == 4
+    assert memo.get_or_compute("A", "B", "1h", close_ms, ("correlation", 168), lambda: compute(5)) == 5
+    assert memo.get_or_compute("A", "B", "1h", close_ms + HOUR_MS, ("correlation", 168), lambda: compute(6)) == 4
+    assert memo.get_or_compute("A", "B", "1h", close_ms + HOUR_MS, "hedge_ratio", lambda: compute(7)) == 7
+    assert calls == [1, 3, 4, 5, 7]
+
+    memo.get_or_compute("A", "C", "1h", close_ms, "hedge_ratio", lambda: 0)
+    memo.get_or_compute("B", "C", "1h", close_ms, "hedge_ratio", lambda: 0)
+    assert len(memo) == 2  # LRU: cặp A-B ít dùng nhất bị bỏ
+
+
+def test_data_cache_expires_on_new_candle():
+    # Panel/memo của scan và re-rank chỉ thấy nến mới nếu cache klines của get_data hết hạn theo nến
+    from core import clock
+    from core.data_collector import get_cached_klines, _data_cache
+    previous = clock.get_clock()
+    virtual = clock.VirtualClock(start_ms=10 * HOUR_MS + 1)
+    clock.set_clock(virtual)
+    try:
+        _data_cache.pop("TEST_1h", None)
+        fetches = []
+
+        def fetch():
+            fetches.append(virtual.time_ms())
+            return len(fetches)
+
+        assert get_cached_klines("TEST_1h", fetch) == 1
+        virtual.advance_to(10 * HOUR_MS + 30 * 60_000)
+        assert get_cached_klines("TEST_1h", fetch) == 1  # Cùng nến → cache
+        virtual.advance_to(11 * HOUR_MS)
+        assert get_cached_klines("TEST_1h", fetch) == 2  # Nến mới → fetch lại
+    finally:
+        _data_cache.pop("TEST_1h", None)
+        clock.set_clock(previous)
@@ -0,0 +1,70 @@
+# test_panel.py
+"""
+Panel giá căn theo timestamp: symbol thiếu nến / mới list không được so lệch vị trí;
+resample từ chuỗi base lên timeframe lớn hơn; panel cache theo nến vs load_panel luôn tải mới
+"""
+import numpy as np
+from core.klines import Klines, resample
+from core.panel import Panel, get_panel, load_panel, clear_panel_cache
+
+
+def make_klines(open_times, closes):
+    open_time = np.array(open_times, dtype=np.int64)
+    close = np.array(closes, dtype=np.float64)
+    return Klines(open_time, close, close, close, close, np.ones(len(close), dtype=np.float32), open_time + 59_999)
+
+
+def test_pair_aligns_on_timestamp():
+    a = make_klines([0, 60_000, 120_000, 180_000], [1.0, 2.0, 3.0, 4.0])
+    b = make_klines([60_000, 180_000], [20.0, 40.0])  # thiếu nến 0 và 120_000
+    panel = Panel.from_klines({'A': a, 'B': b}, policy="drop")
+
+    open_time, close_a, close_b = panel.pair('A', 'B')
+    assert open_time.tolist() == [60_000, 180_000]
+    assert close_a.tolist() == [2.0, 4.0]
+    assert close_b.tolist() == [20.0, 40.0]
+
+    ffill = Panel.from_klines({'A': a, 'B': b}, policy="ffill")
+    open_time, close_a, close_b = ffill.pair('A', 'B')
+    assert open_time.tolist() == [60_000, 120_000, 180_000]
+    assert close_b.tolist() == [20.0, 20.0, 40.0]
+
+
+def test_complete_columns_are_zero_copy_views():
+    a = make_klines([0, 60_000, 120_000], [1.0, 2.0, 3.0])
+    c = make_klines([0, 60_000, 120_000], [5.0, 6.0, 7.0])
+    panel = Panel.from_klines({'A': a, 'C': c})
+
+    _, close_a, close_c = panel.pair('A', 'C')
+    assert np.shares_memory(close_a, panel.closes) and np.shares_memory(close_c, panel.closes)
+    assert close_a.flags['C_CONTIGUOUS']
+
+
+def test_resample_drops_partial_leading_bucket():
+    # Nến 5m bắt đầu ở phút 10 → bucket 15m đầu tiên thiếu nến và bị bỏ
+    open_times = [600_000 + i * 300_000 for i in range(7)]
+    klines = make_klines(open_times, [float(i) for i in range(7)])
+    bars = resample(klines, "15m")
+
+    assert bars.open_time.tolist() == [900_000, 1_800_000]
+    assert bars.open.tolist() == [1.0, 4.0]
+    assert bars.close.tolist() == [3.0, 6.0]
+    assert bars.volume.tolist() == [3.0, 3.0]
+    assert (bars.close_time == bars.open_time + 899_999).all()
+
+
+def test_cached_panel_reused_within_bar_load_panel_always_fresh():
+    clear_panel_cache()
+    calls = []
+    prices = {'A': 1.0, 'B': 2.0}
+
+    def loader(symbol, interval, limit):
+        calls.append(symbol)
+        return make_klines([0, 60_000], [prices[symbol], prices[symbol]])
+
+    get_panel(['A', 'B'], "1m", 2, loader)
+    prices['A'] = 1.5  # Giá đổi trong cùng nến
+    assert get_panel(['A', 'B'], "1m", 2, loader).series('A')[1][-1] == 1.0
+    assert load_panel(['A', 'B'], "1m", 2, loader).series('A')[1][-1] == 1.5
+    assert calls == ['A', 'B', 'A', 'B']
+    clear_panel_cache()
@@ -0,0 +1,33 @@
+# test_risk_engine.py
+"""
+RiskEngine.evaluate: legs cùng group cộng dồn, group khác nhau (dù chung symbol) xét độc lập;
+correlated exposure và MAX_PAIRS_PER_DAY chặn đúng leg
+"""
+from core.risk_engine import RiskEngine
+
+
+def test_groups_sharing_symbol_are_independent():
+    engine = RiskEngine(max_gross=2_600, max_net=10_000, max_symbol=1_000, max_correlated=1_500,
+                        daily_limit=10_000, max_pairs_per_day=2, correlation_threshold=0.8)
+    engine.set_pair_correlations([{'pair1': "AUSDT", 'pair2': "XUSDT", 'correlation': 0.9}])
+    engine.record_fill("XUSDT", "BUY", 1_000, pair_id=1)
+    engine.record_fill("YUSDT", "SELL", 100, pair_id=2)
+
+    candidates = [
+        # Pair 2 (đã mở hôm nay): leg A tương quan với XUSDT đang mở → 0.9*1000 + 700 > 1500
+        {'symbol': "AUSDT", 'signal_type': "BUY", 'notional': 700, 'pair_id': 2, 'group': "g1"},
+        {'symbol': "BUSDT", 'signal_type': "SELL", 'notional': 700, 'pair_id': 2, 'group': "g1"},
+        # Pair 3 (mới): chung BUSDT với g1 nhưng không cộng dồn; vượt MAX_PAIRS_PER_DAY (2 + 1 > 2)
+        {'symbol': "BUSDT", 'signal_type': "SELL", 'notional': 700, 'pair_id': 3, 'group': "g2"},
+        {'symbol': "CUSDT", 'signal_type': "BUY", 'notional': 700, 'pair_id': 3, 'group': "g2"},
+    ]
+    approved, reasons = engine.evaluate(candidates)
+
+    # Gross mỗi group: 1100 + 1400 = 2500 ≤ 2600 (cộng cả hai group sẽ là 3900);
+    # BUSDT mỗi group 700 ≤ 1000 (cộng chéo group sẽ là 1400 → symbol concentration)
+    assert reasons == ["correlated exposure", None, "MAX_PAIRS_PER_DAY", "MAX_PAIRS_PER_DAY"]
+    assert approved.tolist() == [False, True, False, False]
+
+    engine.max_gross = 2_400
+    approved, reasons = engine.evaluate(candidates[:2])
+    assert reasons == ["gross exposure", "gross exposure"]
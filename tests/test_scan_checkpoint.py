@@ -0,0 +1,40 @@
+# test_scan_checkpoint.py
+"""
+ScanCheckpoint: stage output và chunk đã phân tích còn nguyên sau restart, dòng ghi dở khi crash bị bỏ qua;
+ScanLock: hai scan không chạy song song
+"""
+import numpy as np
+import pytest
+from core.scan_checkpoint import ScanCheckpoint, ScanLock, ScanInProgress
+
+
+def test_resume_after_crash_keeps_completed_chunks(tmp_path):
+    checkpoint = ScanCheckpoint(day="2024-01-02", directory=str(tmp_path))
+    checkpoint.put("volume_filter", ["AUSDT", "BUSDT", "CUSDT"])
+    checkpoint.record_chunk([("AUSDT", "BUSDT")], [{'pair1': "AUSDT", 'pair2': "BUSDT",
+                                                   'correlation': np.float64(0.9), 'is_cointegrated': np.bool_(True)}])
+    checkpoint.record_chunk([("AUSDT", "CUSDT"), ("BUSDT", "CUSDT")], [])
+    checkpoint.close()
+    with open(checkpoint.chunk_path, 'a') as f:
+        f.write('{"pairs": ["XUSDT|Y')  # crash giữa lúc ghi
+
+    resumed = ScanCheckpoint(day="2024-01-02", directory=str(tmp_path))
+    done, results = resumed.load_chunks()
+    assert resumed.completed_stages() == ["volume_filter"]
+    assert not resumed.is_complete
+    assert done == {"AUSDT|BUSDT", "AUSDT|CUSDT", "BUSDT|CUSDT"}
+    assert results == [{'pair1': "AUSDT", 'pair2': "BUSDT", 'correlation': 0.9, 'is_cointegrated': True}]
+
+    resumed.put("pair_analysis", results)
+    assert resumed.load_chunks() == (set(), [])
+    resumed.put("ranking", 1)
+    assert ScanCheckpoint(day="2024-01-02", directory=str(tmp_path)).is_complete
+
+
+def test_scan_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / "scan.lock")
+    with ScanLock(path):
+        with pytest.raises(ScanInProgress):
+            ScanLock(path).acquire()
+    with ScanLock(path):  # Đã nhả → lấy lại được
+        pass
@@ -0,0 +1,56 @@
+# test_signal_identity.py
+"""
+Cùng một signal đến executor hai lần (signal bus rồi DB poll) phải có cùng signal_key:
+hourly_rankings còn trỏ pair_id của hôm qua trong khi daily_pairs đã có id mới sau scan 09:00
+"""
+import io
+import contextlib
+from datetime import datetime, timedelta
+
+import benchmark
+from synthetic_market import SyntheticMarket
+
+
+def test_bus_and_db_copies_execute_once(monkeypatch):
+    benchmark.install_stubs()
+    modules = benchmark.load_modules()
+    _, _, signal_generator, executor = modules
+    market = SyntheticMarket(n_symbols=10, n_bars=300, seed=7)
+    db = benchmark.reset_state(market, modules)
+
+    from core import signal_bus
+    from core.account_ledger import AccountLedger
+    from core.signal_bus import signal_key
+    pair1, pair2 = market.symbols[:2]
+    yesterday = str((datetime.now() - timedelta(days=1)).date())
+    old_id = db.table('daily_pairs').insert([{'date': yesterday, 'pair1': pair1, 'pair2': pair2, 'rank': 1}]).execute().data[0]['id']
+    new_id = benchmark.seed_pairs(db, [(pair1, pair2)])[0]['id']
+    now = datetime.now().isoformat()
+    db.table('hourly_rankings').insert([{'pair_id': old_id, 'current_rank': 1, 'timestamp': now}]).execute()
+
+    # Batch gắn pair_id từ hourly_rankings (id cũ) vào signal
+    signals = [{'pair1': pair1, 'pair2': pair2, 'pair_id': old_id, 'symbol': symbol, 'signal_type': side,
+                'z_score': 2.6, 'spread': 0.01, 'timestamp': now, 'tp': 1.0, 'sl': 0.9, 'entry': 0.95,
+                'confirmation_details': 'TEST'}
+               for symbol, side in ((pair1, 'BUY'), (pair2, 'SELL'))]
+    monkeypatch.setattr(signal_generator, "generate_signals_for_top_pairs", lambda **kwargs: signals)
+    monkeypatch.setattr(executor, "ledger", AccountLedger(1000))
+    bus_queue = signal_bus.subscribe()
+    executed = set()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            signal_generator.generate_and_save_signals()
+            bus_signals = bus_queue.get_nowait()
+            executor.sync_risk_state()
+            first = executor.process_signals(bus_signals, executed, executor.get_simulation_balance())
+            db_signals = executor.supabase_manager.get_recent_signals(datetime.now() - timedelta(minutes=5))
+            executor.sync_risk_state()
+            second = executor.process_signals(db_signals, executed, executor.get_simulation_balance())
+    finally:
+        signal_bus.unsubscribe(bus_queue)
+
+    assert {signal['pair_id'] for signal in bus_signals} == {new_id}
+    assert first == 2
+    assert len(db_signals) == 2 and all(signal_key(signal) in executed for signal in db_signals)
+    assert second == 0
+    assert len(executor.supabase_manager.get_all_open_positions()) == 2
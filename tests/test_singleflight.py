@@ -0,0 +1,32 @@
+# test_singleflight.py
+"""
+SingleFlight: các thread cùng key chỉ gọi fn một lần, key khác nhau không chặn nhau
+"""
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from core.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_fetch():
+    group = SingleFlight()
+    calls = []
+    lock = threading.Lock()
+
+    def fetch(key):
+        with lock:
+            calls.append(key)
+        time.sleep(0.1)
+        return f"data-{key}"
+
+    keys = ["BTCUSDT", "ETHUSDT"] * 8
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(keys)) as executor:
+        results = list(executor.map(lambda key: group.do(key, fetch, key), keys))
+    elapsed = time.perf_counter() - start
+
+    assert sorted(calls) == ["BTCUSDT", "ETHUSDT"]
+    assert [result for result, _ in results] == [f"data-{key}" for key in keys]
+    assert sum(1 for _, shared in results if not shared) == 2
+    assert elapsed < 0.3  # 2 key chạy song song, không nối tiếp nhau
+    assert group.in_flight() == 0
@@ -0,0 +1,64 @@
+# test_startup.py
+"""
+Guard thời gian khởi động của các entry point:
+- Import api.api / scheduler.scheduler không nạp thư viện nặng và không tạo client (không cần .env/network)
+- Cold start (import trong process mới): chỉ báo cáo (warning khi quá 1s) vì thời gian phụ thuộc máy CI;
+  đặt STARTUP_BUDGET_SECONDS để biến nó thành assert cứng
+"""
+import os
+import sys
+import json
+import tempfile
+import warnings
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("pandas", "statsmodels", "sklearn", "binance", "supabase")
+STARTUP_BUDGET_SECONDS = os.getenv("STARTUP_BUDGET_SECONDS")
+STARTUP_REPORT_SECONDS = 1.0
+
+_PROBE = (
+    "import sys, time, json\n"
+    "start = time.perf_counter()\n"
+    "import {module}\n"
+    "print(json.dumps({{'seconds': time.perf_counter() - start, 'modules': sorted(sys.modules)}}))\n"
+)
+
+
+def import_in_subprocess(module):
+    env = dict(os.environ, SUPABASE_URL="", SUPABASE_KEY="", BINANCE_API_KEY="", BINANCE_API_SECRET="",
+               STATE_DIR=tempfile.mkdtemp(prefix="stat_arb_startup_"))
+    result = subprocess.run([sys.executable, "-c", _PROBE.format(module=module)], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def loaded_heavy_modules(modules):
+    return sorted({name.split(".")[0] for name in modules} & set(HEAVY_MODULES))
+
+
+def check_startup_time(module, seconds):
+    message = f"{module} import mất {seconds:.2f}s"
+    if STARTUP_BUDGET_SECONDS is not None:
+        assert seconds < float(STARTUP_BUDGET_SECONDS), message
+    elif seconds >= STARTUP_REPORT_SECONDS:
+        warnings.warn(f"{message} (>= {STARTUP_REPORT_SECONDS}s)")
+
+
+def test_api_startup():
+    probe = import_in_subprocess("api.api")
+    assert loaded_heavy_modules(probe['modules']) == []
+    check_startup_time("api.api", probe['seconds'])
+
+
+def test_scheduler_startup():
+    probe = import_in_subprocess("scheduler.scheduler")
+    assert loaded_heavy_modules(probe['modules']) == []
+    check_startup_time("scheduler.scheduler", probe['seconds'])
+
+
+if __name__ == "__main__":
+    for module in ("api.api", "scheduler.scheduler"):
+        probe = import_in_subprocess(module)
+        print(f"⏱️  {module:<22} {probe['seconds'] * 1000:8.1f} ms | heavy: {loaded_heavy_modules(probe['modules']) or '-'}")
@@ -0,0 +1,46 @@
+# test_zscore_snapshot.py
+"""
+Z-score snapshot: writer publish vào file mmap, reader (process khác) đọc lại, cache theo seq, NaN → None
+"""
+import os
+import math
+from core.zscore_snapshot import ZScoreBoard, ZScoreSnapshotReader
+
+
+def test_publish_and_read(tmp_path):
+    path = os.path.join(tmp_path, "zscores.snap")
+    reader = ZScoreSnapshotReader(path)
+    assert reader.read() is None  # Chưa có writer
+
+    board = ZScoreBoard(path, capacity=4096)
+    board.update("AUSDT", "BUSDT", "1h", z_score=2.7, spread=0.01, hedge_ratio=0.9, spread_std=math.nan)
+    board.update("AUSDT", "BUSDT", "1h", bollinger={"AUSDT": {"upper": 11.0, "middle": 10.0, "lower": 9.0}})
+    assert board.publish()
+
+    first = reader.read()
+    pair = first['pairs'][0]
+    assert pair['z_score'] == 2.7 and pair['hedge_ratio'] == 0.9
+    assert pair['spread_std'] is None
+    assert pair['bollinger']['AUSDT']['middle'] == 10.0
+    assert reader.read() is first  # Không publish mới → dùng lại bản đã parse
+
+    board.update("AUSDT", "BUSDT", "1h", z_score=-0.5)
+    board.update("CUSDT", "DUSDT", "15m", z_score=1.0)
+    board.publish()
+    second = reader.read()
+    assert second is not first
+    assert {p['pair1']: p['z_score'] for p in second['pairs']} == {"AUSDT": -0.5, "CUSDT": 1.0}
+
+    # Writer restart: seq tiếp tục tăng, reader đang map file vẫn thấy bản mới
+    board.close()
+    restarted = ZScoreBoard(path, capacity=4096)
+    restarted.update("EUSDT", "FUSDT", "1h", z_score=3.0)
+    restarted.publish()
+    assert [p['pair1'] for p in reader.read()['pairs']] == ["EUSDT"]
+
+    # Payload vượt capacity → giữ snapshot cũ
+    restarted.update("EUSDT", "FUSDT", "1h", note="x" * 5000)
+    assert not restarted.publish()
+    assert reader.read()['pairs'][0]['z_score'] == 3.0
+    restarted.close()
+    reader.close()